@@ -0,0 +1,73 @@
+"""
+Mede a vazão do EnrichmentEngine contra o servidor OpenAI local para
+diferentes níveis de concorrência.
+
+Uso:
+    python benchmarks/bench_enrichment.py --issues 200 --latency 0.1
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_openai import FakeOpenAIServer  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--issues", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    with FakeOpenAIServer(latency=args.latency, error_rate=args.error_rate) as server:
+        # O cliente OpenAI lê estas variáveis ao ser criado, no primeiro uso
+        os.environ["OPENAI_BASE_URL"] = server.url
+        os.environ.setdefault("OPENAI_API_KEY", "fake-key")
+        import pandas as pd
+        from src.enrichment import EnrichmentEngine
+
+        df = pd.DataFrame({
+            "title": [f"Issue {i}" for i in range(args.issues)],
+            "body": [f"Corpo sintético {i}" for i in range(args.issues)],
+        })
+
+        baseline = None
+        print(f"{'concorrência':>12} {'issues/s':>10} {'speedup':>8} {'erros':>6}")
+        for concurrency in args.concurrency:
+            # Sem cache, modelo local ou dedup: toda issue vai ao LLM, e nenhum
+            # estado é gravado na árvore de trabalho
+            state_dir = Path(tempfile.mkdtemp(prefix="bench_enrichment_"))
+            engine = EnrichmentEngine(
+                processed_dir=state_dir / "processed",
+                enriched_dir=state_dir / "enriched",
+                batch_dir=state_dir / "batch",
+                config={
+                    "enrichment": {
+                        "max_concurrency": concurrency,
+                        "requests_per_minute": 1_000_000,
+                        "tokens_per_minute": 100_000_000,
+                        "cache": {"enabled": False, "path": state_dir / "cache.sqlite"},
+                        "local_model": {"enabled": False},
+                        "dedup": {"enabled": False, "path": state_dir / "minhash"},
+                    },
+                    "analysis": {"aggregates_path": state_dir / "aggregates.sqlite"},
+                },
+            )
+            start = time.perf_counter()
+            results = engine.classify_dataframe(df)
+            elapsed = time.perf_counter() - start
+            throughput = len(df) / elapsed
+            baseline = baseline or throughput
+            errors = sum(1 for r in results if r["sentiment"] == "error")
+            print(f"{concurrency:>12} {throughput:>10.1f} {throughput / baseline:>7.1f}x {errors:>6}")
+
+
+if __name__ == "__main__":
+    main()
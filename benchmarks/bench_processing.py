@@ -0,0 +1,169 @@
+"""
+Compara a vazão e o pico de memória do processamento em streaming
+(ProcessingEngine, saída Parquet) com a implementação anterior (json.load do
+arquivo inteiro + laço Python por issue + CSV/JSON), sobre arquivos brutos
+sintéticos.
+
+Cada variante roda num subprocesso próprio, para que o pico de RSS medido
+seja só dela.
+
+Uso:
+    python benchmarks/bench_processing.py --files 4 --issues 20000
+"""
+import argparse
+import json
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import pandas as pd  # noqa: E402
+
+from fake_github import make_issues  # noqa: E402
+
+LABELS = ["bug", "type/feature", "docs", "question", "area/ui", "good first issue"]
+PARAGRAPH = (
+    "When I open the dashboard after upgrading, the chart fails to render and the "
+    "console shows an error. Steps to reproduce are listed below.\n"
+)
+
+
+def generate_raw_files(directory: Path, files: int, issues: int, seed=0):
+    """Arquivos no formato do IngestionEngine (lista JSON indentada)."""
+    rng = random.Random(seed)
+    for f in range(files):
+        repo = f"bench/repo{f}"
+        items = make_issues(repo, issues, seed=seed)
+        for item in items:
+            item["body"] = PARAGRAPH * rng.randint(0, 12) + "```\n" + "trace line\n" * rng.randint(0, 30) + "```"
+            item["labels"] = [{"name": name, "color": "ededed"} for name in rng.sample(LABELS, rng.randint(0, 3))]
+            item["user"]["type"] = "User"
+            item["reactions"] = {"total_count": rng.randint(0, 5), "+1": 0, "-1": 0}
+        with open(directory / f"ingest_bench_repo{f}_20240101_000000.json", "w") as fh:
+            json.dump(items, fh, indent=4)
+
+
+def legacy_process(raw_file: Path, out_dir: Path):
+    """Implementação anterior: arquivo inteiro em memória e um dict por issue."""
+    from src.processing import compact_bodies
+
+    with open(raw_file) as f:
+        raw_items = json.load(f)
+    records = []
+    for item in raw_items:
+        records.append({
+            "id": item.get("id"),
+            "number": item.get("number"),
+            "title": item.get("title"),
+            "state": item.get("state"),
+            "created_at": item.get("created_at"),
+            "closed_at": item.get("closed_at"),
+            "author": item.get("user", {}).get("login", "Unknown"),
+            "body": item.get("body") or "",
+            "comments_count": item.get("comments"),
+            "labels": ", ".join([l.get("name", "") for l in item.get("labels", [])]),
+            "url": item.get("html_url"),
+        })
+    df = pd.DataFrame(records)
+    df["body_compact"] = compact_bodies(df["body"])
+    df = df[["id", "number", "title", "state", "body", "body_compact", "author",
+             "comments_count", "labels", "url", "created_at", "closed_at"]]
+    stem = raw_file.stem.rsplit("_", 2)[0].replace("ingest_", "")
+    df.to_csv(out_dir / f"processed_{stem}.csv", index=False)
+    df.to_json(out_dir / f"processed_{stem}.json", orient="records", indent=4)
+
+
+def peak_rss_mb():
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / 1024
+
+
+def run_variant(variant, raw_dir: Path, out_dir: Path, workers: int, chunk_size: int):
+    start = time.perf_counter()
+    if variant == "legacy":
+        for raw_file in sorted(raw_dir.glob("*.json")):
+            legacy_process(raw_file, out_dir)
+    else:
+        from src.processing import ProcessingEngine
+        engine = ProcessingEngine(raw_dir, out_dir, config={
+            "processing": {"chunk_size": chunk_size, "max_workers": workers}
+        })
+        engine.run_batch()
+    return time.perf_counter() - start
+
+
+def _as_text(df: pd.DataFrame) -> pd.DataFrame:
+    """Representação textual comum ao CSV antigo e ao Parquet tipado."""
+    df = df.copy()
+    for column in ("created_at", "closed_at"):
+        if isinstance(df[column].dtype, pd.DatetimeTZDtype):
+            df[column] = df[column].dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+    return df.astype(object).where(df.notna(), "").astype(str)
+
+
+def compare_outputs(legacy_dir: Path, streaming_dir: Path):
+    """Confere que as duas variantes produzem as mesmas linhas."""
+    from src.storage import read_table
+
+    for legacy_csv in sorted(legacy_dir.glob("*.csv")):
+        streaming_file = next(streaming_dir.glob(f"{legacy_csv.stem}_*.parquet"))
+        legacy = pd.read_csv(legacy_csv, dtype=str, keep_default_na=False)
+        pd.testing.assert_frame_equal(_as_text(legacy), _as_text(read_table(streaming_file)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--issues", type=int, default=20000)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--variant", help=argparse.SUPPRESS)
+    parser.add_argument("--raw-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--out-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        workers = args.workers[0]
+        elapsed = run_variant(args.variant, Path(args.raw_dir), Path(args.out_dir), workers, args.chunk_size)
+        print(json.dumps({"elapsed": elapsed, "peak_rss_mb": peak_rss_mb()}))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        raw_dir = tmp / "raw"
+        raw_dir.mkdir()
+        generate_raw_files(raw_dir, args.files, args.issues)
+        raw_mb = sum(f.stat().st_size for f in raw_dir.glob("*.json")) / 1e6
+        total = args.files * args.issues
+        print(f"{args.files} arquivos, {total} issues, {raw_mb:.0f} MB de JSON bruto\n")
+
+        variants = [("legacy", 1)] + [("streaming", w) for w in args.workers]
+        print(f"{'variante':>16} {'issues/s':>10} {'speedup':>8} {'pico RSS (MB)':>14}")
+        baseline = None
+        for variant, workers in variants:
+            out_dir = tmp / f"{variant}_{workers}"
+            out_dir.mkdir()
+            output = subprocess.run(
+                [sys.executable, __file__, "--variant", variant, "--raw-dir", str(raw_dir),
+                 "--out-dir", str(out_dir), "--workers", str(workers),
+                 "--chunk-size", str(args.chunk_size)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            throughput = total / result["elapsed"]
+            baseline = baseline or throughput
+            label = variant if variant == "legacy" else f"{variant} x{workers}"
+            print(f"{label:>16} {throughput:>10.0f} {throughput / baseline:>7.1f}x {result['peak_rss_mb']:>14.0f}")
+            if variant != "legacy":
+                compare_outputs(tmp / "legacy_1", out_dir)
+
+
+if __name__ == "__main__":
+    main()
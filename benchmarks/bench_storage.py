@@ -0,0 +1,98 @@
+"""
+Compara o tempo de carga da análise a partir dos CSVs enriquecidos (formato
+antigo, pd.read_csv de todas as colunas) com o dataset Parquet particionado
+(só as colunas da análise, opcionalmente só alguns meses).
+
+Uso:
+    python benchmarks/bench_storage.py --repos 200 --issues 2000
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from src.analyze import ANALYSIS_COLUMNS  # noqa: E402
+from src.storage import EnrichedStore  # noqa: E402
+
+BODY = "Steps to reproduce: open the dashboard, apply a filter and wait. " * 20
+
+
+def synthetic_repo(repo, n, rng):
+    """Um ano de issues enriquecidas sintéticas para um repositório."""
+    created = pd.Timestamp("2024-01-01", tz="UTC") + pd.to_timedelta(rng.integers(0, 365 * 86400, n), unit="s")
+    return pd.DataFrame({
+        "id": np.arange(n, dtype=np.int64) + hash(repo) % 10**9 * 10**5,
+        "number": np.arange(1, n + 1),
+        "title": [f"Issue {i} em {repo}" for i in range(n)],
+        "state": rng.choice(["open", "closed"], n),
+        "body": BODY,
+        "body_compact": BODY[:400],
+        "author": [f"user{i}" for i in rng.integers(0, 500, n)],
+        "comments_count": rng.integers(0, 30, n),
+        "labels": rng.choice(["bug", "bug, ui", "type/feature", "docs", ""], n),
+        "url": [f"https://github.com/{repo}/issues/{i}" for i in range(n)],
+        "created_at": created,
+        "closed_at": pd.NaT,
+        "sentiment": rng.choice(["positive", "neutral", "negative"], n),
+        "category": rng.choice(["bug", "feature_request", "documentation", "question", "other"], n),
+        "urgency": rng.choice(["high", "medium", "low"], n),
+    })
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repos", type=int, default=200)
+    parser.add_argument("--issues", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        csv_dir = tmp / "csv"
+        csv_dir.mkdir()
+        store = EnrichedStore(tmp / "dataset", legacy_dir=tmp / "none")
+        for r in range(args.repos):
+            repo = f"org{r}_repo{r}"
+            df = synthetic_repo(repo, args.issues, rng)
+            df.to_csv(csv_dir / f"enriched_{repo}.csv", index=False)
+            store.write_source(repo, [df])
+
+        csv_mb = sum(f.stat().st_size for f in csv_dir.glob("*.csv")) / 1e6
+        parquet_mb = sum(f.stat().st_size for f in store.root.rglob("*.parquet")) / 1e6
+        print(f"{args.repos} repositórios x {args.issues} issues: CSV {csv_mb:.0f} MB, Parquet {parquet_mb:.0f} MB\n")
+
+        def load_csv():
+            frames = []
+            for f in sorted(csv_dir.glob("enriched_*.csv")):
+                frame = pd.read_csv(f)
+                frame["source_repo"] = f.stem.replace("enriched_", "")
+                frames.append(frame)
+            return pd.concat(frames, ignore_index=True)
+
+        variants = [
+            ("CSV (todas as colunas)", load_csv),
+            ("Parquet (colunas da análise)", lambda: store.load(columns=ANALYSIS_COLUMNS)),
+            ("Parquet (1 trimestre)", lambda: store.load(
+                columns=ANALYSIS_COLUMNS, months=["2024-10", "2024-11", "2024-12"])),
+        ]
+        print(f"{'variante':>30} {'linhas':>9} {'segundos':>9} {'memória (MB)':>13}")
+        for name, fn in variants:
+            df, elapsed = timed(fn)
+            memory = df.memory_usage(deep=True).sum() / 1e6
+            print(f"{name:>30} {len(df):>9} {elapsed:>9.2f} {memory:>13.0f}")
+
+
+if __name__ == "__main__":
+    main()
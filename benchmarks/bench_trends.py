@@ -0,0 +1,123 @@
+"""
+Mede as tendências por bucket (PainTrendEngine) em dados sintéticos de
+vários anos: construção a frio (um groupby para todos os repositórios, contra
+um laço de resample por repositório) e atualização incremental após novas
+issues em parte dos repositórios, conferindo que o estado incremental é igual
+ao de uma reconstrução completa.
+
+Uso:
+    python benchmarks/bench_trends.py --repos 300 --issues 5000 --years 3
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from src.analyze import TREND_COLUMNS, TREND_FREQS, PainTrendEngine, feature_engineering  # noqa: E402
+from src.storage import EnrichedStore  # noqa: E402
+
+
+def synthetic_repo(repo, n, years, rng, start="2022-01-01", id_offset=0):
+    """Issues com criação espalhada por `years` anos; ~70% fechadas depois de 0 a 60 dias."""
+    created = pd.Timestamp(start, tz="UTC") + pd.to_timedelta(rng.integers(0, years * 365 * 86400, n), unit="s")
+    closed = created + pd.to_timedelta(rng.integers(0, 60 * 86400, n), unit="s")
+    return pd.DataFrame({
+        "id": np.arange(n, dtype=np.int64) + id_offset,
+        "source_repo": repo,
+        "created_at": created,
+        "closed_at": closed.where(rng.random(n) < 0.7),
+        "sentiment": rng.choice(["positive", "neutral", "negative"], n),
+        "urgency": rng.choice(["high", "medium", "low"], n),
+    })
+
+
+def per_repo_resample(df, freq):
+    """Referência: um resample por repositório, em laço."""
+    df = feature_engineering(df.copy())
+    df["high"] = (df["urgency"].astype(object) == "high").astype(int)
+    df["hours"] = (df["closed_at"] - df["created_at"]).dt.total_seconds() / 3600
+    frames = {}
+    rule = "D" if freq == "D" else "W-SUN"
+    for repo, group in df.groupby("source_repo"):
+        resampled = group.set_index("created_at").resample(rule)
+        frames[repo] = pd.DataFrame({
+            "issues": resampled.size(),
+            "pain_index": resampled["pain_index"].mean(),
+            "high_urgency_rate": resampled["high"].mean(),
+            "time_to_close_hours": resampled["hours"].mean(),
+        })
+    return pd.concat(frames)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repos", type=int, default=300)
+    parser.add_argument("--issues", type=int, default=5000, help="issues por repositório")
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--touched-repos", type=int, default=20, help="repositórios com issues novas")
+    parser.add_argument("--new-issues", type=int, default=200, help="issues novas por repositório alterado")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        store = EnrichedStore(tmp / "dataset", legacy_dir=tmp / "none")
+        frames = {}
+        for r in range(args.repos):
+            repo = f"org{r}_repo{r}"
+            frames[repo] = synthetic_repo(repo, args.issues, args.years, rng, id_offset=r * 10**7)
+            store.write_source(repo, [frames[repo].drop(columns="source_repo")])
+        df = pd.concat(frames.values(), ignore_index=True)
+        print(f"{args.repos} repositórios x {args.issues} issues em {args.years} anos ({len(df)} issues)\n")
+
+        engine = PainTrendEngine(tmp / "trends", dataset_root=store.root)
+        print(f"{'etapa':>42} {'segundos':>9}")
+        for freq, name in TREND_FREQS.items():
+            _, elapsed = timed(lambda: per_repo_resample(df, freq))
+            print(f"{'resample por repositório (' + name + ')':>42} {elapsed:>9.2f}")
+        _, elapsed = timed(lambda: engine.build(df))
+        print(f"{'construção a frio (diário + semanal)':>42} {elapsed:>9.2f}")
+        _, elapsed = timed(lambda: engine.build())
+        print(f"{'construção a frio, lendo o dataset':>42} {elapsed:>9.2f}")
+        for freq, name in TREND_FREQS.items():
+            trends, elapsed = timed(lambda: engine.trends(freq))
+            print(f"{'séries + janela móvel (' + name + ', ' + str(len(trends)) + ' linhas)':>42} {elapsed:>9.2f}")
+
+        # Issues novas nos últimos 30 dias de parte dos repositórios
+        end = pd.Timestamp("2022-01-01", tz="UTC") + pd.Timedelta(days=args.years * 365)
+        touched = []
+        for r in range(args.touched_repos):
+            repo = f"org{r}_repo{r}"
+            new = synthetic_repo(repo, args.new_issues, 1, rng, id_offset=r * 10**7 + args.issues)
+            new["created_at"] = end - pd.to_timedelta(rng.integers(0, 30 * 86400, len(new)), unit="s")
+            frames[repo] = pd.concat([frames[repo], new], ignore_index=True)
+            store.write_source(repo, [frames[repo].drop(columns="source_repo")])
+            touched.append(new[["source_repo", "created_at"]])
+        touched = pd.concat(touched, ignore_index=True)
+
+        buckets, elapsed = timed(lambda: engine.update(touched))
+        label = f"incremental ({len(touched)} issues, {buckets} buckets)"
+        print(f"{label:>42} {elapsed:>9.2f}")
+
+        incremental = {freq: engine.load_state(freq) for freq in TREND_FREQS}
+        full = PainTrendEngine(tmp / "full", dataset_root=store.root)
+        full.build()
+        for freq in TREND_FREQS:
+            pd.testing.assert_frame_equal(incremental[freq], full.load_state(freq), check_dtype=False)
+        print("\nEstado incremental igual ao da reconstrução completa.")
+
+
+if __name__ == "__main__":
+    main()
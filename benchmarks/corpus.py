@@ -0,0 +1,208 @@
+"""
+Corpus sintético de issues no schema da GitHub Search API, de 1 mil a 1
+milhão de issues: labels em quantidade variável, corpos montados a partir de
+templates de issue (comentários HTML, checklists, títulos de seção, imagens,
+blocos de código e de log) e estados aberto/fechado com datas coerentes.
+
+A geração é determinística por (repositório, semente) e em streaming, para
+que corpora grandes não precisem caber em memória.
+
+Uso:
+    python benchmarks/corpus.py --repos 10 --issues 100000 --out /tmp/raw
+"""
+import argparse
+import random
+import sys
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+LABELS = [
+    ("bug", "d73a4a"), ("kind/bug", "d73a4a"), ("regression", "b60205"), ("type/feature", "a2eeef"),
+    ("enhancement", "a2eeef"), ("documentation", "0075ca"), ("question", "d876e3"),
+    ("good first issue", "7057ff"), ("help wanted", "008672"), ("needs-triage", "ededed"),
+    ("priority/high", "b60205"), ("priority/low", "c2e0c6"), ("area/dashboard", "c5def5"),
+    ("area/sql-lab", "c5def5"), ("area/alerting", "c5def5"), ("area/auth", "c5def5"),
+    ("performance", "fbca04"), ("security", "ee0701"), ("stale", "ffffff"), ("duplicate", "cfd3d7"),
+    ("wontfix", "ffffff"), ("dependencies", "0366d6"),
+]
+# Número de labels por issue (0 a 4) e seus pesos
+LABEL_COUNTS, LABEL_COUNT_WEIGHTS = [0, 1, 2, 3, 4], [15, 40, 30, 10, 5]
+
+SENTENCES = [
+    "When I open the dashboard after upgrading, the chart fails to render.",
+    "The console shows an error and the page stays blank.",
+    "This used to work in the previous release.",
+    "Filtering by date returns an empty result even though data exists.",
+    "It would be great to be able to export the results as CSV.",
+    "The query runs fine directly on the database but times out here.",
+    "I could not find anything about this in the documentation.",
+    "Alerts are sent twice when the evaluation interval is short.",
+    "Logging in with SSO redirects back to the login page.",
+    "Memory usage keeps growing until the worker is killed.",
+    "Is there a recommended way to configure this behind a proxy?",
+    "The tooltip overlaps the legend on small screens.",
+]
+TITLES = [
+    "Chart fails to render after upgrade", "Export results as CSV", "Query timeout on large tables",
+    "Docs: missing configuration example", "Alert fired twice", "SSO login loop",
+    "Memory leak in worker", "Tooltip overlaps legend", "Support for proxy configuration",
+    "Empty result when filtering by date",
+]
+LOG_LINES = [
+    "ERROR [worker] Task failed: connection reset by peer",
+    "WARN  [scheduler] Evaluation took longer than interval",
+    "INFO  [http] GET /api/v1/chart/data 500",
+]
+TRACEBACK = (
+    "Traceback (most recent call last):\n"
+    '  File "app/views/core.py", line 512, in explore_json\n'
+    "    payload = viz_obj.get_payload()\n"
+    '  File "app/viz.py", line 430, in get_payload\n'
+    "    df = self.get_df(query_obj)\n"
+    "KeyError: 'metric'"
+)
+
+
+def _paragraph(rng: random.Random) -> str:
+    return " ".join(rng.choice(SENTENCES) for _ in range(rng.randint(1, 4)))
+
+
+def _bug_body(rng: random.Random) -> str:
+    parts = [
+        "<!-- Please make sure you are familiar with the issue guidelines before submitting. -->",
+        "### Bug description\n\n" + _paragraph(rng),
+        "### How to reproduce the bug\n\n" + "\n".join(
+            f"{i}. {rng.choice(SENTENCES)}" for i in range(1, rng.randint(2, 5))
+        ),
+        "### Expected results\n\n" + _paragraph(rng),
+    ]
+    if rng.random() < 0.5:
+        parts.append("### Logs\n\n```\n" + (TRACEBACK if rng.random() < 0.5 else "\n".join(
+            rng.choice(LOG_LINES) for _ in range(rng.randint(3, 40))
+        )) + "\n```")
+    if rng.random() < 0.3:
+        parts.append('### Screenshots\n\n<img width="800" alt="screenshot" src="https://user-images.example/1.png">')
+    parts.append(
+        "### Checklist\n\n- [x] I have searched the issues of this repository.\n"
+        "- [ ] I have reproduced the issue with at least the latest released version.\n"
+        "- [ ] I have checked the troubleshooting documentation."
+    )
+    return "\n\n".join(parts)
+
+
+def _feature_body(rng: random.Random) -> str:
+    return (
+        "<!-- Describe the feature you would like to see. -->\n\n"
+        f"**Is your feature request related to a problem? Please describe.**\n{_paragraph(rng)}\n\n"
+        f"**Describe the solution you'd like**\n{_paragraph(rng)}\n\n"
+        "**Describe alternatives you've considered**\n_No response_"
+    )
+
+
+def _question_body(rng: random.Random) -> str:
+    return _paragraph(rng) + ("\n\n```yaml\nserver:\n  port: 8088\n```" if rng.random() < 0.3 else "")
+
+
+def make_body(rng: random.Random) -> str:
+    """Corpo de issue: template de bug (60%), de feature (25%), pergunta livre ou vazio."""
+    roll = rng.random()
+    if roll < 0.6:
+        return _bug_body(rng)
+    if roll < 0.85:
+        return _feature_body(rng)
+    return _question_body(rng) if roll < 0.97 else ""
+
+
+def _iso(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def generate_issues(repo: str, n: int, seed=0, days=365, closed_ratio=0.4,
+                    now: datetime = None) -> Iterator[Dict[str, Any]]:
+    """
+    Gera n issues de um repositório (uma por vez), criadas nos últimos `days`
+    dias. Cerca de `closed_ratio` delas estão fechadas; `updated_at` nunca
+    passa de `now`.
+    """
+    rng = random.Random(f"{repo}:{seed}")
+    now = now or datetime.now(timezone.utc)
+    repo_key = zlib.crc32(repo.encode())
+    for number in range(1, n + 1):
+        created = now - timedelta(seconds=rng.randint(0, days * 86400))
+        updated = min(created + timedelta(seconds=rng.randint(0, 7 * 86400)), now)
+        closed = updated if rng.random() < closed_ratio else None
+        labels = rng.sample(LABELS, rng.choices(LABEL_COUNTS, LABEL_COUNT_WEIGHTS)[0])
+        login_id = rng.randint(1, 5000)
+        yield {
+            "id": repo_key * 10**7 + number,
+            "number": number,
+            "title": f"{rng.choice(TITLES)} (#{number})",
+            "state": "closed" if closed else "open",
+            "state_reason": "completed" if closed else None,
+            "locked": False,
+            "user": {"login": f"user{login_id}", "id": login_id, "type": "User"},
+            "labels": [
+                {"id": zlib.crc32(name.encode()), "name": name, "color": color, "default": False}
+                for name, color in labels
+            ],
+            "assignees": [],
+            "comments": rng.randint(0, 20),
+            "author_association": rng.choice(["NONE", "CONTRIBUTOR", "MEMBER"]),
+            "body": make_body(rng),
+            "reactions": {"total_count": rng.randint(0, 5), "+1": 0, "-1": 0},
+            "html_url": f"https://github.com/{repo}/issues/{number}",
+            "created_at": _iso(created),
+            "updated_at": _iso(updated),
+            "closed_at": _iso(closed) if closed else None,
+        }
+
+
+def repo_names(count: int) -> List[str]:
+    return [f"bench/repo{r}" for r in range(count)]
+
+
+def write_raw_store(root: Path, repos: int, issues: int, segment_size=50_000, seed=0) -> int:
+    """
+    Grava `issues` issues divididas entre `repos` repositórios no arquivo
+    bruto (RawStore), em segmentos de até `segment_size` issues, como uma
+    sequência de ingestões. Retorna o total gravado.
+    """
+    from src.raw_store import RawStore
+
+    store = RawStore(root)
+    per_repo, extra = divmod(issues, repos)
+    total = 0
+    for r, repo in enumerate(repo_names(repos)):
+        batch = []
+        for item in generate_issues(repo, per_repo + (r < extra), seed=seed):
+            batch.append(item)
+            if len(batch) == segment_size:
+                total += store.append(repo.replace("/", "_"), batch)["written"]
+                batch = []
+        if batch:
+            total += store.append(repo.replace("/", "_"), batch)["written"]
+    return total
+
+
+def main():
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repos", type=int, default=10)
+    parser.add_argument("--issues", type=int, default=100_000, help="total de issues (1k a 1M)")
+    parser.add_argument("--segment-size", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, required=True, help="diretório do arquivo bruto")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    total = write_raw_store(args.out, args.repos, args.issues, args.segment_size, args.seed)
+    size_mb = sum(f.stat().st_size for f in args.out.rglob("*.gz")) / 1e6
+    print(f"{total} issues em {args.repos} repositórios ({size_mb:.0f} MB comprimidos) "
+          f"em {time.perf_counter() - start:.1f}s: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
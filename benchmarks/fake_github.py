@@ -0,0 +1,212 @@
+"""
+Stub local da GitHub Search API (/search/issues) para testes e benchmarks.
+
+Uso:
+    python benchmarks/fake_github.py --port 8765 --issues-per-repo 500
+    GITHUB_API_URL=http://127.0.0.1:8765 python src/ingestion.py
+"""
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from corpus import generate_issues
+
+DEFAULT_REPOS = ["apache/superset", "grafana/grafana", "metabase/metabase"]
+
+
+def make_issues(repo, n, days=365, seed=0):
+    """Gera n issues sintéticas com o schema da Search API para um repositório (ver corpus.py)."""
+    return list(generate_issues(repo, n, seed=seed, days=days))
+
+
+def _bound(value, end_of_day):
+    """Converte uma data do qualifier (com ou sem hora) em timestamp ISO comparável."""
+    if "T" in value:
+        return value.rstrip("Z") + "Z"
+    return value + ("T23:59:59Z" if end_of_day else "T00:00:00Z")
+
+
+def _match(current, op, value):
+    if ".." in value:
+        lo, hi = value.split("..", 1)
+        return _bound(lo, False) <= current <= _bound(hi, True)
+    if op == ">":
+        return current > _bound(value, True)
+    if op == ">=":
+        return current >= _bound(value, False)
+    if op == "<":
+        return current < _bound(value, False)
+    if op == "<=":
+        return current <= _bound(value, True)
+    return _bound(value, False) <= current <= _bound(value, True)
+
+
+class FakeGitHubServer:
+    """Servidor HTTP em thread de fundo que responde como a Search API."""
+
+    QUALIFIER = re.compile(r"(created|updated):(>=|<=|>|<)?(\S+)")
+
+    def __init__(self, repos=None, issues_per_repo=300, host="127.0.0.1", port=0,
+                 search_cap=1000, rate_limit=None, rate_window=60):
+        repos = repos or DEFAULT_REPOS
+        self.issues = {repo: make_issues(repo, issues_per_repo) for repo in repos}
+        self.search_cap = search_cap
+        # Limite de requisições por janela (None desativa), com headers X-RateLimit-*
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self._window_start = time.time()
+        self._window_used = 0
+        self.request_count = 0
+        self.rejected_count = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _consume_rate_limit(self):
+        """Retorna (permitido, headers) para a janela atual de rate limit."""
+        if self.rate_limit is None:
+            return True, {}
+        with self._lock:
+            now = time.time()
+            if now - self._window_start >= self.rate_window:
+                self._window_start, self._window_used = now, 0
+            allowed = self._window_used < self.rate_limit
+            if allowed:
+                self._window_used += 1
+            else:
+                self.rejected_count += 1
+            headers = {
+                "X-RateLimit-Limit": str(self.rate_limit),
+                "X-RateLimit-Remaining": str(self.rate_limit - self._window_used),
+                "X-RateLimit-Reset": str(int(self._window_start + self.rate_window) + 1),
+                "X-RateLimit-Resource": "search",
+            }
+        return allowed, headers
+
+    def search(self, query):
+        repo_match = re.search(r"repo:(\S+)", query)
+        items = self.issues.get(repo_match.group(1), []) if repo_match else []
+        for field, op, value in self.QUALIFIER.findall(query):
+            items = [it for it in items if _match(it[f"{field}_at"], op, value)]
+        return items
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with server._lock:
+                    server.request_count += 1
+                parsed = urlparse(self.path)
+                if parsed.path != "/search/issues":
+                    self.send_error(404)
+                    return
+                allowed, rate_headers = server._consume_rate_limit()
+                if not allowed:
+                    body = b'{"message": "API rate limit exceeded"}'
+                    self.send_response(403)
+                    for key, value in rate_headers.items():
+                        self.send_header(key, value)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+
+                qs = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+                query = qs.get("q", "")
+                per_page = min(int(qs.get("per_page", 30)), 100)
+                page = int(qs.get("page", 1))
+                order = qs.get("order", "desc")
+
+                matched = server.search(query)
+                total = len(matched)
+                sort_field = "updated_at" if qs.get("sort") == "updated" else "created_at"
+                matched = sorted(matched, key=lambda it: it[sort_field], reverse=order == "desc")
+                # Como a API real, só os primeiros `search_cap` resultados são acessíveis
+                matched = matched[:server.search_cap]
+                start = (page - 1) * per_page
+                page_items = matched[start:start + per_page]
+
+                links = []
+                last_page = max(1, -(-len(matched) // per_page))
+                if page < last_page:
+                    nxt = dict(qs, page=page + 1)
+                    links.append(f'<{server.url}{parsed.path}?{urlencode(nxt)}>; rel="next"')
+                    last = dict(qs, page=last_page)
+                    links.append(f'<{server.url}{parsed.path}?{urlencode(last)}>; rel="last"')
+
+                body = json.dumps({
+                    "total_count": total,
+                    "incomplete_results": False,
+                    "items": page_items,
+                }).encode()
+                etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    for key, value in rate_headers.items():
+                        self.send_header(key, value)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                if links:
+                    self.send_header("Link", ", ".join(links))
+                for key, value in rate_headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub local da GitHub Search API")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--issues-per-repo", type=int, default=300)
+    parser.add_argument("--rate-limit", type=int, default=None,
+                        help="Requisições permitidas por janela de 60s")
+    args = parser.parse_args()
+
+    server = FakeGitHubServer(
+        issues_per_repo=args.issues_per_repo, port=args.port, rate_limit=args.rate_limit
+    )
+    print(f"Fake GitHub API em {server.url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
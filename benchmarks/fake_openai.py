@@ -0,0 +1,198 @@
+"""
+Servidor local que imita o endpoint /v1/chat/completions da OpenAI, com
+latência e taxa de erros (429/500) configuráveis.
+
+Também responde a prompts agrupados ("### id: <id>") e processa arquivos
+JSONL da Batch API offline, como a OpenAI faria.
+
+Uso:
+    python benchmarks/fake_openai.py --port 8766 --latency 0.2 --error-rate 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8766/v1 OPENAI_API_KEY=fake python -m src.enrichment
+    python benchmarks/fake_openai.py --batch-input data/batch/X_input.jsonl --batch-output out.jsonl
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SENTIMENTS = ["positive", "neutral", "negative"]
+CATEGORIES = ["bug", "feature_request", "documentation", "question", "other"]
+URGENCIES = ["high", "medium", "low"]
+
+
+def fake_labels(text):
+    """Rótulos determinísticos derivados do conteúdo, para respostas reproduzíveis."""
+    h = zlib.crc32(text.encode())
+    return {
+        "sentiment": SENTIMENTS[h % 3],
+        "category": CATEGORIES[(h // 3) % 5],
+        "urgency": URGENCIES[(h // 15) % 3],
+    }
+
+
+PACKED_ITEM = re.compile(r"^### id: (\S+)\n(.*?)(?=\n\n### id: |\Z)", re.S | re.M)
+
+
+def fake_completion(request):
+    """Conteúdo da resposta: objeto único ou {"results": [...]} para prompts agrupados."""
+    content = request["messages"][-1]["content"]
+    packed = PACKED_ITEM.findall(content)
+    if packed:
+        return json.dumps({"results": [dict(fake_labels(text), id=item_id) for item_id, text in packed]})
+    return json.dumps(fake_labels(content))
+
+
+def usage(request, content):
+    """Contagem aproximada de tokens (~4 caracteres por token), como a API informaria."""
+    prompt = sum(len(message.get("content") or "") for message in request.get("messages", [])) // 4
+    completion = len(content) // 4
+    return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+
+
+def chat_completion_payload(request, content, completion_id):
+    return {
+        "id": f"chatcmpl-{completion_id}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", "gpt-4o-mini"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": usage(request, content),
+    }
+
+
+def run_batch_file(input_path, output_path, error_rate=0.0, seed=0):
+    """Processa um JSONL da Batch API e escreve o arquivo de resultado no mesmo formato da OpenAI."""
+    rng = random.Random(seed)
+    with open(input_path) as src, open(output_path, "w") as dst:
+        for n, line in enumerate(src):
+            if not line.strip():
+                continue
+            task = json.loads(line)
+            if rng.random() < error_rate:
+                response = {"status_code": 500, "body": {"error": {"message": "fake error"}}}
+            else:
+                body = chat_completion_payload(task["body"], fake_completion(task["body"]), n)
+                response = {"status_code": 200, "request_id": f"req_{n}", "body": body}
+            dst.write(json.dumps({
+                "id": f"batch_req_{n}", "custom_id": task["custom_id"],
+                "response": response, "error": None,
+            }) + "\n")
+
+
+class FakeOpenAIServer:
+    """Servidor HTTP em thread de fundo compatível com o cliente `openai`."""
+
+    def __init__(self, latency=0.0, error_rate=0.0, host="127.0.0.1", port=0, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.request_count = 0
+        self.error_count = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status, payload, headers=None):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                with server._lock:
+                    server.request_count += 1
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                    fail = server.rng.random() < server.error_rate
+                    status = server.rng.choice([429, 500]) if fail else 200
+                try:
+                    if server.latency:
+                        time.sleep(server.latency)
+                    if status != 200:
+                        with server._lock:
+                            server.error_count += 1
+                        self._send_json(
+                            status, {"error": {"message": "fake error", "type": "server_error"}},
+                            headers={"retry-after": "0.05"} if status == 429 else None,
+                        )
+                        return
+                    self._send_json(200, chat_completion_payload(
+                        request, fake_completion(request), server.request_count
+                    ))
+                finally:
+                    with server._lock:
+                        server.in_flight -= 1
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local compatível com a OpenAI")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--batch-input", help="Processa um JSONL da Batch API em vez de servir HTTP")
+    parser.add_argument("--batch-output", help="Arquivo de resultado gerado a partir de --batch-input")
+    args = parser.parse_args()
+
+    if args.batch_input:
+        run_batch_file(args.batch_input, args.batch_output, error_rate=args.error_rate)
+        print(f"Resultados escritos em {args.batch_output}")
+        return
+
+    server = FakeOpenAIServer(latency=args.latency, error_rate=args.error_rate, port=args.port)
+    print(f"Fake OpenAI API em {server.url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
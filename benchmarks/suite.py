@@ -0,0 +1,368 @@
+"""
+Suíte de benchmarks de ponta a ponta: gera um corpus sintético (corpus.py),
+sobe os servidores locais do GitHub (fake_github.py) e da OpenAI
+(fake_openai.py) e mede cada etapa do pipeline num subprocesso próprio:
+
+- ingest:  IngestionEngine.run contra a Search API local (latência por requisição HTTP)
+- process: ProcessingEngine.run_batch sobre o arquivo bruto (latência por bloco normalizado)
+- enrich:  EnrichmentEngine.run_batch contra a OpenAI local (latência por chamada ao LLM)
+- analyze: load -> features -> labels -> heatmap -> resumo de saúde -> tendências, a frio
+           (latência por execução completa)
+
+Para cada etapa são registrados vazão (issues/s), latências p50/p99 e pico de
+RSS num JSON em benchmarks/results/. Com um baseline salvo (--save-baseline),
+cada execução é comparada a ele e termina com código 1 se alguma métrica
+piorar além da tolerância.
+
+Uso:
+    python benchmarks/suite.py --issues 10000 --save-baseline
+    python benchmarks/suite.py --issues 10000            # compara com o baseline
+    python benchmarks/suite.py --issues 1000000 --stages process analyze
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+BASE_DIR = BENCH_DIR.parent
+sys.path.insert(0, str(BASE_DIR))
+sys.path.insert(0, str(BENCH_DIR))
+
+from corpus import repo_names, write_raw_store  # noqa: E402
+
+RESULTS_DIR = BENCH_DIR / "results"
+BASELINE_PATH = BENCH_DIR / "baseline.json"
+STAGES = ["ingest", "process", "enrich", "analyze"]
+# Métrica -> True se maior é melhor
+REGRESSION_METRICS = {"throughput": True, "p99_ms": False, "peak_rss_mb": False}
+# Opções que não mudam a carga medida (não impedem a comparação com o baseline)
+NEUTRAL_OPTIONS = ("stages", "tolerance")
+
+
+# --- MEDIÇÃO (dentro do subprocesso de cada etapa) ---
+
+def time_calls(obj, name):
+    """Envolve o método `name` da instância e devolve a lista das durações de cada chamada."""
+    samples = []
+    method = getattr(obj, name)
+
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            samples.append(time.perf_counter() - start)
+
+    setattr(obj, name, timed)
+    return samples
+
+
+def percentile(samples, q):
+    """Percentil pelo método nearest-rank (None sem amostras)."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))]
+
+
+def peak_rss_mb():
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / 1024
+
+
+def bench_ingest(work: Path, params):
+    from src.config import load_settings
+    from src.ingestion import IngestionEngine
+    from src.rate_limit import TokenBucket
+
+    settings = load_settings()
+    settings["github"] = {"targets": [f"repo:{repo} is:issue" for repo in params["repos"]]}
+    settings["parameters"] = dict(settings.get("parameters", {}), days_back=366, max_results=None, incremental=False)
+    engine = IngestionEngine(output_dir=str(work / "raw"), api_url=params["github_url"],
+                             state_path=work / "ingestion_state.json", config=settings)
+    if params["rate_limit"] is None:
+        # Sem limite no servidor local, o orçamento do cliente também é liberado
+        engine.scheduler.buckets = {resource: TokenBucket(10**6, 60) for resource in engine.scheduler.buckets}
+    samples = time_calls(engine, "_request")
+    start = time.perf_counter()
+    stats = engine.run()
+    return sum(s["items"] for s in stats), time.perf_counter() - start, samples, "requisição HTTP"
+
+
+def bench_process(work: Path, params):
+    from src.processing import ProcessingEngine
+
+    # Um processo: as amostras por bloco são coletadas na própria instância
+    engine = ProcessingEngine(raw_dir=params["raw_dir"], processed_dir=str(work / "processed"),
+                              config={"processing": {"chunk_size": params["chunk_size"], "max_workers": 1}},
+                              state_path=str(work / "processing_state.json"))
+    samples = time_calls(engine, "normalize_github_data")
+    start = time.perf_counter()
+    results = engine.run_batch()
+    return sum(r["rows"] for r in results), time.perf_counter() - start, samples, "bloco normalizado"
+
+
+def bench_enrich(work: Path, params):
+    import pyarrow.parquet as pq
+    from src.config import load_settings
+    from src.enrichment import EnrichmentEngine
+
+    settings = load_settings()
+    cfg = settings.get("enrichment", {})
+    # Orçamentos de RPM/TPM liberados: mede o código, não o tier da conta
+    settings["enrichment"] = dict(
+        cfg, mode=params["mode"], requests_per_minute=10**6, tokens_per_minute=10**9,
+        cache=dict(cfg.get("cache", {}), path=str(work / "classification.sqlite")),
+        local_model=dict(cfg.get("local_model", {}), enabled=False),
+        dedup=dict(cfg.get("dedup", {}), path=str(work / "minhash")),
+    )
+    settings["analysis"] = {"aggregates_path": str(work / "health_aggregates.sqlite")}
+    engine = EnrichmentEngine(processed_dir=params["processed_dir"], enriched_dir=str(work / "enriched"),
+                              batch_dir=str(work / "batch"), config=settings)
+    samples = time_calls(engine, "_create_completion")
+    rows = sum(pq.ParquetFile(f).metadata.num_rows for f in Path(params["processed_dir"]).glob("*.parquet"))
+    start = time.perf_counter()
+    engine.run_batch()
+    return rows, time.perf_counter() - start, samples, "chamada ao LLM"
+
+
+def bench_analyze(work: Path, params):
+    import src.analyze as analyze
+    from src.aggregates import HealthAggregates
+
+    # Saídas da análise no diretório temporário
+    analyze.ENRICHED_DATASET_DIR = Path(params["dataset_dir"])
+    analyze.ANALYSIS_DIR = work / "analysis"
+
+    samples, rows = [], 0
+    start = time.perf_counter()
+    for run in range(params["repeat"]):
+        # Gráficos num diretório novo a cada rodada: sem figuras reaproveitadas do índice
+        analyze.PLOTS_DIR = analyze.ANALYSIS_DIR / f"plots_{run}"
+        analyze.PLOTS_DIR.mkdir(parents=True, exist_ok=True)
+        t0 = time.perf_counter()
+        # Agregados e tendências novos a cada rodada: custo da construção a frio
+        aggregates = HealthAggregates(work / f"aggregates_{run}.sqlite")
+        summary = analyze.refresh_health_summary(aggregates)
+        top_labels, label_stats = analyze.label_stats_from_summary(aggregates.label_summary())
+        analyze.generate_heatmap(label_stats, top_labels)
+        analyze.generate_health_barplot(summary)
+        analyze.refresh_trends(aggregates, engine=analyze.PainTrendEngine(
+            work / f"trends_{run}", dataset_root=analyze.ENRICHED_DATASET_DIR))
+        aggregates.close()
+        samples.append(time.perf_counter() - t0)
+        rows += int(summary['Total_Issues'].sum()) if not summary.empty else 0
+    return rows, time.perf_counter() - start, samples, "execução completa"
+
+
+BENCHMARKS = {"ingest": bench_ingest, "process": bench_process, "enrich": bench_enrich, "analyze": bench_analyze}
+
+
+def run_worker(stage, work: Path, params):
+    """Executa uma etapa e imprime o resultado como a última linha JSON do stdout."""
+    # Mensagens das etapas vão para o stderr; o stdout fica só com o resultado
+    with contextlib.redirect_stdout(sys.stderr):
+        items, seconds, samples, latency_of = BENCHMARKS[stage](work, params)
+    print(json.dumps({
+        "items": items,
+        "seconds": round(seconds, 4),
+        "throughput": round(items / seconds, 1) if seconds else 0.0,
+        "latency_of": latency_of,
+        "samples": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 2) if samples else None,
+        "p99_ms": round(percentile(samples, 99) * 1000, 2) if samples else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }))
+
+
+# --- ORQUESTRAÇÃO (processo principal) ---
+
+def spawn(stage, work: Path, params, env):
+    work.mkdir(parents=True, exist_ok=True)
+    output = subprocess.run(
+        [sys.executable, __file__, "--worker", stage, "--workdir", str(work), "--params", json.dumps(params)],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    if output.returncode != 0:
+        raise RuntimeError(f"Benchmark '{stage}' falhou:\n{output.stderr[-3000:]}")
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def prepare_processed(raw_dir: Path, processed_dir: Path, repos, issues, chunk_size):
+    """Corpus bruto + processamento (fora da medição), entrada de enrich e analyze."""
+    from src.processing import ProcessingEngine
+
+    write_raw_store(raw_dir, repos, issues)
+    engine = ProcessingEngine(raw_dir=str(raw_dir), processed_dir=str(processed_dir),
+                              config={"processing": {"chunk_size": chunk_size, "max_workers": 1}},
+                              state_path=str(raw_dir.parent / f"{raw_dir.name}_state.json"))
+    engine.run_batch()
+
+
+def prepare_dataset(processed_dir: Path, dataset_dir: Path):
+    """Dataset enriquecido a partir das issues processadas, com os rótulos determinísticos da OpenAI local."""
+    from fake_openai import fake_labels
+    from src.storage import EnrichedStore, read_table
+
+    store = EnrichedStore(dataset_dir, legacy_dir=dataset_dir / "none")
+    for path in sorted(processed_dir.glob("processed_*.parquet")):
+        df = read_table(path)
+        labels = [fake_labels(title) for title in df["title"]]
+        for field in ("sentiment", "category", "urgency"):
+            df[field] = [label[field] for label in labels]
+        store.write_source(path.stem[len("processed_"):].rsplit("_", 2)[0], [df])
+
+
+def compare(results, baseline, tolerance):
+    """
+    {etapa: {métrica: variação relativa}} e a lista de regressões além da
+    tolerância. Só compara execuções com a mesma carga (mesmas opções).
+    """
+    changes, regressions = {}, []
+    workload = {k: v for k, v in results["config"].items() if k not in NEUTRAL_OPTIONS}
+    if {k: v for k, v in (baseline.get("config") or {}).items() if k not in NEUTRAL_OPTIONS} != workload:
+        return changes, regressions
+    for stage, result in results["stages"].items():
+        base = (baseline.get("stages") or {}).get(stage)
+        if not base or base.get("items") != result.get("items"):
+            continue
+        changes[stage] = {}
+        for metric, higher_is_better in REGRESSION_METRICS.items():
+            if not base.get(metric) or result.get(metric) is None:
+                continue
+            change = (result[metric] - base[metric]) / base[metric]
+            changes[stage][metric] = round(change, 4)
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{stage}.{metric}: {base[metric]} -> {result[metric]} ({change:+.0%})")
+    return changes, regressions
+
+
+def print_table(results, changes):
+    print(f"{'etapa':>8} {'issues':>9} {'segundos':>9} {'issues/s':>10} {'p50 ms':>9} {'p99 ms':>9} "
+          f"{'RSS MB':>8}  latência de / vs. baseline")
+    for stage, r in results["stages"].items():
+        delta = ", ".join(f"{m} {c:+.0%}" for m, c in changes.get(stage, {}).items()) or "sem baseline"
+        p50 = f"{r['p50_ms']:.1f}" if r["p50_ms"] is not None else "-"
+        p99 = f"{r['p99_ms']:.1f}" if r["p99_ms"] is not None else "-"
+        print(f"{stage:>8} {r['items']:>9} {r['seconds']:>9.2f} {r['throughput']:>10.0f} {p50:>9} {p99:>9} "
+              f"{r['peak_rss_mb']:>8.0f}  {r['latency_of']} / {delta}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--issues", type=int, default=10_000, help="issues de process/analyze (1k a 1M)")
+    parser.add_argument("--repos", type=int, default=10)
+    parser.add_argument("--ingest-issues", type=int, default=None,
+                        help="issues servidas pelo GitHub local (padrão: min(issues, 20000))")
+    parser.add_argument("--enrich-issues", type=int, default=None,
+                        help="issues enviadas à OpenAI local (padrão: min(issues, 2000))")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--enrich-mode", choices=["single", "packed"], default="single")
+    parser.add_argument("--openai-latency", type=float, default=0.02, help="segundos por requisição")
+    parser.add_argument("--openai-error-rate", type=float, default=0.0)
+    parser.add_argument("--github-rate-limit", type=int, default=None, help="requisições por janela de 60s no GitHub local; com ele, o cliente "
+                             "usa os orçamentos documentados da API (padrão: sem limite)")
+    parser.add_argument("--analyze-repeat", type=int, default=3)
+    parser.add_argument("--output", type=Path, default=None, help="JSON de resultados")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="grava esta execução como baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="piora relativa aceita (0.25 = 25%%)")
+    parser.add_argument("--worker", choices=STAGES, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--params", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, Path(args.workdir), json.loads(args.params))
+        return 0
+
+    from fake_github import FakeGitHubServer
+    from fake_openai import FakeOpenAIServer
+
+    ingest_issues = args.ingest_issues or min(args.issues, 20_000)
+    enrich_issues = args.enrich_issues or min(args.issues, 2_000)
+    repos = repo_names(args.repos)
+    results = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {key: value for key, value in vars(args).items()
+                   if key not in ("worker", "workdir", "params", "output", "baseline", "save_baseline")},
+        "stages": {},
+    }
+    results["config"]["ingest_issues"], results["config"]["enrich_issues"] = ingest_issues, enrich_issues
+    env = dict(os.environ, MPLBACKEND="Agg", GITHUB_TOKEN=os.environ.get("GITHUB_TOKEN", "bench"))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        print(f"Corpus: {args.issues} issues em {args.repos} repositórios (ingest: {ingest_issues}, "
+              f"enrich: {enrich_issues}, modo {args.enrich_mode})\n", file=sys.stderr)
+        for stage in args.stages:
+            if stage == "ingest":
+                per_repo = max(1, ingest_issues // args.repos)
+                with FakeGitHubServer(repos=repos, issues_per_repo=per_repo,
+                                      rate_limit=args.github_rate_limit) as server:
+                    result = spawn(stage, tmp / stage, {"repos": repos, "github_url": server.url,
+                                                        "rate_limit": args.github_rate_limit}, env)
+                    result["http_requests"] = server.request_count
+            elif stage == "process":
+                write_raw_store(tmp / "raw", args.repos, args.issues)
+                result = spawn(stage, tmp / stage, {"raw_dir": str(tmp / "raw"), "chunk_size": args.chunk_size}, env)
+            elif stage == "enrich":
+                prepare_processed(tmp / "enrich_raw", tmp / "enrich_input", args.repos, enrich_issues, args.chunk_size)
+                with FakeOpenAIServer(latency=args.openai_latency, error_rate=args.openai_error_rate) as server:
+                    stage_env = dict(env, OPENAI_BASE_URL=server.url, OPENAI_API_KEY="fake-key")
+                    result = spawn(stage, tmp / stage, {"processed_dir": str(tmp / "enrich_input"),
+                                                        "mode": args.enrich_mode}, stage_env)
+                    result["llm_requests"] = server.request_count
+            else:
+                processed = tmp / "process" / "processed"
+                if not processed.exists():
+                    prepare_processed(tmp / "raw", processed, args.repos, args.issues, args.chunk_size)
+                prepare_dataset(processed, tmp / "dataset")
+                result = spawn(stage, tmp / stage, {"dataset_dir": str(tmp / "dataset"),
+                                                    "repeat": args.analyze_repeat}, env)
+            results["stages"][stage] = result
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    changes, regressions = compare(results, baseline, args.tolerance)
+    results["baseline"] = {"path": str(args.baseline), "created_at": baseline.get("created_at"),
+                           "commit": baseline.get("commit"), "changes": changes, "regressions": regressions}
+    print_table(results, changes)
+
+    output = args.output or RESULTS_DIR / f"bench_{datetime.now():%Y%m%d_%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"\nResultados: {output}")
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2))
+        print(f"Baseline salvo em: {args.baseline}")
+    elif regressions:
+        print(f"\nREGRESSÕES (tolerância {args.tolerance:.0%}):\n  " + "\n  ".join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
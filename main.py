@@ -1,14 +1,29 @@
+import argparse
+import logging
 import sys
 from pathlib import Path
 
 # Adiciona o 'src' ao path para que possamos importar nossos módulos
 sys.path.append(str(Path(__file__).resolve().parent))
 
-from src.ingestion import main as run_ingestion
+from src import metrics
+from src.pipeline import build_pipeline, format_report
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pipeline completo do OSS Sentinel")
+    parser.add_argument("--force", nargs="*", metavar="ETAPA",
+                        help="Executa as etapas informadas (ou todas, sem nomes) mesmo sem mudanças")
+    args = parser.parse_args()
+    force = (True if not args.force else set(args.force)) if args.force is not None else False
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     print("Iniciando OSS Sentinel Pipeline...")
     try:
-        run_ingestion()
+        with metrics.run("pipeline"):
+            report = build_pipeline().run(force=force)
+        print(format_report(report))
+        if any(entry["status"] == "failed" for entry in report):
+            sys.exit(1)
     except Exception as e:
         print(f"Falha na execução do pipeline: {e}")
+        sys.exit(1)
@@ -0,0 +1,243 @@
+import sqlite3
+import threading
+import logging
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+AGGREGATES_PATH = BASE_DIR / "data" / "state" / "health_aggregates.sqlite"
+
+SENTIMENT_SCORES = {'positive': 1, 'neutral': 0, 'negative': -1}
+URGENCY_SCORES = {'low': 1, 'medium': 2, 'high': 3}
+COUNT_FIELDS = ("sentiment", "category", "urgency")
+# Colunas do dataset enriquecido necessárias para os agregados
+AGGREGATE_COLUMNS = ["id", "source_repo", "sentiment", "category", "urgency", "labels"]
+# Linhas por repositório (sem label) usam label vazio
+REPO_LEVEL = ""
+
+
+def _scores(values: pd.Series, scores: dict, default) -> np.ndarray:
+    """Score por valor via códigos categóricos; valores fora do mapa recebem `default`."""
+    codes = pd.Categorical(values, categories=list(scores)).codes
+    # Código -1 (desconhecido/nulo) cai no último elemento
+    table = np.array(list(scores.values()) + [default], dtype=np.float64)
+    return table[codes]
+
+
+def pain_index(sentiment: pd.Series, urgency: pd.Series) -> pd.Series:
+    """Pain Index = score de sentimento (-1..1) x score de urgência (1..3)."""
+    sentiment_score = _scores(sentiment, SENTIMENT_SCORES, 0)
+    urgency_score = _scores(urgency, URGENCY_SCORES, 1)
+    return pd.Series(sentiment_score * urgency_score, index=sentiment.index)
+
+
+class HealthAggregates:
+    """
+    Estatísticas suficientes de saúde por repositório e por repositório x
+    label, persistidas em SQLite: contagens por sentiment/category/urgency e
+    soma e soma dos quadrados do Pain Index.
+
+    `apply` incorpora linhas novas em O(linhas novas). A contribuição anterior
+    de cada issue fica guardada; se ela for reclassificada, a versão antiga é
+    retirada (peso -1) antes de a nova entrar (peso +1).
+    """
+
+    def __init__(self, path: Path = AGGREGATES_PATH, journal_mode="WAL"):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS issues (
+                id INTEGER PRIMARY KEY, source_repo TEXT, sentiment TEXT, category TEXT,
+                urgency TEXT, labels TEXT, pain REAL
+            );
+            CREATE TABLE IF NOT EXISTS counts (
+                source_repo TEXT, label TEXT, field TEXT, value TEXT, n INTEGER,
+                PRIMARY KEY (source_repo, label, field, value)
+            );
+            CREATE TABLE IF NOT EXISTS moments (
+                source_repo TEXT, label TEXT, n INTEGER, pain_sum REAL, pain_sq REAL,
+                PRIMARY KEY (source_repo, label)
+            );
+            CREATE TABLE IF NOT EXISTS watermarks (
+                source_repo TEXT PRIMARY KEY, last_ingested TEXT, updated_at TEXT
+            );
+            CREATE TABLE IF NOT EXISTS touched (
+                source_repo TEXT, day TEXT, PRIMARY KEY (source_repo, day)
+            );
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            """
+        )
+
+    @property
+    def initialized(self) -> bool:
+        """Se os agregados já cobrem o dataset inteiro (após um `rebuild`)."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'built_at'").fetchone()
+        return row is not None
+
+    def _previous(self, ids):
+        """Contribuição atualmente registrada para as issues informadas."""
+        keys = [int(i) for i in ids]
+        rows = []
+        for start in range(0, len(keys), 900):
+            batch = keys[start:start + 900]
+            placeholders = ",".join("?" * len(batch))
+            rows.extend(self._conn.execute(
+                f"SELECT id, source_repo, sentiment, category, urgency, labels, pain "
+                f"FROM issues WHERE id IN ({placeholders})", batch
+            ).fetchall())
+        return pd.DataFrame(rows, columns=["id", "source_repo", *COUNT_FIELDS, "labels", "pain"])
+
+    @staticmethod
+    def _expand_labels(delta: pd.DataFrame) -> pd.DataFrame:
+        """Uma linha por (issue, label exato) além da linha do repositório."""
+        tokens = delta['labels'].fillna("").astype(str).str.split(",").explode().str.strip()
+        per_label = delta.loc[tokens.index].assign(label=tokens.to_numpy())
+        per_label = per_label[per_label['label'] != ""].drop_duplicates(["id", "weight", "label"])
+        return pd.concat([delta.assign(label=REPO_LEVEL), per_label], ignore_index=True)
+
+    def apply(self, df: pd.DataFrame) -> int:
+        """
+        Incorpora (ou corrige) issues enriquecidas. `df` precisa das colunas
+        AGGREGATE_COLUMNS. Retorna o número de issues cuja versão anterior foi
+        retirada.
+        """
+        if df.empty:
+            return 0
+        new = df[AGGREGATE_COLUMNS].drop_duplicates("id", keep="last").copy()
+        for column in ["source_repo", *COUNT_FIELDS, "labels"]:
+            new[column] = new[column].astype(object).where(new[column].notna(), None)
+        new['id'] = new['id'].astype("int64")
+        new['pain'] = pain_index(new['sentiment'], new['urgency']).astype(float)
+
+        with self._lock, self._conn:
+            old = self._previous(new['id'])
+            delta = pd.concat([old.assign(weight=-1), new.assign(weight=1)], ignore_index=True)
+            long = self._expand_labels(delta)
+            long['pain_w'] = long['weight'] * long['pain']
+            long['pain_sq_w'] = long['weight'] * long['pain'] ** 2
+
+            keys = ['source_repo', 'label']
+            moments = long.groupby(keys, dropna=False)[['weight', 'pain_w', 'pain_sq_w']].sum().reset_index()
+            self._conn.executemany(
+                """
+                INSERT INTO moments VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (source_repo, label) DO UPDATE SET
+                    n = n + excluded.n, pain_sum = pain_sum + excluded.pain_sum,
+                    pain_sq = pain_sq + excluded.pain_sq
+                """,
+                moments.itertuples(index=False, name=None),
+            )
+            for field in COUNT_FIELDS:
+                counts = long.groupby([*keys, field], dropna=False)['weight'].sum()
+                counts = counts[counts != 0].reset_index()
+                counts.insert(2, 'field', field)
+                self._conn.executemany(
+                    """
+                    INSERT INTO counts VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (source_repo, label, field, value) DO UPDATE SET n = n + excluded.n
+                    """,
+                    ((repo, label, f, None if pd.isna(v) else v, int(n))
+                     for repo, label, f, v, n in counts.itertuples(index=False, name=None)),
+                )
+            self._conn.execute("DELETE FROM counts WHERE n = 0")
+            self._conn.execute("DELETE FROM moments WHERE n = 0")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO issues VALUES (?, ?, ?, ?, ?, ?, ?)",
+                new[["id", "source_repo", *COUNT_FIELDS, "labels", "pain"]].itertuples(index=False, name=None),
+            )
+        return len(old)
+
+    def mark_ingested(self, source_repo, last_ingested):
+        """Watermark: último arquivo incorporado para o repositório."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?)",
+                (source_repo, last_ingested, datetime.now().isoformat(timespec="seconds")),
+            )
+
+    def touch(self, source_repo, created_at: pd.Series):
+        """Registra os dias de criação de issues alteradas (consumidos pelas tendências)."""
+        days = pd.to_datetime(created_at, utc=True).dropna().dt.strftime("%Y-%m-%d").unique()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO touched VALUES (?, ?)", ((source_repo, day) for day in days)
+            )
+
+    def touched(self) -> pd.DataFrame:
+        """Pares (source_repo, created_at) registrados por `touch` e ainda não consumidos."""
+        with self._lock:
+            rows = self._conn.execute("SELECT source_repo, day FROM touched").fetchall()
+        touched = pd.DataFrame(rows, columns=["source_repo", "created_at"])
+        touched['created_at'] = pd.to_datetime(touched['created_at'], utc=True)
+        return touched
+
+    def clear_touched(self, touched: pd.DataFrame = None):
+        """Remove os pares já consumidos (todos, se `touched` for None)."""
+        with self._lock, self._conn:
+            if touched is None:
+                self._conn.execute("DELETE FROM touched")
+                return
+            self._conn.executemany(
+                "DELETE FROM touched WHERE source_repo = ? AND day = ?",
+                zip(touched['source_repo'], touched['created_at'].dt.strftime("%Y-%m-%d")),
+            )
+
+    def rebuild(self, chunks):
+        """Recalcula tudo do zero a partir de blocos do dataset enriquecido."""
+        with self._lock, self._conn:
+            for table in ("issues", "counts", "moments", "meta"):
+                self._conn.execute(f"DELETE FROM {table}")
+        rows = 0
+        for chunk in chunks:
+            self.apply(chunk)
+            rows += len(chunk)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('built_at', ?)", (datetime.now().isoformat(timespec="seconds"),)
+            )
+        logger.info(f"Agregados de saúde reconstruídos com {rows} issues.")
+        return rows
+
+    def _summary(self, where, params=()):
+        with self._lock:
+            moments = pd.read_sql_query(f"SELECT * FROM moments WHERE {where}", self._conn, params=params)
+            counts = pd.read_sql_query(f"SELECT * FROM counts WHERE {where}", self._conn, params=params)
+        keys = ["source_repo", "label"]
+        if moments.empty:
+            return pd.DataFrame(columns=keys)
+
+        counts['column'] = counts['field'].str.capitalize() + "_" + counts['value'].fillna("none")
+        wide = counts.pivot_table(index=keys, columns='column', values='n', aggfunc='sum', fill_value=0)
+        summary = moments.set_index(keys)
+        mean = summary['pain_sum'] / summary['n']
+        variance = (summary['pain_sq'] / summary['n'] - mean ** 2).clip(lower=0)
+        # Mesma ordem de colunas de health_summary.csv: Sentiment_*, Category_*, Urgency_*
+        prefixes = [field.capitalize() for field in COUNT_FIELDS]
+        ordered = sorted(wide.columns, key=lambda c: (prefixes.index(c.split("_", 1)[0]), c))
+        counts_wide = wide.reindex(index=summary.index, columns=ordered, fill_value=0)
+        result = pd.concat([summary['n'].rename("Total_Issues"), counts_wide.astype(int)], axis=1)
+        result["Pain_Index_Mean"] = mean.round(4)
+        result["Pain_Index_Std"] = np.sqrt(variance).round(4)
+        return result.reset_index()
+
+    def summary(self) -> pd.DataFrame:
+        """Uma linha por repositório (formato de health_summary.csv + Pain Index)."""
+        return self._summary("label = ?", (REPO_LEVEL,)).drop(columns="label")
+
+    def label_summary(self) -> pd.DataFrame:
+        """Uma linha por par repositório x label."""
+        return self._summary("label != ?", (REPO_LEVEL,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
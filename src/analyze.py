@@ -1,53 +1,44 @@
 import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
 import numpy as np
 from pathlib import Path
-import ast
+
+from src import metrics
+from src.aggregates import (
+    AGGREGATE_COLUMNS, AGGREGATES_PATH, SENTIMENT_SCORES, URGENCY_SCORES, HealthAggregates, pain_index,
+)
+from src.config import load_settings
+from src.report import ReportRenderer, heatmap_specs, label_group_specs, ranking_specs, repo_specs
+from src.storage import EnrichedStore, load_enriched
 
 # --- CONFIGURAÇÃO DE CAMINHOS E ESTILO ---
 BASE_DIR = Path(__file__).resolve().parent.parent
-ENRICHED_DIR = BASE_DIR / "data/enriched"
+ENRICHED_DATASET_DIR = BASE_DIR / "data/enriched/dataset"
 ANALYSIS_DIR = BASE_DIR / "data/analysis"
 PLOTS_DIR = ANALYSIS_DIR / "plots"
 
-# Garante pastas de saída
-ANALYSIS_DIR.mkdir(parents=True, exist_ok=True)
-PLOTS_DIR.mkdir(parents=True, exist_ok=True)
+# Colunas lidas do dataset enriquecido (o corpo das issues fica de fora)
+ANALYSIS_COLUMNS = ["id", "source_repo", "created_at", "sentiment", "urgency", "category", "labels"]
 
-# Estilo profissional para plots
-sns.set_theme(style="whitegrid")
+# Colunas usadas nas tendências por bucket de tempo
+TREND_COLUMNS = ["source_repo", "created_at", "closed_at", "sentiment", "urgency"]
+TRENDS_DIR = ANALYSIS_DIR / "trends"
+# Bucket -> nome do arquivo e janela móvel padrão (em buckets)
+TREND_FREQS = {"D": "daily", "W": "weekly"}
+ROLLING_WINDOWS = {"D": 7, "W": 4}
+BUCKET_SUMS = ["issues", "pain_sum", "high_urgency", "closed", "close_hours_sum"]
 
-def load_and_clean_data():
-    """Carrega dados, ignora POCs e adiciona source_repo."""
-    dfs = []
-    files = list(ENRICHED_DIR.glob("enriched_*.csv"))
-    
-    if not files:
-        print("Nenhum arquivo encontrado em data/enriched/")
-        return pd.DataFrame()
-
-    print(f"Carregando dados de {len(files)} arquivos...")
-
-    for file in files:
-        if "_poc" in file.name:
-            continue
-            
-        try:
-            df = pd.read_csv(file)
-            # Extrair nome do repositório
-            repo_name = file.stem.replace("enriched_", "")
-            df['source_repo'] = repo_name
-            dfs.append(df)
-        except Exception as e:
-            print(f"Erro ao ler {file.name}: {e}")
-
-    if not dfs:
-        return pd.DataFrame()
-        
-    full_df = pd.concat(dfs, ignore_index=True)
-    print(f"Total de registros carregados: {len(full_df)}")
-    return full_df
+def _report_settings():
+    return load_settings().get('analysis', {}).get('report', {})
+
+def render_figures(specs):
+    """
+    Desenha as figuras em data/analysis/plots (só as com dados alterados) e
+    atualiza o índice. matplotlib/seaborn só são importados se algo mudou.
+    """
+    result = ReportRenderer(PLOTS_DIR).render(specs)
+    print(f"Gráficos: {result['rendered']} desenhados, {result['skipped']} sem alteração, "
+          f"{result['removed']} removidos" + (f", {result['failed']} com erro" if result['failed'] else ""))
+    return result
 
 def feature_engineering(df):
     """Cria scores numéricos e o pain_index."""
@@ -55,12 +46,10 @@ def feature_engineering(df):
         return df
 
     # 1. Sentiment Score
-    sentiment_map = {'positive': 1, 'neutral': 0, 'negative': -1}
-    df['sentiment_score'] = df['sentiment'].map(sentiment_map).fillna(0)
+    df['sentiment_score'] = df['sentiment'].astype(object).map(SENTIMENT_SCORES).fillna(0)
 
     # 2. Urgency Score
-    urgency_map = {'low': 1, 'medium': 2, 'high': 3}
-    df['urgency_score'] = df['urgency'].map(urgency_map).fillna(1)
+    df['urgency_score'] = df['urgency'].astype(object).map(URGENCY_SCORES).fillna(1)
 
     # 3. Pain Index (Produto Sentimento * Urgência)
     # -3 (Muito Negativo + Alta Urgência) é o pior caso
@@ -69,127 +58,347 @@ def feature_engineering(df):
     
     return df
 
-def analyze_labels(df):
-    """Processa strings de labels e encontra os Top 5 globais."""
-    if df.empty or 'labels' not in df.columns:
-        return [], df
+def label_stats_from_summary(label_summary, top_n=5):
+    """
+    Top N labels globais e estatísticas repositório x label (contagem,
+    sentimento médio e Pain Index médio) a partir de health_label_summary,
+    sem reler o dataset. Os agregados dividem os labels em tokens exatos, um
+    por issue. Salva em data/analysis.
+    """
+    if label_summary.empty:
+        return [], None
 
-    # A coluna labels veio como string separada por vírgula do processing.py (ex: "bug, ui")
-    # Vamos separar e explodir
-    all_labels = df['labels'].str.split(',').explode()
-    
-    # Limpar espaços em branco
-    all_labels = all_labels.str.strip()
-    
-    # Remover vazios
-    all_labels = all_labels[all_labels != ""]
-    
-    # Contar frequência
-    label_counts = all_labels.value_counts()
-    
-    # Pegar Top 5
-    top_5_labels = label_counts.head(5).index.tolist()
-    
-    print(f"\nTop 5 Labels globais: {top_5_labels}")
-    
-    return top_5_labels, df
+    counts = label_summary['Total_Issues']
+    positive = label_summary.get('Sentiment_positive', 0)
+    negative = label_summary.get('Sentiment_negative', 0)
+    stats = pd.DataFrame({
+        "count": counts.astype(int).to_numpy(),
+        "mean_sentiment": ((positive - negative) / counts).to_numpy(),
+        "mean_pain_index": label_summary['Pain_Index_Mean'].to_numpy(),
+    }, index=pd.MultiIndex.from_frame(label_summary[['source_repo', 'label']])).sort_index()
 
-def generate_heatmap(df, top_labels):
-    """Gera heatmap de Sentimento Médio por Repo x Top Labels."""
-    if not top_labels:
-        return
+    # Empates na ordem alfabética do label
+    totals = stats['count'].groupby(level='label').sum().sort_values(ascending=False, kind="stable")
+    top_labels = totals.index[:top_n].tolist()
+    print(f"\nTop {top_n} Labels globais: {top_labels} ({len(totals)} labels distintos)")
 
-    # Preparar dados: Filtrar linhas que possuem PELO MENOS UM dos top labels
-    # Precisamos expandir os labels novamente para criar a tabela pivô
-    
-    # Cria uma cópia para não estragar o df principal
-    plot_df = df[['source_repo', 'sentiment_score', 'labels']].copy()
-    
-    # Para cada label dos top 5, verifica se está presente na string de labels da issue
-    # Criamos colunas binárias (one-hot encoding para presença do label)
-    for label in top_labels:
-        # Verifica se a string do label está dentro da coluna 'labels'
-        plot_df[f'has_{label}'] = plot_df['labels'].apply(lambda x: label in str(x))
-    
-    # Agora, para cada label top, filtramos onde has_label=True e agrupamos por repo
-    heatmap_data = []
-    
-    for label in top_labels:
-        subset = plot_df[plot_df[f'has_{label}']]
-        if not subset.empty:
-            avg_sentiment = subset.groupby('source_repo')['sentiment_score'].mean()
-            heatmap_data.append(avg_sentiment)
-    
-    if not heatmap_data:
+    stats_path = ANALYSIS_DIR / "repo_label_stats.csv"
+    stats.to_csv(stats_path)
+    print(f"Estatísticas repositório x label ({len(stats)} pares) salvas em: {stats_path}")
+    return top_labels, stats
+
+def generate_heatmap(stats, top_labels):
+    """Gera heatmap de Sentimento Médio por Repo x Top Labels."""
+    if not top_labels or stats is None or stats.empty:
         print("Dados insuficientes para gerar Heatmap.")
         return
 
-    # Criar DataFrame do Heatmap
-    heatmap_df = pd.DataFrame(heatmap_data).T
-    heatmap_df.columns = top_labels
-    
-    # Plotar
-    plt.figure(figsize=(10, 6))
-    sns.heatmap(heatmap_df, annot=True, cmap='coolwarm', center=0, fmt=".2f", linewidths=.5)
-    plt.title('Sentimento Médio por Repositório e Top Labels', fontsize=14, fontweight='bold')
-    plt.ylabel('Repositório', fontsize=12)
-    plt.xlabel('Label', fontsize=12)
-    plt.tight_layout()
-    
-    plot_path = PLOTS_DIR / "heatmap_sentiment_labels.png"
-    plt.savefig(plot_path)
-    print(f"Heatmap salvo em: {plot_path}")
-    plt.close()
+    # Uma página a cada analysis.report.repos_per_page repositórios
+    render_figures(heatmap_specs(stats, top_labels, _report_settings().get('repos_per_page', 40)))
+    print(f"Heatmap salvo em: {PLOTS_DIR / 'heatmap_sentiment_labels.png'}")
 
-def generate_health_barplot(df):
+def open_aggregates():
+    """Agregados de saúde no caminho configurado em analysis.aggregates_path."""
+    settings = load_settings()
+    path = settings.get('analysis', {}).get('aggregates_path')
+    journal_mode = settings.get('queue', {}).get('sqlite_journal_mode', 'WAL')
+    return HealthAggregates(BASE_DIR / path if path else AGGREGATES_PATH, journal_mode=journal_mode)
+
+def refresh_health_summary(aggregates=None):
+    """
+    Materializa health_summary.csv (por repositório) e health_label_summary.csv
+    (por repositório x label) a partir dos agregados incrementais, sem reler o
+    dataset. Na primeira execução os agregados são construídos do zero.
+    """
+    aggregates = aggregates or open_aggregates()
+    if not aggregates.initialized:
+        store = EnrichedStore(ENRICHED_DATASET_DIR)
+        store.import_legacy_csv()
+        columns = [c for c in AGGREGATE_COLUMNS if c != 'source_repo']
+        aggregates.rebuild(
+            chunk.assign(source_repo=source)
+            for source in store.sources()
+            for chunk in store.iter_source(source, 50_000, columns=columns)
+        )
+
+    summary = aggregates.summary()
+    summary.to_csv(ANALYSIS_DIR / "health_summary.csv", index=False)
+    aggregates.label_summary().to_csv(ANALYSIS_DIR / "health_label_summary.csv", index=False)
+    print(f"Resumo de saúde ({len(summary)} repositórios) salvo em: {ANALYSIS_DIR / 'health_summary.csv'}")
+    return summary
+
+def generate_health_barplot(summary):
     """Gera gráfico comparativo do Pain Index médio por Repositório."""
-    if df.empty:
+    if summary.empty:
         return
 
-    # Calcular média do pain index por repo
-    repo_pain = df.groupby('source_repo')['pain_index'].mean().reset_index()
-    
-    # Ordenar (opcional, mas bom para visualização: pior clima primeiro)
-    repo_pain = repo_pain.sort_values('pain_index', ascending=True)
+    # Pain index médio por repo, direto dos agregados (pior clima primeiro), paginado
+    specs = ranking_specs(summary, _report_settings().get('repos_per_page', 40))
+    render_figures(specs)
+    print(f"Barplot salvo em: {PLOTS_DIR / 'barplot_pain_index_comparison.png'}")
+    print_ranking(specs)
 
-    plt.figure(figsize=(10, 6))
-    # Usando uma paleta que indica intensidade
-    barplot = sns.barplot(x='pain_index', y='source_repo', data=repo_pain, palette="vlag")
-    
-    # Adicionar linha de referência (Neutro = 0)
-    plt.axvline(x=0, color='black', linestyle='--', linewidth=1)
-    
-    plt.title('Comparação de "Clima" (Pain Index Médio) por Repositório', fontsize=14, fontweight='bold')
-    plt.xlabel('Pain Index Médio (Negativo = Dor, Positivo = Oportunidade)', fontsize=12)
-    plt.ylabel('Repositório', fontsize=12)
-    plt.tight_layout()
-    
-    plot_path = PLOTS_DIR / "barplot_pain_index_comparison.png"
-    plt.savefig(plot_path)
-    print(f"Barplot salvo em: {plot_path}")
-    plt.close()
-    
-    # Imprimir ranking no terminal
+def print_ranking(specs):
+    """Imprime no terminal o ranking das páginas do barplot."""
+    ranking = pd.concat([spec.data["pain"] for spec in specs if spec.kind == "ranking"], ignore_index=True)
+    if ranking.empty:
+        return
     print("\n--- RANKING DE CLIMA (Pain Index Médio) ---")
-    print(repo_pain.to_string(index=False))
+    print(ranking.to_string(index=False))
 
-def main():
-    # 1. Load
-    df = load_and_clean_data()
+def render_report(label_stats, top_labels, summary, label_summary, weekly):
+    """
+    Todas as figuras do relatório de uma vez, num pool de processos: heatmap
+    e ranking (paginados), uma figura por repositório e os small multiples
+    dos labels mais frequentes. Só as figuras com dados alterados são
+    redesenhadas; o índice fica em data/analysis/plots/index.json.
+    """
+    cfg = _report_settings()
+    per_page = cfg.get('repos_per_page', 40)
+    specs = heatmap_specs(label_stats, top_labels, per_page) + ranking_specs(summary, per_page)
+    if cfg.get('repo_figures', True):
+        specs += repo_specs(summary, label_summary, weekly, cfg.get('weeks', 52), cfg.get('labels_per_repo', 10))
+    specs += label_group_specs(label_summary, cfg.get('label_groups', 4), cfg.get('labels_per_group', 6),
+                               cfg.get('repos_per_label', 15))
+    result = render_figures(specs)
+    print_ranking(specs)
+    print(f"Índice dos gráficos: {PLOTS_DIR / 'index.html'}")
+    return result
+
+def _as_utc(values):
+    """Timestamps em UTC; colunas que já vêm tipadas do Parquet não são reconvertidas."""
+    if isinstance(values.dtype, pd.DatetimeTZDtype):
+        return values.dt.tz_convert("UTC")
+    return pd.to_datetime(values, utc=True)
+
+def bucket_start(created_at, freq):
+    """Início do bucket (dia, ou segunda-feira da semana) em UTC, sem fuso."""
+    day = _as_utc(created_at).dt.tz_localize(None).dt.floor("D")
+    if freq == "W":
+        return day - pd.to_timedelta(day.dt.dayofweek, unit="D")
+    return day
+
+def _empty_buckets():
+    index = pd.MultiIndex.from_arrays([[], pd.DatetimeIndex([])], names=["source_repo", "bucket"])
+    return pd.DataFrame({column: pd.Series(dtype="float64") for column in BUCKET_SUMS}, index=index)
+
+def bucket_stats(df):
+    """
+    Somas suficientes por (repositório, bucket) para cada frequência: issues,
+    soma do Pain Index, issues de alta urgência, fechadas e horas até o
+    fechamento. Médias e taxas saem dessas somas.
+
+    Os buckets diários saem de um único groupby sobre todas as issues; os
+    semanais são a soma dos diários, sem nova passada pelas issues.
+    """
     if df.empty:
-        return
+        return {freq: _empty_buckets() for freq in TREND_FREQS}
 
-    # 2. Feature Engineering
-    df = feature_engineering(df)
+    created = _as_utc(df['created_at'])
+    hours = (_as_utc(df['closed_at']) - created).dt.total_seconds() / 3600
+    repo_codes, repos = pd.factorize(df['source_repo'], sort=True)
+    frame = pd.DataFrame({
+        "repo": repo_codes,
+        "bucket": bucket_start(created, "D").to_numpy(),
+        "issues": 1,
+        "pain_sum": pain_index(df['sentiment'], df['urgency']).to_numpy(),
+        "high_urgency": (df['urgency'] == 'high').to_numpy(dtype=int),
+        "closed": hours.notna().to_numpy(dtype=int),
+        "close_hours_sum": hours.fillna(0).to_numpy(),
+    })
+    daily = frame[frame['repo'] >= 0].dropna(subset=["bucket"]).groupby(["repo", "bucket"])[BUCKET_SUMS].sum()
 
-    # 3. Labels Analysis
-    top_labels, df = analyze_labels(df)
+    days = daily.index.get_level_values("bucket")
+    week = days - pd.to_timedelta(days.dayofweek, unit="D")
+    weekly = daily.groupby([daily.index.get_level_values("repo"), week])[BUCKET_SUMS].sum()
+
+    stats = {}
+    for freq, buckets in (("D", daily), ("W", weekly)):
+        codes = buckets.index.get_level_values(0)
+        buckets.index = pd.MultiIndex.from_arrays(
+            [np.asarray(repos, dtype=object)[codes], buckets.index.get_level_values(1)],
+            names=["source_repo", "bucket"],
+        )
+        stats[freq] = buckets
+    return stats
+
+class PainTrendEngine:
+    """
+    Tendências do Pain Index, da taxa de urgência alta e do tempo até o
+    fechamento por repositório, em buckets diários e semanais.
+
+    O estado em disco guarda as somas de cada (repositório, bucket). Quando
+    issues são alteradas, só os buckets dos seus dias de criação são
+    recalculados, lendo do dataset apenas as partições de mês envolvidas.
+    """
+
+    def __init__(self, state_dir=TRENDS_DIR, dataset_root=ENRICHED_DATASET_DIR):
+        self.state_dir = Path(state_dir)
+        self.dataset_root = Path(dataset_root)
+
+    def _state_path(self, freq):
+        return self.state_dir / f"buckets_{TREND_FREQS[freq]}.parquet"
+
+    @property
+    def built(self):
+        return all(self._state_path(freq).exists() for freq in TREND_FREQS)
+
+    def load_state(self, freq):
+        path = self._state_path(freq)
+        if not path.exists():
+            return _empty_buckets()
+        return pd.read_parquet(path)
+
+    def _save_state(self, freq, stats):
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._state_path(freq).with_suffix(".tmp")
+        stats.to_parquet(tmp_path)
+        tmp_path.replace(self._state_path(freq))
+
+    def build(self, df=None):
+        """Calcula todos os buckets a partir do dataset inteiro."""
+        if df is None:
+            df = load_enriched(columns=TREND_COLUMNS, root=self.dataset_root)
+        for freq, stats in bucket_stats(df).items():
+            self._save_state(freq, stats)
+        return len(df)
+
+    def update(self, touched):
+        """
+        Recalcula só os buckets afetados. `touched` tem `source_repo` e
+        `created_at` das issues novas ou alteradas.
+        """
+        if touched.empty:
+            return 0
+        touched = touched.assign(created_at=bucket_start(touched['created_at'], "D")).drop_duplicates()
+        repos = sorted(touched['source_repo'].unique())
+        # Uma semana pode começar no mês anterior ao do dia alterado
+        days = bucket_start(touched['created_at'], "D")
+        weeks = bucket_start(touched['created_at'], "W")
+        months = pd.concat([days, weeks, weeks + pd.Timedelta(days=6)]).dt.strftime("%Y-%m").unique()
+        df = load_enriched(columns=TREND_COLUMNS, repos=repos, months=list(months), root=self.dataset_root)
+
+        recomputed = 0
+        fresh_stats = bucket_stats(df)
+        for freq in TREND_FREQS:
+            affected = pd.MultiIndex.from_arrays(
+                [touched['source_repo'].to_numpy(), bucket_start(touched['created_at'], freq).to_numpy()],
+                names=["source_repo", "bucket"],
+            ).unique()
+            fresh = fresh_stats[freq]
+            fresh = fresh[fresh.index.isin(affected)]
+            # Buckets afetados que ficaram vazios simplesmente somem do estado
+            state = self.load_state(freq)
+            state = pd.concat([state[~state.index.isin(affected)], fresh]).sort_index()
+            self._save_state(freq, state)
+            recomputed += len(affected)
+        return recomputed
+
+    def trends(self, freq="W", window=None):
+        """
+        Série por repositório e bucket (buckets sem issues entram com zero),
+        com as métricas do bucket e as da janela móvel de `window` buckets.
+        Todos os repositórios são calculados juntos, numa matriz bucket x repo.
+        """
+        window = window or ROLLING_WINDOWS[freq]
+        stats = self.load_state(freq)
+        if stats.empty:
+            return pd.DataFrame()
+
+        wide = stats.unstack("source_repo", fill_value=0)
+        step = "D" if freq == "D" else "7D"
+        wide = wide.reindex(pd.date_range(wide.index.min(), wide.index.max(), freq=step), fill_value=0)
+        wide.index.name = "bucket"
+        rolled = wide.rolling(window, min_periods=1).sum()
+
+        def metrics(sums):
+            issues = sums['issues']
+            return {
+                "issues": issues,
+                "pain_index": sums['pain_sum'] / issues.where(issues > 0),
+                "high_urgency_rate": sums['high_urgency'] / issues.where(issues > 0),
+                "time_to_close_hours": sums['close_hours_sum'] / sums['closed'].where(sums['closed'] > 0),
+            }
+
+        columns = metrics(wide)
+        columns.update({f"{name}_rolling": value for name, value in metrics(rolled).items()})
+        # Matrizes bucket x repo achatadas em linhas (bucket, repo), mantendo os
+        # buckets sem issues (NaN) — sem stack(), cuja semântica mudou entre versões do pandas
+        repos = wide['issues'].columns
+        index = pd.MultiIndex.from_product([wide.index, repos], names=["bucket", "source_repo"])
+        result = pd.DataFrame(
+            {name: frame.reindex(columns=repos).to_numpy().ravel() for name, frame in columns.items()},
+            index=index,
+        )
+        result = result.swaplevel().sort_index().reset_index()
+
+        # Cada repositório começa no seu primeiro bucket com issues
+        first = stats.reset_index().groupby("source_repo")['bucket'].min()
+        return result[result['bucket'] >= result['source_repo'].map(first)].reset_index(drop=True)
+
+def refresh_trends(aggregates, engine=None):
+    """
+    Atualiza as tendências com os dias alterados desde a última execução (ou
+    constrói tudo na primeira) e salva uma tabela por bucket em data/analysis.
+    Devolve as tendências por frequência ("D", "W").
+    """
+    engine = engine or PainTrendEngine()
+    trends = {}
+    touched = aggregates.touched()
+    if not engine.built:
+        engine.build()
+        aggregates.clear_touched(touched)
+    elif not touched.empty:
+        buckets = engine.update(touched)
+        aggregates.clear_touched(touched)
+        print(f"Tendências: {buckets} buckets recalculados.")
+
+    for freq, name in TREND_FREQS.items():
+        trend_path = ANALYSIS_DIR / f"pain_trends_{name}.csv"
+        trends[freq] = engine.trends(freq)
+        trends[freq].to_csv(trend_path, index=False)
+        print(f"Tendências ({name}) salvas em: {trend_path}")
+    return trends
+
+def main():
+    with metrics.run("analyze"), metrics.span("analyze"):
+        return _run_analysis()
+
+def _run_analysis():
+    """
+    Relatório inteiro a partir dos agregados incrementais e do estado das
+    tendências: o dataset só é lido na primeira execução (construção dos
+    agregados) e nas partições dos dias alterados. Devolve o resumo por
+    repositório.
+    """
+    # Garante pastas de saída
+    ANALYSIS_DIR.mkdir(parents=True, exist_ok=True)
+    PLOTS_DIR.mkdir(parents=True, exist_ok=True)
+
+    # 1. Health summary (agregados incrementais)
+    aggregates = open_aggregates()
+    with metrics.span("analyze.health_summary"):
+        summary = refresh_health_summary(aggregates)
+    if summary.empty:
+        print("Nenhum dado encontrado em data/enriched/dataset/")
+        return summary
+    metrics.inc("rows_total", int(summary['Total_Issues'].sum()), stage="analyze")
+
+    # 2. Labels Analysis (pares repositório x label dos agregados)
+    with metrics.span("analyze.labels"):
+        label_summary = aggregates.label_summary()
+        top_labels, label_stats = label_stats_from_summary(label_summary)
+
+    # 3. Trends (só os buckets alterados desde a última execução)
+    with metrics.span("analyze.trends"):
+        trends = refresh_trends(aggregates)
+
+    # 4. Visualizations (só as figuras cujos dados mudaram)
+    with metrics.span("analyze.render"):
+        render_report(label_stats, top_labels, summary, label_summary, trends["W"])
 
-    # 4. Visualizations
-    generate_heatmap(df, top_labels)
-    generate_health_barplot(df)
-    
     print("\nAnálise Deep Diagnostic concluída. Verifique data/analysis/plots/.")
+    return summary
 
 if __name__ == "__main__":
     main()
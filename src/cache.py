@@ -0,0 +1,133 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+def _sha256(*parts: str) -> str:
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+
+class ClassificationCache:
+    """
+    Cache persistente (SQLite) endereçado por conteúdo para as classificações.
+
+    A chave é o hash de (modelo, system prompt, texto truncado). Entradas
+    geradas com outro modelo/prompt são descartadas ao abrir o cache, e a
+    evicção remove entradas antigas (max_age_days) e as menos usadas
+    recentemente além de max_entries.
+    """
+
+    def __init__(self, path: Path, model: str, system_prompt: str,
+                 max_entries=500_000, max_age_days=90, journal_mode="WAL"):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.model = model
+        self.system_prompt = system_prompt
+        self.fingerprint = _sha256(model, system_prompt)
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS classifications (
+                key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_classifications_accessed ON classifications(accessed_at)"
+        )
+        self._invalidate_stale()
+        self.evict()
+
+    def key(self, text: str) -> str:
+        return _sha256(self.model, self.system_prompt, text)
+
+    def _invalidate_stale(self):
+        """Remove entradas de outro modelo ou prompt."""
+        with self._lock, self._conn:
+            deleted = self._conn.execute(
+                "DELETE FROM classifications WHERE fingerprint != ?", (self.fingerprint,)
+            ).rowcount
+        if deleted:
+            logger.info(f"Cache: {deleted} entradas invalidadas (modelo/prompt alterado).")
+
+    def evict(self):
+        """Aplica os limites de idade e de tamanho."""
+        cutoff = time.time() - self.max_age_days * 86400
+        with self._lock, self._conn:
+            expired = self._conn.execute(
+                "DELETE FROM classifications WHERE created_at < ?", (cutoff,)
+            ).rowcount
+            overflow = self._conn.execute(
+                """
+                DELETE FROM classifications WHERE key IN (
+                    SELECT key FROM classifications ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            ).rowcount
+        if expired or overflow:
+            logger.info(f"Cache: {expired} entradas expiradas e {overflow} removidas por tamanho.")
+
+    def get(self, text: str, validate=None):
+        """
+        Resultado em cache para `text`, ou None. Com `validate`, uma entrada
+        rejeitada é apagada e contada como miss.
+        """
+        key = self.key(text)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM classifications WHERE key = ?", (key,)
+            ).fetchone()
+            result = json.loads(row[0]) if row is not None else None
+            if result is not None and validate is not None and not validate(result):
+                with self._conn:
+                    self._conn.execute("DELETE FROM classifications WHERE key = ?", (key,))
+                logger.warning("Cache: entrada inválida descartada.")
+                result = None
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE classifications SET accessed_at = ? WHERE key = ?", (time.time(), key)
+                )
+        return result
+
+    def put(self, text: str, result: dict):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO classifications VALUES (?, ?, ?, ?, ?)",
+                (self.key(text), self.fingerprint, json.dumps(result), now, now),
+            )
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
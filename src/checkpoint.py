@@ -0,0 +1,74 @@
+import json
+import sqlite3
+import threading
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class CheckpointJournal:
+    """
+    Journal de checkpoint (SQLite, somente inserção) com os resultados já
+    obtidos para um arquivo de entrada, indexado pelo `id` da issue.
+
+    Cada bloco é gravado numa única transação: um processo interrompido perde
+    no máximo o bloco em andamento, e a retomada consulta apenas os ids do
+    bloco atual, mantendo a memória constante.
+    """
+
+    def __init__(self, path: Path, journal_mode="WAL"):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Os blocos podem ser consumidos por threads de escrita (ex.: pyarrow)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        # WAL exige memória compartilhada: entre máquinas, use "DELETE" (queue.sqlite_journal_mode)
+        self._conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results (id TEXT PRIMARY KEY, payload TEXT NOT NULL)"
+        )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def _select(self, columns, ids):
+        keys = [str(i) for i in ids]
+        rows = []
+        # Limite de parâmetros por consulta do SQLite
+        with self._lock:
+            for start in range(0, len(keys), 900):
+                batch = keys[start:start + 900]
+                placeholders = ",".join("?" * len(batch))
+                rows.extend(self._conn.execute(
+                    f"SELECT {columns} FROM results WHERE id IN ({placeholders})", batch
+                ).fetchall())
+        return rows
+
+    def done_ids(self, ids):
+        """Subconjunto de `ids` que já tem resultado no journal (como str)."""
+        return {row[0] for row in self._select("id", ids)}
+
+    def append(self, ids, results):
+        """Grava os resultados de um bloco numa única transação."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO results VALUES (?, ?)",
+                [(str(i), json.dumps(result)) for i, result in zip(ids, results)],
+            )
+
+    def fetch(self, ids):
+        """Resultados na ordem de `ids` (None para ids ausentes)."""
+        found = {key: json.loads(payload) for key, payload in self._select("id, payload", ids)}
+        return [found.get(str(i)) for i in ids]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def remove(self):
+        """Fecha e apaga o journal (após a finalização do arquivo de saída)."""
+        self.close()
+        for suffix in ("", "-wal", "-shm"):
+            Path(f"{self.path}{suffix}").unlink(missing_ok=True)
@@ -0,0 +1,222 @@
+"""
+Comando único do OSS Sentinel: oss-sentinel <subcomando>.
+
+Cada subcomando importa o seu motor só quando executado; `status` lê apenas
+o settings.yaml e arquivos de estado (JSON/SQLite) e não carrega pandas,
+pyarrow, matplotlib nem o cliente OpenAI.
+"""
+import argparse
+import logging
+import os
+import re
+import sqlite3
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATA_DIR = BASE_DIR / "data"
+STATE_DIR = DATA_DIR / "state"
+
+IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def _configure_logging():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+# --- SUBCOMANDOS ---
+
+def cmd_ingest(args):
+    from src.ingestion import main
+    main()
+
+
+def cmd_process(args):
+    from src.processing import main
+    main()
+
+
+def cmd_enrich(args):
+    from src.enrichment import main
+    main(args.extra_args)
+
+
+def cmd_worker(args):
+    from src.worker import main
+    main(args.extra_args)
+
+
+def cmd_analyze(args):
+    from src.analyze import main
+    main()
+
+
+def cmd_run(args):
+    from src import metrics
+    from src.pipeline import build_pipeline, format_report
+
+    _configure_logging()
+    force = (True if not args.force else set(args.force)) if args.force is not None else False
+    with metrics.run("pipeline"):
+        report = build_pipeline().run(force=force)
+    print(format_report(report))
+    return 1 if any(entry["status"] == "failed" for entry in report) else 0
+
+
+def _read_state(name):
+    from src.state import StateStore
+    path = STATE_DIR / name
+    return dict(StateStore(path).items()) if path.exists() else {}
+
+
+def cmd_status(args):
+    """Resumo do estado em disco, sem importar nenhum motor."""
+    from src.config import load_settings
+    from src.state import StateStore
+
+    settings = load_settings()
+
+    print("Pipeline (última execução de cada etapa):")
+    pipeline = _read_state("pipeline_state.json")
+    if not pipeline:
+        print("  nunca executado")
+    for stage in ("ingest", "process", "enrich", "analyze"):
+        entry = pipeline.get(stage)
+        if entry:
+            print(f"  {stage:<8} {entry.get('finished_at', '-'):<20} {entry.get('rows', 0):>8} linhas "
+                  f"{entry.get('seconds', 0):>8.2f}s")
+
+    print("\nAlvos (watermark da ingestão, segmentos brutos, pendentes de processamento):")
+    ingestion = _read_state("ingestion_state.json")
+    manifest_path = DATA_DIR / "raw" / "manifest.json"
+    manifest = dict(StateStore(manifest_path).items()) if manifest_path.exists() else {}
+    cursors = _read_state("processing_state.json")
+    for source in sorted(set(ingestion) | set(manifest)):
+        segments = manifest.get(source, {}).get("segments", [])
+        last_read = cursors.get(source, {}).get("last_segment", 0)
+        pending = sum(1 for seg in segments if seg["seq"] > last_read)
+        watermark = ingestion.get(source, {}).get("watermark", "-")
+        print(f"  {source:<30} {watermark:<22} {len(segments):>4} segmentos {pending:>4} pendentes")
+
+    print("\nEnriquecimento:")
+    journals = list((DATA_DIR / "enriched" / ".journal").glob("*.sqlite"))
+    print(f"  journals em andamento: {len(journals)}")
+    jobs = _read_state("batch_jobs.json")
+    open_jobs = [name for name, job in jobs.items() if job.get("status") != "collected"]
+    print(f"  jobs da Batch API pendentes: {len(open_jobs)}")
+    dataset = DATA_DIR / "enriched" / "dataset"
+    repos = [p for p in dataset.glob("source_repo=*") if p.is_dir()] if dataset.exists() else []
+    print(f"  repositórios no dataset: {len(repos)}")
+
+    # Mesmos caminhos de open_aggregates (src/analyze.py) e open_queue (src/worker.py)
+    aggregates = BASE_DIR / (settings.get('analysis', {}).get('aggregates_path')
+                             or "data/state/health_aggregates.sqlite")
+    if aggregates.exists():
+        conn = sqlite3.connect(aggregates)
+        try:
+            issues = conn.execute("SELECT COUNT(*) FROM issues").fetchone()[0]
+            touched = conn.execute("SELECT COUNT(*) FROM touched").fetchone()[0]
+        except sqlite3.OperationalError:
+            issues = touched = 0
+        finally:
+            conn.close()
+        print(f"  issues nos agregados de saúde: {issues} ({touched} dias aguardando as tendências)")
+
+    queue = BASE_DIR / settings.get('queue', {}).get('path', "data/state/work_queue.sqlite")
+    if queue.exists():
+        print("\nFila de trabalho (pendentes/em curso/concluídas/falhas):")
+        conn = sqlite3.connect(queue)
+        try:
+            rows = conn.execute(
+                "SELECT kind, SUM(state = 'pending'), SUM(state = 'leased'), SUM(state = 'done'), "
+                "SUM(state = 'failed'), COUNT(DISTINCT owner) FROM units GROUP BY kind ORDER BY kind"
+            ).fetchall()
+        except sqlite3.OperationalError:
+            rows = []
+        finally:
+            conn.close()
+        for kind, pending, leased, done, failed, owners in rows:
+            print(f"  {kind:<16} {pending:>6} {leased:>6} {done:>8} {failed:>6}  ({owners} workers ativos)")
+    return 0
+
+
+# --- PERFIL DE IMPORTS ---
+
+def profile_imports(argv, top=20):
+    """
+    Reexecuta o subcomando com `python -X importtime` e resume os módulos
+    mais caros (tempo cumulativo dos imports de primeiro nível).
+    """
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "src.cli", *argv],
+        cwd=BASE_DIR, stderr=subprocess.PIPE, text=True,
+    )
+    elapsed = time.perf_counter() - start
+
+    entries, total_us, other_stderr = [], 0, []
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if not match:
+            if not line.startswith("import time:"):
+                other_stderr.append(line)
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        total_us += int(self_us)
+        if not indent:
+            entries.append((int(cumulative_us), module))
+    if other_stderr:
+        print("\n".join(other_stderr), file=sys.stderr)
+
+    entries.sort(reverse=True)
+    print(f"\n--- Imports de `{' '.join(argv)}`: {total_us / 1000:.0f} ms em imports, "
+          f"{elapsed * 1000:.0f} ms no total ---", file=sys.stderr)
+    print(f"{'ms (cumulativo)':>16}  módulo", file=sys.stderr)
+    for cumulative_us, module in entries[:top]:
+        print(f"{cumulative_us / 1000:>16.1f}  {module}", file=sys.stderr)
+    return result.returncode
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="oss-sentinel", description="OSS Sentinel: saúde de repositórios via issues")
+    parser.add_argument("--profile-imports", action="store_true",
+                        help="Mostra quanto tempo cada módulo levou para ser importado")
+    parser.add_argument("--metrics", action="store_true",
+                        help="Liga a instrumentação (data/metrics), como metrics.enabled no settings.yaml")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("ingest", help="Busca issues no GitHub (data/raw)").set_defaults(func=cmd_ingest)
+    sub.add_parser("process", help="Normaliza os segmentos brutos novos (data/processed)").set_defaults(func=cmd_process)
+    # As opções do enrich (--mode, --batch-prepare, ...) seguem para src.enrichment
+    sub.add_parser("enrich", help="Classifica as issues (aceita as opções de src.enrichment)",
+                   add_help=False).set_defaults(func=cmd_enrich)
+    # As opções do worker (--enqueue, --follow, --status, ...) seguem para src.worker
+    sub.add_parser("worker", help="Worker da fila compartilhada (aceita as opções de src.worker)",
+                   add_help=False).set_defaults(func=cmd_worker)
+    sub.add_parser("analyze", help="Gera métricas, tendências e gráficos (data/analysis)").set_defaults(func=cmd_analyze)
+    run = sub.add_parser("run", help="Pipeline completo, pulando etapas sem mudanças")
+    run.add_argument("--force", nargs="*", metavar="ETAPA",
+                     help="Executa as etapas informadas (ou todas, sem nomes) mesmo sem mudanças")
+    run.set_defaults(func=cmd_run)
+    sub.add_parser("status", help="Resumo do estado em disco (rápido)").set_defaults(func=cmd_status)
+    return parser
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if extra and args.command not in ("enrich", "worker"):
+        parser.error(f"argumentos não reconhecidos: {' '.join(extra)}")
+    args.extra_args = extra
+    if args.metrics:
+        os.environ["OSS_SENTINEL_METRICS"] = "1"
+    if args.profile_imports:
+        return profile_imports([a for a in argv if a != "--profile-imports"])
+    return args.func(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
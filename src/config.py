@@ -0,0 +1,22 @@
+import logging
+from pathlib import Path
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+CONFIG_PATH = BASE_DIR / "config" / "settings.yaml"
+
+
+def load_settings(path: Path = CONFIG_PATH) -> dict:
+    """Lê o arquivo de configuração settings.yaml"""
+    try:
+        with open(path, 'r') as f:
+            return yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        logger.error(f"Arquivo de configuração não encontrado em: {path}")
+        raise
+    except yaml.YAMLError as e:
+        logger.error(f"Erro ao ler YAML: {e}")
+        raise
@@ -0,0 +1,336 @@
+import json
+import os
+import re
+import logging
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.state import file_lock
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+INDEX_DIR = BASE_DIR / "data" / "state" / "minhash"
+
+_SHIFT = np.uint64(32)
+_WORD = re.compile(r"[a-z]+")
+_NOISE = re.compile(r"https?://\S+|<!--.*?-->|[0-9a-f]{7,}|\d+", re.S)
+
+
+def normalize_text(title, body) -> str:
+    """Minúsculas, sem URLs, comentários HTML, hashes e números (que variam entre re-envios)."""
+    text = f"{title or ''} {body if isinstance(body, str) else ''}".lower()
+    return " ".join(_WORD.findall(_NOISE.sub(" ", text)))
+
+
+def _shingles(text, size=3):
+    words = text.split()
+    if len(words) < size:
+        return words or [""]
+    return [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+def _choose_bands(num_perm, threshold):
+    """
+    Escolhe (bandas, linhas) cuja curva-S do LSH, (1/b)^(1/r), fique abaixo do
+    limiar: candidatos em excesso são filtrados na verificação, faltantes não.
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if (1 / bands) ** (1 / rows) <= threshold - 0.05:
+            best = (bands, rows)
+    return best
+
+
+def content_digest(titles, bodies) -> np.ndarray:
+    """Hash (uint64) do título + corpo originais: muda quando a issue é editada."""
+    texts = [f"{title or ''}\x1f{body if isinstance(body, str) else ''}" for title, body in zip(titles, bodies)]
+    return pd.util.hash_array(np.asarray(texts, dtype=object))
+
+
+def _stamp(directory: Path):
+    try:
+        stat = (directory / "index.npz").stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+# Grupo de uma issue: representante (issue id) e chave do grupo, o hash do
+# conteúdo do representante quando o grupo foi formado (chave dos rótulos)
+Assignment = namedtuple("Assignment", ["representative", "group"])
+
+# Versão do formato gravado em data/state/minhash (outra versão reconstrói o índice)
+FORMAT_VERSION = 2
+
+
+class MinHashIndex:
+    """
+    Índice MinHash/LSH persistente para agrupar issues quase duplicadas.
+
+    Cada issue recebe um representante: a primeira issue indexada do grupo
+    cuja similaridade de Jaccard estimada fica acima de `threshold`. Só as
+    issues novas ou editadas (hash do conteúdo diferente) são processadas a
+    cada execução; a versão anterior de uma issue editada sai do índice.
+
+    As chaves das bandas ficam em tabelas ordenadas (busca binária) mais uma
+    tabela recente, em dicionário, que só é fundida às ordenadas quando
+    cresce: indexar um bloco custa proporcional ao bloco, não ao índice.
+    """
+
+    # Colunas por entrada do índice, gravadas em index.npz
+    COLUMNS = ("ids", "signatures", "representatives", "groups", "digests", "band_keys", "alive")
+
+    def __init__(self, num_perm=128, threshold=0.8, seed=1, chunk_size=2000):
+        self.num_perm = num_perm
+        self.threshold = threshold
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.bands, self.rows = _choose_bands(num_perm, threshold)
+
+        # Família multiply-shift: h(x) = ((a * x + b) mod 2^64) >> 32, com a ímpar
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+
+        # Colunas com capacidade sobrando (crescem em dobro); só [:size] é válido
+        self._data = {
+            "ids": np.zeros(0, dtype=np.int64),
+            "signatures": np.zeros((0, num_perm), dtype=np.uint32),
+            "representatives": np.zeros(0, dtype=np.int64),
+            "groups": np.zeros(0, dtype=np.uint64),
+            "digests": np.zeros(0, dtype=np.uint64),
+            "band_keys": np.zeros((0, self.bands), dtype=np.uint64),
+            "alive": np.zeros(0, dtype=bool),
+        }
+        self.size = 0
+        # Rótulos já obtidos por grupo com mais de um membro (copiados para os demais)
+        self.labels = {}
+        # Entrada atual de cada issue id
+        self._position = {}
+        # Bandas das entradas [0, _sorted_upto): chaves ordenadas e posições
+        self._sorted_keys = None
+        self._orders = None
+        self._sorted_upto = 0
+        # Bandas das entradas seguintes: {(banda, chave): [posições]}
+        self._recent = {}
+        # Versão de index.npz lida/gravada por último (detecta gravações de outros workers)
+        self._saved_stamp = None
+
+    def column(self, name):
+        """Coluna `name` das entradas do índice (uma view, sem cópia)."""
+        return self._data[name][:self.size]
+
+    def compute_signatures(self, texts):
+        """Assinaturas MinHash (n x num_perm), vetorizadas por blocos de documentos."""
+        signatures = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        for start in range(0, len(texts), self.chunk_size):
+            block = texts[start:start + self.chunk_size]
+            shingles = [_shingles(text) for text in block]
+            lengths = np.fromiter((len(s) for s in shingles), dtype=np.int64, count=len(block))
+            flat = np.asarray([sh for doc in shingles for sh in doc], dtype=object)
+            hashes = pd.util.hash_array(flat)
+            # O overflow de uint64 é o "mod 2^64" desejado
+            # Layout (permutação, shingle): a redução por documento percorre memória contígua
+            permuted = ((self._a[:, None] * hashes[None, :] + self._b[:, None]) >> _SHIFT).astype(np.uint32)
+            offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+            signatures[start:start + len(block)] = np.minimum.reduceat(permuted, offsets, axis=1).T
+        return signatures
+
+    def _band_keys(self, signatures):
+        """Uma chave uint64 por (documento, banda)."""
+        keys = np.empty((len(signatures), self.bands), dtype=np.uint64)
+        for band in range(self.bands):
+            chunk = pd.DataFrame(signatures[:, band * self.rows:(band + 1) * self.rows])
+            keys[:, band] = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+        return keys
+
+    def _append(self, **columns):
+        """Acrescenta entradas (uma linha por posição de cada coluna) e as registra nas bandas."""
+        count = len(columns["ids"])
+        end = self.size + count
+        for name, values in columns.items():
+            buffer = self._data[name]
+            if end > len(buffer):
+                grown = np.empty((max(end, 2 * len(buffer), 1024),) + buffer.shape[1:], dtype=buffer.dtype)
+                grown[:self.size] = buffer[:self.size]
+                self._data[name] = buffer = grown
+            buffer[self.size:end] = values
+        for offset in range(count):
+            position = self.size + offset
+            if columns["alive"][offset]:
+                self._position[int(columns["ids"][offset])] = position
+            for band, key in enumerate(columns["band_keys"][offset]):
+                self._recent.setdefault((band, key), []).append(position)
+        self.size = end
+
+    def _compact(self):
+        """Funde a tabela recente às ordenadas (custo amortizado: só quando ela cresce)."""
+        keys = self.column("band_keys")
+        self._orders = np.argsort(keys, axis=0, kind="stable")
+        self._sorted_keys = np.take_along_axis(keys, self._orders, axis=0)
+        self._sorted_upto = self.size
+        self._recent = {}
+
+    def _candidates(self, keys):
+        """Entradas vivas que compartilham alguma banda com `keys`."""
+        candidates = []
+        for band, key in enumerate(keys):
+            if self._sorted_upto:
+                column = self._sorted_keys[:, band]
+                lo, hi = np.searchsorted(column, key, "left"), np.searchsorted(column, key, "right")
+                candidates.extend(self._orders[lo:hi, band].tolist())
+            candidates.extend(self._recent.get((band, key), ()))
+        if not candidates:
+            return np.zeros(0, dtype=np.int64)
+        candidates = np.unique(np.asarray(candidates, dtype=np.int64))
+        return candidates[self._data["alive"][candidates]]
+
+    def add(self, ids, titles, bodies):
+        """
+        Indexa as issues desconhecidas ou editadas desde a última indexação e
+        retorna {id: Assignment} para todas as issues informadas.
+        """
+        ids = [int(i) for i in ids]
+        digests = content_digest(titles, bodies)
+        alive = self._data["alive"]
+        new_positions = []
+        pending_ids = set()
+        for position, issue_id in enumerate(ids):
+            current = self._position.get(issue_id)
+            if current is not None and self._data["digests"][current] == digests[position]:
+                continue
+            if issue_id in pending_ids:
+                continue
+            if current is not None:
+                # Versão anterior sai do índice: a issue editada não casa consigo mesma
+                alive[current] = False
+                del self._position[issue_id]
+            pending_ids.add(issue_id)
+            new_positions.append(position)
+
+        if new_positions:
+            if self._sorted_keys is None or len(self._recent) > max(50_000, self._sorted_upto // 4 * self.bands):
+                self._compact()
+            texts = [normalize_text(titles[p], bodies[p]) for p in new_positions]
+            new_sigs = self.compute_signatures(texts)
+            new_keys = self._band_keys(new_sigs)
+            new_digests = digests[new_positions]
+            new_reps = np.empty(len(new_positions), dtype=np.int64)
+            new_groups = np.empty(len(new_positions), dtype=np.uint64)
+            signatures, representatives, groups = (
+                self.column("signatures"), self.column("representatives"), self.column("groups")
+            )
+            batch_buckets = {}
+
+            for k, position in enumerate(new_positions):
+                stored = self._candidates(new_keys[k])
+                batch = set()
+                for band in range(self.bands):
+                    key = new_keys[k, band]
+                    batch.update(batch_buckets.get((band, key), ()))
+                    batch_buckets.setdefault((band, key), []).append(k)
+
+                best_similarity, representative, group = -1.0, ids[position], new_digests[k]
+                if len(stored):
+                    similarity = (signatures[stored] == new_sigs[k]).mean(axis=1)
+                    best = similarity.argmax()
+                    best_similarity = similarity[best]
+                    representative, group = representatives[stored[best]], groups[stored[best]]
+                if batch:
+                    batch = np.fromiter(batch, dtype=np.int64)
+                    similarity = (new_sigs[batch] == new_sigs[k]).mean(axis=1)
+                    best = similarity.argmax()
+                    if similarity[best] > best_similarity:
+                        best_similarity = similarity[best]
+                        representative, group = new_reps[batch[best]], new_groups[batch[best]]
+                if best_similarity < self.threshold or representative == ids[position]:
+                    # Grupo novo (ou a issue editada que liderava o seu): chave = o próprio conteúdo
+                    representative, group = ids[position], new_digests[k]
+                new_reps[k], new_groups[k] = representative, group
+
+            self._append(
+                ids=np.asarray([ids[p] for p in new_positions], dtype=np.int64),
+                signatures=new_sigs,
+                representatives=new_reps,
+                groups=new_groups,
+                digests=new_digests,
+                band_keys=new_keys,
+                alive=np.ones(len(new_positions), dtype=bool),
+            )
+            logger.info(
+                f"MinHash: {len(new_positions)} issues novas ou editadas indexadas "
+                f"({int((new_reps != np.asarray([ids[p] for p in new_positions])).sum())} quase duplicadas)."
+            )
+
+        representatives, groups = self.column("representatives"), self.column("groups")
+        return {
+            issue_id: Assignment(int(representatives[self._position[issue_id]]), int(groups[self._position[issue_id]]))
+            for issue_id in ids
+        }
+
+    def _merge_saved(self, directory: Path):
+        """Incorpora as issues e os rótulos que outro processo gravou desde a última leitura."""
+        saved = MinHashIndex.load(directory, self.num_perm, self.threshold, self.seed)
+        saved_ids = saved.column("ids")
+        new = [p for p, issue_id in enumerate(saved_ids) if int(issue_id) not in self._position]
+        if new:
+            self._append(**{name: saved.column(name)[new] for name in self.COLUMNS})
+        for group, label in saved.labels.items():
+            self.labels.setdefault(group, label)
+
+    def save(self, directory: Path = INDEX_DIR):
+        """
+        Grava o índice (arquivos temporários + os.replace). Se outro processo
+        gravou o índice depois da nossa última leitura, as issues dele são
+        mescladas antes, em vez de sobrescritas.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        with file_lock(directory / ".lock"):
+            if _stamp(directory) not in (None, self._saved_stamp):
+                self._merge_saved(directory)
+            with open(directory / "index.npz.tmp", 'wb') as f:
+                np.savez(f, **{name: self.column(name) for name in self.COLUMNS})
+            for name, payload in (("labels.json", {str(k): v for k, v in self.labels.items()}),
+                                  ("meta.json", self._meta())):
+                with open(directory / f"{name}.tmp", 'w') as f:
+                    json.dump(payload, f)
+            for name in ("index.npz", "labels.json", "meta.json"):
+                os.replace(directory / f"{name}.tmp", directory / name)
+            self._saved_stamp = _stamp(directory)
+
+    def _meta(self):
+        return {"num_perm": self.num_perm, "threshold": self.threshold, "seed": self.seed, "version": FORMAT_VERSION}
+
+    @classmethod
+    def load(cls, directory: Path = INDEX_DIR, num_perm=128, threshold=0.8, seed=1):
+        """Carrega o índice salvo; parâmetros ou formato diferentes dos salvos descartam o índice."""
+        directory = Path(directory)
+        index = cls(num_perm=num_perm, threshold=threshold, seed=seed)
+        meta_path = directory / "meta.json"
+        if not meta_path.exists():
+            return index
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta != index._meta():
+            logger.info("Parâmetros ou formato do MinHash mudaram; reconstruindo o índice.")
+            return index
+
+        index._saved_stamp = _stamp(directory)
+        with np.load(directory / "index.npz") as data:
+            index._data = {name: data[name] for name in cls.COLUMNS}
+        index.size = len(index._data["ids"])
+        alive = index._data["alive"]
+        index._position = {int(issue_id): p for p, issue_id in enumerate(index._data["ids"]) if alive[p]}
+        labels_path = directory / "labels.json"
+        if labels_path.exists():
+            with open(labels_path) as f:
+                index.labels = {int(k): v for k, v in json.load(f).items()}
+        return index
@@ -1,125 +1,887 @@
 import os
+import argparse
 import pandas as pd
 import json
 import logging
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from dotenv import load_dotenv
+import openai
 from openai import OpenAI
 
+from src import metrics
+from src.aggregates import HealthAggregates
+from src.cache import ClassificationCache
+from src.checkpoint import CheckpointJournal
+from src.config import load_settings
+from src.dedup import MinHashIndex
+from src.local_model import LocalClassifier
+from src.processing import MAX_TEXT_CHARS
+from src.rate_limit import TokenBucket
+from src.state import StateStore
+from src.storage import EnrichedStore, iter_table, read_rows, read_table
+
 # --- CONFIGURAÇÃO DE AMBIENTE ---
 BASE_DIR = Path(__file__).resolve().parent.parent
 ENV_PATH = BASE_DIR / "config" / ".env"
 load_dotenv(ENV_PATH)
 
-# Configuração de Logs
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Inicializa cliente OpenAI
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> OpenAI:
+    """
+    Cliente OpenAI, criado no primeiro uso (classificações resolvidas por
+    cache/modelo local não precisam dele). As retentativas são feitas pelo
+    EnrichmentEngine; OPENAI_BASE_URL permite apontar para um servidor local.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+        return _client
+
+
+DEFAULT_MODEL = "gpt-4o-mini"
+SYSTEM_PROMPT = (
+    "You are a data classification expert. "
+    "Analyze the provided text (GitHub Issue) and return a strict JSON object. "
+    "Do not include markdown formatting or any text outside the JSON."
+    "JSON keys must be: sentiment, category, urgency."
+    "Possible values for sentiment: positive, neutral, negative."
+    "Possible values for category: bug, feature_request, documentation, question, other."
+    "Possible values for urgency: high, medium, low."
+)
+# Variante do prompt para várias issues numa única requisição (modo "packed")
+PACKED_SYSTEM_PROMPT = (
+    "You are a data classification expert. "
+    "You will receive several GitHub Issues, each one introduced by a line '### id: <id>'. "
+    "Classify every issue and return a strict JSON object with a single key 'results' "
+    "holding an array with one object per issue. "
+    "Do not include markdown formatting or any text outside the JSON."
+    "Each object must have the keys: id, sentiment, category, urgency."
+    "Possible values for sentiment: positive, neutral, negative."
+    "Possible values for category: bug, feature_request, documentation, question, other."
+    "Possible values for urgency: high, medium, low."
+)
+LABEL_VALUES = {
+    "sentiment": {"positive", "neutral", "negative"},
+    "category": {"bug", "feature_request", "documentation", "question", "other"},
+    "urgency": {"high", "medium", "low"},
+}
+ERROR_RESULT = {"sentiment": "error", "category": "unknown", "urgency": "unknown"}
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_JOBS_PATH = BASE_DIR / "data" / "state" / "batch_jobs.json"
+
+# Erros transitórios que valem nova tentativa (429, 5xx, rede/timeout)
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError)
+
+
+class IncompleteEnrichment(Exception):
+    """
+    Issues sem classificação válida depois de esgotadas as tentativas. Elas
+    ficam fora do journal e do dataset e são reclassificadas na retomada.
+    """
+
+
+def is_valid_result(result) -> bool:
+    """Confere se a classificação tem as três chaves com valores permitidos."""
+    return isinstance(result, dict) and all(result.get(k) in v for k, v in LABEL_VALUES.items())
+
+
+def build_text(title: str, body: str) -> str:
+    """Texto de uma issue enviado ao classificador (e usado no treino do modelo local)."""
+    text_content = f"Title: {title}\nBody: {body}"
+    # Trunca para evitar ultrapassar limites de token (segurança)
+    if len(text_content) > MAX_TEXT_CHARS:
+        text_content = text_content[:MAX_TEXT_CHARS] + "..."
+    return text_content
+
+
+def prompt_bodies(df: pd.DataFrame) -> pd.Series:
+    """Corpo usado no prompt: a versão compacta do processing, quando existir."""
+    if 'body_compact' not in df.columns:
+        return df['body']
+    if 'body' not in df.columns:
+        return df['body_compact'].fillna("")
+    # Linhas sem versão compacta (CSVs antigos) ou compactadas para um texto
+    # vazio (arquivos processados antes do fallback) usam o corpo original
+    compact = df['body_compact'].where(df['body_compact'].fillna("").astype(str).str.strip() != "")
+    return compact.fillna(df['body']).fillna("")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa grosseira (~4 caracteres por token) usada no orçamento de TPM."""
+    return len(text) // 4 + 1
+
 
 class EnrichmentEngine:
-    def __init__(self, processed_dir="data/processed", enriched_dir="data/enriched"):
+    def __init__(self, processed_dir="data/processed", enriched_dir="data/enriched",
+                 batch_dir="data/batch", config=None):
         self.processed_dir = BASE_DIR / processed_dir
+        # Parquets processados já incorporados ao dataset (não são enriquecidos de novo)
+        self.done_dir = self.processed_dir / "done"
         self.enriched_dir = BASE_DIR / enriched_dir
+        self.batch_dir = BASE_DIR / batch_dir
         self.enriched_dir.mkdir(parents=True, exist_ok=True)
 
+        settings = config if config is not None else load_settings()
+        cfg = settings.get('enrichment', {})
+        self.model = cfg.get('model', DEFAULT_MODEL)
+        self.max_concurrency = cfg.get('max_concurrency', 8)
+        self.max_retries = cfg.get('max_retries', 5)
+        self.max_output_tokens = cfg.get('max_output_tokens', 30)
+        # "single": uma issue por requisição; "packed": pack_size issues por requisição
+        self.mode = cfg.get('mode', 'single')
+        self.pack_size = cfg.get('pack_size', 10)
+        # Linhas lidas, classificadas e gravadas no journal por vez
+        self.chunk_size = cfg.get('chunk_size', 500)
+        self.journal_dir = self.enriched_dir / ".journal"
+        # Modo de journal dos SQLite compartilhados com outros workers (cache, agregados, journals)
+        self.journal_mode = settings.get('queue', {}).get('sqlite_journal_mode', 'WAL')
+        # Dataset Parquet particionado por repositório e mês de criação
+        self.store = EnrichedStore(self.enriched_dir / "dataset", legacy_dir=self.enriched_dir)
+        # Agregados de saúde atualizados com o delta de cada arquivo enriquecido
+        analysis_cfg = settings.get('analysis', {})
+        self.aggregates = HealthAggregates(
+            BASE_DIR / analysis_cfg.get('aggregates_path', "data/state/health_aggregates.sqlite"),
+            journal_mode=self.journal_mode,
+        )
+        # Orçamentos compartilhados por todas as chamadas em voo
+        self.request_bucket = TokenBucket(cfg.get('requests_per_minute', 500), 60)
+        self.token_bucket = TokenBucket(cfg.get('tokens_per_minute', 200000), 60)
+
+        # Cache persistente de classificações (invalidado se modelo/prompt mudarem)
+        cache_cfg = cfg.get('cache', {})
+        self.cache = None
+        if cache_cfg.get('enabled', True):
+            self.cache = ClassificationCache(
+                BASE_DIR / cache_cfg.get('path', "data/cache/classification.sqlite"),
+                model=self.model,
+                system_prompt=SYSTEM_PROMPT,
+                max_entries=cache_cfg.get('max_entries', 500_000),
+                max_age_days=cache_cfg.get('max_age_days', 90),
+                journal_mode=self.journal_mode,
+            )
+
+        # Modelo local: resolve sem LLM as issues classificadas com alta confiança
+        local_cfg = cfg.get('local_model', {})
+        self.local_model = None
+        self.local_hits = 0
+        model_path = BASE_DIR / local_cfg.get('path', "data/models/local_classifier.npz")
+        if local_cfg.get('enabled', True):
+            if model_path.exists():
+                self.local_model = LocalClassifier.load(
+                    model_path, confidence_threshold=local_cfg.get('confidence_threshold', 0.8)
+                )
+                logger.info(f"Modelo local carregado (holdout: {self.local_model.metrics}).")
+            else:
+                logger.info("Modelo local não encontrado; treine com: python -m src.local_model")
+
+        # Índice MinHash/LSH: classifica um representante por grupo de quase duplicadas
+        dedup_cfg = cfg.get('dedup', {})
+        self.dedup_index = None
+        self.dedup_dir = BASE_DIR / dedup_cfg.get('path', "data/state/minhash")
+        if dedup_cfg.get('enabled', True):
+            self.dedup_index = MinHashIndex.load(
+                self.dedup_dir,
+                num_perm=dedup_cfg.get('num_perm', 128),
+                threshold=dedup_cfg.get('threshold', 0.8),
+            )
+
+    def _retry_delay(self, error, attempt: int) -> float:
+        """Retry-After do servidor, se houver; senão backoff exponencial com jitter."""
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return random.uniform(0, min(60.0, 2 ** attempt))
+
+    def _request_body(self, system_prompt: str, user_content: str) -> dict:
+        """Parâmetros da chat completion (compartilhados pela API síncrona e pela Batch API)."""
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_content}
+            ],
+            "response_format": {"type": "json_object"},
+            "temperature": 0.1
+        }
+
+    def _record_response(self, response, headers, elapsed: float):
+        """Latência, tokens e saldo de rate limit (headers x-ratelimit-*) de uma resposta."""
+        metrics.observe("llm_request_seconds", elapsed, model=self.model, outcome="ok")
+        if not metrics.enabled():
+            return
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            metrics.inc("llm_tokens_total", usage.prompt_tokens or 0, model=self.model, direction="in")
+            metrics.inc("llm_tokens_total", usage.completion_tokens or 0, model=self.model, direction="out")
+        for resource in ("requests", "tokens"):
+            remaining = headers.get(f"x-ratelimit-remaining-{resource}")
+            limit = headers.get(f"x-ratelimit-limit-{resource}")
+            if remaining is not None and limit is not None:
+                metrics.set_gauge("rate_limit_remaining", int(remaining), api="openai", resource=resource)
+                metrics.set_gauge("rate_limit_limit", int(limit), api="openai", resource=resource)
+
+    def _create_completion(self, request_body: dict, estimated_tokens: int):
+        """Chama a API respeitando RPM/TPM e retentando 429/5xx com backoff."""
+        for attempt in range(self.max_retries + 1):
+            self.request_bucket.acquire()
+            self.token_bucket.acquire(estimated_tokens)
+            start = time.perf_counter()
+            try:
+                raw = get_client().chat.completions.with_raw_response.create(**request_body)
+                response = raw.parse()
+                self._record_response(response, raw.headers, time.perf_counter() - start)
+                return response
+            except RETRYABLE_ERRORS as e:
+                metrics.observe("llm_request_seconds", time.perf_counter() - start,
+                                model=self.model, outcome=type(e).__name__)
+                if attempt == self.max_retries:
+                    raise
+                delay = self._retry_delay(e, attempt)
+                logger.warning(f"OpenAI indisponível ({type(e).__name__}), nova tentativa em {delay:.1f}s.")
+                if isinstance(e, openai.RateLimitError):
+                    # 429 afeta todas as chamadas em voo: pausa o orçamento compartilhado
+                    self.request_bucket.pause(delay)
+                else:
+                    time.sleep(delay)
+
+    def _classify_text(self, text_content: str):
+        """Classifica um texto já montado via API (sem consultar o cache)."""
+        request_body = self._request_body(SYSTEM_PROMPT, text_content)
+        estimated = estimate_tokens(SYSTEM_PROMPT + text_content) + self.max_output_tokens
+
+        try:
+            response = self._create_completion(request_body, estimated)
+            result = json.loads(response.choices[0].message.content)
+        except Exception as e:
+            logger.error(f"Erro na chamada OpenAI: {e}")
+            return dict(ERROR_RESULT)
+
+        if self.cache is not None and is_valid_result(result):
+            self.cache.put(text_content, result)
+        return result
+
     def classify_issue(self, title: str, body: str):
         """Envia title e body para o gpt-4o-mini e retorna dict JSON."""
-        text_content = f"Title: {title}\nBody: {body}"
-        # Trunca para evitar ultrapassar limites de token (segurança)
-        if len(text_content) > 2000:
-            text_content = text_content[:2000] + "..."
+        text_content = build_text(title, body)
+        if self.cache is not None:
+            cached = self.cache.get(text_content, validate=is_valid_result)
+            if cached is not None:
+                return cached
+        return self._classify_text(text_content)
 
+    def classify_packed(self, pack):
+        """
+        Classifica várias issues [(id, texto), ...] numa única requisição, que
+        devolve um array JSON indexado pelo `id`. Itens ausentes ou inválidos
+        na resposta são reclassificados individualmente.
+        Retorna os resultados na ordem de `pack`.
+        """
+        user_content = "\n\n".join(f"### id: {issue_id}\n{text}" for issue_id, text in pack)
+        request_body = self._request_body(PACKED_SYSTEM_PROMPT, user_content)
+        estimated = (
+            estimate_tokens(PACKED_SYSTEM_PROMPT + user_content)
+            + self.max_output_tokens * len(pack)
+        )
+
+        by_id = {}
         try:
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": (
-                            "You are a data classification expert. "
-                            "Analyze the provided text (GitHub Issue) and return a strict JSON object. "
-                            "Do not include markdown formatting or any text outside the JSON."
-                            "JSON keys must be: sentiment, category, urgency."
-                            "Possible values for sentiment: positive, neutral, negative."
-                            "Possible values for category: bug, feature_request, documentation, question, other."
-                            "Possible values for urgency: high, medium, low."
-                        )
-                    },
-                    {"role": "user", "content": text_content}
-                ],
-                response_format={"type": "json_object"},
-                temperature=0.1
-            )
-            return json.loads(response.choices[0].message.content)
+            response = self._create_completion(request_body, estimated)
+            payload = json.loads(response.choices[0].message.content)
+            for item in payload.get("results", []):
+                if isinstance(item, dict):
+                    by_id[str(item.get("id"))] = item
         except Exception as e:
-            logger.error(f"Erro na chamada OpenAI: {e}")
-            return {"sentiment": "error", "category": "unknown", "urgency": "unknown"}
+            logger.warning(f"Resposta agrupada inválida, recorrendo a chamadas individuais: {e}")
+
+        results = []
+        fallbacks = 0
+        for issue_id, text in pack:
+            item = by_id.get(str(issue_id))
+            if is_valid_result(item):
+                result = {key: item[key] for key in LABEL_VALUES}
+                if self.cache is not None:
+                    self.cache.put(text, result)
+            else:
+                fallbacks += 1
+                result = self._classify_text(text)
+            results.append(result)
+
+        if fallbacks:
+            logger.warning(f"{fallbacks}/{len(pack)} itens do pacote reclassificados individualmente.")
+        return results
+
+    def _resolve_without_llm(self, texts):
+        """
+        Camadas sem custo de API, em ordem: cache e modelo local (só acima do
+        limiar de confiança). Retorna a lista de resultados, com None para o
+        que ainda precisa ir ao LLM.
+        """
+        results = [None] * len(texts)
+        if self.cache is not None:
+            results = [self.cache.get(text, validate=is_valid_result) for text in texts]
+            hits = sum(result is not None for result in results)
+            metrics.inc("cache_lookups_total", hits, cache="classification", result="hit")
+            metrics.inc("cache_lookups_total", len(texts) - hits, cache="classification", result="miss")
+
+        pending = [position for position, result in enumerate(results) if result is None]
+        if self.local_model is not None and pending:
+            predicted, confidence = self.local_model.predict([texts[p] for p in pending])
+            confident = confidence >= self.local_model.confidence_threshold
+            for position, record, accepted in zip(pending, predicted.to_dict('records'), confident):
+                if accepted:
+                    results[position] = dict(record, label_source="local_model")
+            self.local_hits += int(confident.sum())
+            metrics.inc("enrich_resolved_total", int(confident.sum()), path="local_model")
+        return results
+
+    def classify_dataframe(self, df: pd.DataFrame):
+        """
+        Classifica todas as linhas: primeiro cache e modelo local; o restante vai
+        ao LLM mantendo até `max_concurrency` chamadas em voo (cada chamada leva
+        uma issue, ou `pack_size` issues no modo "packed").
+        Retorna a lista de resultados na mesma ordem das linhas de entrada.
+        """
+        total = len(df)
+        start = time.perf_counter()
+
+        ids = df['id'].tolist() if 'id' in df.columns else list(range(total))
+        texts = [build_text(title, body) for title, body in zip(df['title'], prompt_bodies(df))]
+        results = [None] * total
+
+        # 1. Quase duplicadas: só o primeiro membro de cada grupo segue adiante.
+        # Rótulos salvos de um grupo só valem para os seus demais membros; o
+        # representante (ou uma issue editada que formou grupo novo) passa pelo
+        # cache e pelo LLM como qualquer issue
+        work = list(range(total))
+        use_dedup = self.dedup_index is not None and 'id' in df.columns
+        if use_dedup:
+            assignments = self.dedup_index.add(ids, df['title'].tolist(), df['body'].tolist())
+            groups = [assignments[int(issue_id)] for issue_id in ids]
+            group_sizes = Counter(group for _, group in groups)
+            leaders = {}
+            work = []
+            for position, (representative, group) in enumerate(groups):
+                member = representative != int(ids[position])
+                if member and group in self.dedup_index.labels:
+                    results[position] = dict(self.dedup_index.labels[group])
+                elif group not in leaders:
+                    leaders[group] = position
+                    work.append(position)
+
+        # 2. Cache e modelo local
+        for position, result in zip(work, self._resolve_without_llm([texts[p] for p in work])):
+            results[position] = result
+
+        # 3. LLM para o restante
+        pending = [position for position in work if results[position] is None]
+        metrics.inc("enrich_resolved_total", total - len(work), path="duplicate")
+        metrics.inc("enrich_resolved_total", len(pending), path="llm")
+        unit_size = self.pack_size if self.mode == "packed" else 1
+        log_every = max(10, len(pending) // 20)
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            futures = {}
+            for offset in range(0, len(pending), unit_size):
+                unit = pending[offset:offset + unit_size]
+                if self.mode == "packed":
+                    future = executor.submit(self.classify_packed, [(ids[p], texts[p]) for p in unit])
+                else:
+                    future = executor.submit(lambda p: [self._classify_text(texts[p])], unit[0])
+                futures[future] = unit
+
+            done = 0
+            for future in as_completed(futures):
+                unit = futures[future]
+                for position, result in zip(unit, future.result()):
+                    results[position] = result
+                previous, done = done, done + len(unit)
+                if done // log_every > previous // log_every:
+                    logger.info(f"Progresso: {done}/{len(pending)} linhas enviadas ao LLM...")
+
+        # 4. Copia os rótulos do representante para os demais membros do grupo e
+        # guarda os dos grupos com mais de um membro (chave: conteúdo do representante)
+        if use_dedup:
+            for group, position in leaders.items():
+                multi_member = group_sizes[group] > 1 or groups[position].representative != int(ids[position])
+                if multi_member and is_valid_result(results[position]):
+                    self.dedup_index.labels[group] = {key: results[position][key] for key in LABEL_VALUES}
+            results = [
+                dict(
+                    result if result is not None else results[leaders[group]],
+                    duplicate_of=representative if representative != int(issue_id) else None,
+                )
+                for result, (representative, group), issue_id in zip(results, groups, ids)
+            ]
+
+        # 5. Origem dos rótulos: cache e LLM contam como "llm"; só essas linhas
+        # treinam o modelo local
+        in_work = set(work)
+        results = [
+            dict(result, label_source=result.get("label_source", "llm") if position in in_work else "duplicate")
+            for position, result in enumerate(results)
+        ]
+
+        elapsed = time.perf_counter() - start
+        logger.info(
+            f"{total} issues classificadas em {elapsed:.2f}s "
+            f"({total / elapsed if elapsed else 0:.1f} issues/s; {total - len(pending)} sem LLM "
+            f"(cache, modelo local ou duplicatas), "
+            f"{len(pending)} via LLM no modo {self.mode}, concorrência {self.max_concurrency})."
+        )
+        return results
+
+    def _source_name(self, processed_file: Path) -> str:
+        """
+        Repositório de origem a partir do nome do arquivo processado.
+        Exemplo Input: processed_apache_superset_20231223_120000.parquet
+        Exemplo Output: apache_superset
+        """
+        stem = processed_file.stem # remove .parquet
+        # Remover prefixo 'processed_'
+        if stem.startswith("processed_"):
+            stem = stem[len("processed_"):]
+        
+        # Remover timestamp do final (últimos 2 underscores: _YYYYMMDD_HHMMSS)
+        # Assume padrão: nome_repo_DATA_HORA
+        parts = stem.rsplit('_', 2)
+        return parts[0] if len(parts) == 3 else stem
+
+    def _add_label_columns(self, df: pd.DataFrame, results):
+        """
+        Adiciona as colunas de classificação, `duplicate_of` (nula sem dedup) e
+        `label_source` (llm, local_model ou duplicate).
+        """
+        df['sentiment'] = [res.get('sentiment') for res in results]
+        df['category'] = [res.get('category') for res in results]
+        df['urgency'] = [res.get('urgency') for res in results]
+        df['duplicate_of'] = pd.array([res.get('duplicate_of') for res in results], dtype="Int64")
+        df['label_source'] = [res.get('label_source') for res in results]
+        return df
+
+    def _journal(self, checkpoint_name: str) -> CheckpointJournal:
+        return CheckpointJournal(self.journal_dir / f"{checkpoint_name}.sqlite", journal_mode=self.journal_mode)
+
+    def enrich_file(self, processed_file: Path) -> int:
+        """Enriquece um Parquet processado de data/processed (devolve as issues sem classificação válida)."""
+        chunks = lambda columns=None: iter_table(processed_file, self.chunk_size, columns)
+        return self._enrich(self._source_name(processed_file), chunks, processed_file.stem, processed_file.name)
+
+    def enrich_frame(self, source: str, df: pd.DataFrame, checkpoint_name: str = None):
+        """
+        Enriquece issues já normalizadas em memória (entregues pelo pipeline),
+        sem Parquet intermediário. `checkpoint_name` identifica o journal: a
+        mesma entrada, se interrompida, retoma de onde parou.
+        """
+        def chunks(columns=None):
+            frame = df if columns is None else df[columns]
+            for start in range(0, len(frame), self.chunk_size):
+                yield frame.iloc[start:start + self.chunk_size].copy()
+
+        return self._enrich(source, chunks, checkpoint_name or f"pipeline_{source}", f"{source} ({len(df)} issues)")
+
+    def enrich_chunk(self, processed_file: Path, start: int, stop: int) -> int:
+        """
+        Classifica as linhas [start, stop) de um Parquet processado e grava os
+        resultados no journal do arquivo (unidade `enrich.chunk` da fila de
+        trabalho). Vários workers podem tratar blocos do mesmo arquivo ao
+        mesmo tempo; o dataset só é gravado por `finalize_file`. Devolve o
+        número de issues classificadas; IncompleteEnrichment se alguma ficou
+        sem classificação válida (a unidade volta para a fila).
+        """
+        if self._consumed(processed_file):
+            logger.info(f"{processed_file.name} já foi incorporado ao dataset; bloco ignorado.")
+            return 0
+        journal = self._journal(processed_file.stem)
+        try:
+            chunk = read_rows(processed_file, start, stop)
+            pending = chunk[~chunk['id'].astype(str).isin(journal.done_ids(chunk['id']))]
+            unresolved = 0
+            if not pending.empty:
+                with metrics.span("enrich.chunk", source=self._source_name(processed_file)):
+                    unresolved = self._journal_results(journal, pending, self.classify_dataframe(pending))
+                metrics.inc("rows_total", len(pending), stage="enrich")
+            logger.info(f"{processed_file.name} [{start}:{stop}]: {len(pending)} issues classificadas.")
+        finally:
+            journal.close()
+        if unresolved:
+            raise IncompleteEnrichment(f"{processed_file.name} [{start}:{stop}]: {unresolved} issues sem classificação válida")
+        return len(pending)
+
+    def finalize_file(self, processed_file: Path):
+        """
+        Junta o journal completo de um arquivo (todos os blocos já
+        classificados) ao dataset e aos agregados, apaga o journal e move o
+        arquivo para data/processed/done.
+        """
+        if self._consumed(processed_file):
+            logger.info(f"{processed_file.name} já foi incorporado ao dataset.")
+            return
+        chunks = lambda columns=None: iter_table(processed_file, self.chunk_size, columns)
+        journal = self._journal(processed_file.stem)
+        self._finalize_output(self._source_name(processed_file), chunks, journal, processed_file.name)
+        journal.remove()
+        self.mark_consumed(processed_file)
+        # Uma gravação do índice por arquivo (mescla os grupos vistos pelos demais workers)
+        self.save_dedup_index()
+
+    def _consumed(self, processed_file: Path) -> bool:
+        return not processed_file.exists() and (self.done_dir / processed_file.name).exists()
+
+    def mark_consumed(self, processed_file: Path):
+        """
+        Move um Parquet processado já incorporado ao dataset para
+        data/processed/done: o processamento grava um delta novo a cada
+        execução, e só os ainda não incorporados devem ser enriquecidos.
+        """
+        self.done_dir.mkdir(parents=True, exist_ok=True)
+        os.replace(processed_file, self.done_dir / processed_file.name)
+
+    def save_dedup_index(self):
+        """Grava o índice MinHash (uma vez por arquivo ou execução, não por bloco)."""
+        if self.dedup_index is not None:
+            self.dedup_index.save(self.dedup_dir)
+
+    def _journal_results(self, journal: CheckpointJournal, chunk: pd.DataFrame, results) -> int:
+        """
+        Grava no journal só as classificações válidas: as que falharam depois
+        de esgotadas as tentativas ficam de fora, para que a retomada ou a
+        próxima execução as tente de novo. Devolve quantas ficaram de fora.
+        """
+        valid = [is_valid_result(result) for result in results]
+        journal.append(
+            [issue_id for issue_id, ok in zip(chunk['id'], valid) if ok],
+            [result for result, ok in zip(results, valid) if ok],
+        )
+        unresolved = len(results) - sum(valid)
+        metrics.inc("enrich_resolved_total", unresolved, path="unresolved")
+        return unresolved
+
+    def _enrich(self, source: str, chunks, checkpoint_name: str, label: str) -> int:
+        """
+        Enriquece a entrada em blocos de `chunk_size` linhas. Os resultados de
+        cada bloco vão para um journal de checkpoint antes do próximo; se o
+        processo for interrompido, a próxima execução pula os ids já
+        registrados. Ao final, as linhas do repositório são regravadas no
+        dataset enriquecido em streaming.
+
+        Issues sem classificação válida ficam fora do dataset e o journal é
+        mantido, para que a próxima execução reclassifique só elas. Devolve
+        quantas ficaram de fora.
+
+        `chunks(columns=None)` devolve um novo iterador de blocos a cada chamada.
+        """
+        journal = self._journal(checkpoint_name)
+        resumed = len(journal)
+        if resumed:
+            logger.info(f"Retomando {label}: {resumed} issues já enriquecidas no journal.")
+
+        classified = unresolved = 0
+        for chunk in chunks():
+            done = journal.done_ids(chunk['id'])
+            pending = chunk[~chunk['id'].astype(str).isin(done)]
+            if pending.empty:
+                continue
+            with metrics.span("enrich.chunk", source=source):
+                unresolved += self._journal_results(journal, pending, self.classify_dataframe(pending))
+            classified += len(pending)
+            metrics.inc("rows_total", len(pending), stage="enrich")
+            logger.info(f"{label}: {resumed + classified - unresolved} issues no journal.")
+
+        self._finalize_output(source, chunks, journal, label)
+        if unresolved:
+            logger.warning(
+                f"{label}: {unresolved} issues sem classificação válida ficaram fora do dataset; "
+                f"serão reclassificadas na próxima execução."
+            )
+            journal.close()
+        else:
+            journal.remove()
+        return unresolved
+
+    def _labeled(self, chunk: pd.DataFrame, journal: CheckpointJournal) -> pd.DataFrame:
+        """Linhas do bloco com resultado no journal, com as colunas de classificação."""
+        results = journal.fetch(chunk['id'])
+        found = [result is not None for result in results]
+        if not all(found):
+            chunk = chunk[found].copy()
+        return self._add_label_columns(chunk, [result for result in results if result is not None])
+
+    def _finalize_output(self, source: str, chunks, journal: CheckpointJournal, label: str):
+        """
+        Junta a entrada com o journal, bloco a bloco, e faz o upsert por id no
+        dataset: como o processamento entrega só as issues novas ou alteradas,
+        só as partições de mês dessas issues são regravadas e o resto do
+        repositório fica como está. Linhas da entrada sem resultado no
+        journal não entram.
+        """
+        # CSVs enriquecidos antigos entram no dataset antes de serem mesclados
+        self.store.import_legacy_csv()
+        stats = self.store.upsert_source(source, (self._labeled(chunk, journal) for chunk in chunks()))
+        logger.info(
+            f"Dataset enriquecido de {source}: {stats.rows} issues gravadas em {stats.partitions} partições "
+            f"({stats.kept} mantidas nessas partições)."
+        )
+        self._fold_aggregates(source, chunks, journal, label)
+
+    def _fold_aggregates(self, source: str, chunks, journal: CheckpointJournal, label: str):
+        """
+        Incorpora aos agregados de saúde só as issues desta entrada (novas ou
+        reclassificadas) e registra seus dias de criação para as tendências.
+        Antes do primeiro `rebuild` feito pela análise, os agregados não cobrem
+        o dataset e apenas o watermark e os dias são registrados.
+        """
+        initialized = self.aggregates.initialized
+        retracted = 0
+        for chunk in chunks(columns=["id", "labels", "created_at"]):
+            delta = self._labeled(chunk, journal)
+            # Dias de criação alterados: as tendências recalculam só esses buckets
+            self.aggregates.touch(source, delta['created_at'])
+            if initialized:
+                retracted += self.aggregates.apply(delta.assign(source_repo=source))
+        if initialized:
+            logger.info(f"Agregados de saúde de {source} atualizados ({retracted} issues reclassificadas).")
+        self.aggregates.mark_ingested(source, label)
 
     def run_batch(self):
-        """Varre todos CSVs em data/processed, enriquece e salva em data/enriched."""
-        csv_files = sorted(list(self.processed_dir.glob("processed_*.csv")))
+        """Varre todos os Parquets em data/processed, enriquece e salva em data/enriched/dataset."""
+        processed_files = sorted(list(self.processed_dir.glob("processed_*.parquet")))
         
-        if not csv_files:
-            logger.warning("Nenhum CSV processado encontrado em data/processed.")
+        if not processed_files:
+            logger.warning("Nenhum arquivo processado encontrado em data/processed.")
             return
 
-        logger.info(f"Iniciando enriquecimento de lote para {len(csv_files)} arquivos.")
+        logger.info(f"Iniciando enriquecimento de lote para {len(processed_files)} arquivos.")
+
+        with metrics.span("enrich"):
+            for processed_file in processed_files:
+                logger.info(f"--- Processando: {processed_file.name} ---")
+
+                try:
+                    # Com issues sem classificação válida, o arquivo fica para a próxima execução
+                    if not self.enrich_file(processed_file):
+                        self.mark_consumed(processed_file)
+                except Exception as e:
+                    logger.error(f"Erro crítico ao processar {processed_file.name}: {e}")
+                finally:
+                    # Grupos de duplicatas já rotulados sobrevivem a uma interrupção
+                    self.save_dedup_index()
+
+        if self.cache is not None:
+            logger.info(f"Cache de classificação: {self.cache.stats()}")
+        if self.local_model is not None:
+            logger.info(f"Modelo local resolveu {self.local_hits} issues sem chamar o LLM.")
+
+    def enrich_frames(self, frames, checkpoint_names=None):
+        """
+        Enriquece um DataFrame normalizado por repositório, entregue em memória
+        pelo pipeline. Diferente de `run_batch`, um erro interrompe o lote.
+        """
+        checkpoint_names = checkpoint_names or {}
+        unresolved = {}
+        try:
+            with metrics.span("enrich"):
+                for source, df in frames.items():
+                    logger.info(f"--- Enriquecendo em memória: {source} ---")
+                    unresolved[source] = self.enrich_frame(source, df, checkpoint_names.get(source))
+        finally:
+            self.save_dedup_index()
+        unresolved = {source: n for source, n in unresolved.items() if n}
+        if unresolved:
+            # A etapa falha e o cursor do processamento não avança: a próxima
+            # execução entrega as mesmas issues e o journal retoma só as que faltam
+            raise IncompleteEnrichment(f"issues sem classificação válida por repositório: {unresolved}")
+
+    # --- MODO BATCH API (offline) ---
+
+    def prepare_batch_job(self, submit=True):
+        """
+        Gera um arquivo JSONL da Batch API com as issues ainda não classificadas
+        (ausentes do cache) e, se `submit`, envia o job para a OpenAI.
+        Retorna o nome do job registrado em data/state/batch_jobs.json.
+        """
+        processed_files = sorted(self.processed_dir.glob("processed_*.parquet"))
+        if not processed_files:
+            logger.warning("Nenhum Parquet processado encontrado em data/processed.")
+            return None
+
+        self.batch_dir.mkdir(parents=True, exist_ok=True)
+        job_name = f"batch_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}"
+        input_path = self.batch_dir / f"{job_name}_input.jsonl"
+        n_requests = 0
+
+        with open(input_path, 'w') as f:
+            for processed_file in processed_files:
+                df = read_table(processed_file)
+                texts = [
+                    build_text(title, body) for title, body in zip(df['title'], prompt_bodies(df))
+                ]
+                # O que o cache ou o modelo local já resolvem não entra no job
+                resolved = self._resolve_without_llm(texts)
+                for issue_id, text_content, result in zip(df['id'], texts, resolved):
+                    if result is not None:
+                        continue
+                    line = {
+                        "custom_id": f"{processed_file.name}:{issue_id}",
+                        "method": "POST",
+                        "url": BATCH_ENDPOINT,
+                        "body": self._request_body(SYSTEM_PROMPT, text_content),
+                    }
+                    f.write(json.dumps(line) + "\n")
+                    n_requests += 1
+
+        job = {
+            "input_file": input_path.name,
+            "files": [p.name for p in processed_files],
+            "requests": n_requests,
+            "status": "prepared",
+        }
+        if submit and n_requests:
+            with open(input_path, 'rb') as f:
+                uploaded = get_client().files.create(file=f, purpose="batch")
+            batch = get_client().batches.create(
+                input_file_id=uploaded.id, endpoint=BATCH_ENDPOINT, completion_window="24h"
+            )
+            job.update(batch_id=batch.id, status=batch.status)
+
+        StateStore(BATCH_JOBS_PATH).update(job_name, **job)
+        logger.info(f"Job {job_name}: {n_requests} requisições em {input_path} (status: {job['status']}).")
+        return job_name
 
-        for csv_file in csv_files:
-            logger.info(f"--- Processando: {csv_file.name} ---")
-            
+    def _parse_batch_output(self, lines):
+        """Lê as linhas do arquivo de resultado da Batch API -> {custom_id: classificação}."""
+        results = {}
+        for line in lines:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            if response.get("status_code") != 200:
+                continue
             try:
-                # 1. Ler o arquivo completo (sem limites de linha)
-                df = pd.read_csv(csv_file)
-                
-                # Listas para novos dados
-                sentiments = []
-                categories = []
-                urgencies = []
-
-                # 2. Iterar sobre o DataFrame completo
-                for index, row in df.iterrows():
-                    if (index + 1) % 10 == 0:
-                        logger.info(f"Progresso: {index + 1}/{len(df)} linhas processadas...")
-                    
-                    res = self.classify_issue(row['title'], row['body'])
-                    sentiments.append(res.get('sentiment'))
-                    categories.append(res.get('category'))
-                    urgencies.append(res.get('urgency'))
-
-                # 3. Adicionar colunas
-                df['sentiment'] = sentiments
-                df['category'] = categories
-                df['urgency'] = urgencies
-
-                # 4. Gerar nome dinâmico de saída
-                # Exemplo Input: processed_apache_superset_20231223_120000.csv
-                # Exemplo Output: enriched_apache_superset.csv
-                stem = csv_file.stem # remove .csv
-                # Remover prefixo 'processed_'
-                if stem.startswith("processed_"):
-                    stem = stem[len("processed_"):]
-                
-                # Remover timestamp do final (últimos 2 underscores: _YYYYMMDD_HHMMSS)
-                # Assume padrão: nome_repo_DATA_HORA
-                parts = stem.rsplit('_', 2)
-                core_name = parts[0] if len(parts) == 3 else stem
-                
-                output_filename = f"enriched_{core_name}.csv"
-                output_path = self.enriched_dir / output_filename
-
-                # 5. Salvar
-                df.to_csv(output_path, index=False)
-                logger.info(f"Arquivo salvo: {output_path}")
-
-            except Exception as e:
-                logger.error(f"Erro crítico ao processar {csv_file.name}: {e}")
-
-def main():
-    engine = EnrichmentEngine()
-    engine.run_batch()
+                content = response["body"]["choices"][0]["message"]["content"]
+                result = json.loads(content)
+            except (KeyError, IndexError, TypeError, json.JSONDecodeError):
+                continue
+            if is_valid_result(result):
+                results[record["custom_id"]] = {key: result[key] for key in LABEL_VALUES}
+        return results
+
+    def _apply_batch_results(self, job, results):
+        """Grava no dataset os resultados do job; itens sem resultado válido vão pela API síncrona."""
+        for file_name in job["files"]:
+            processed_file = self.processed_dir / file_name
+            if not processed_file.exists():
+                logger.warning(f"{file_name} não existe mais; resultados ignorados.")
+                continue
+
+            df = read_table(processed_file)
+            file_results = []
+            missing = []
+            rows = zip(df['id'], df['title'], prompt_bodies(df))
+            for position, (issue_id, title, body) in enumerate(rows):
+                result = results.get(f"{file_name}:{issue_id}")
+                if result is None:
+                    missing.append(position)
+                else:
+                    if self.cache is not None and is_valid_result(result):
+                        self.cache.put(build_text(title, body), result)
+                    result = dict(result, label_source="llm")
+                file_results.append(result)
+
+            # Cache e modelo local cobrem o que ficou fora do job; o resto vai à API síncrona
+            if missing:
+                logger.info(f"{file_name}: {len(missing)} issues sem resultado no batch, classificando agora.")
+                for position, result in zip(missing, self.classify_dataframe(df.iloc[missing])):
+                    file_results[position] = result
+
+            # Mesmo caminho do modo síncrono: journal -> upsert no dataset
+            journal = self._journal(processed_file.stem)
+            unresolved = self._journal_results(journal, df, file_results)
+            chunks = lambda columns=None, f=processed_file: iter_table(f, self.chunk_size, columns)
+            self._finalize_output(self._source_name(processed_file), chunks, journal, file_name)
+            if unresolved:
+                # O journal fica: o próximo enriquecimento síncrono do arquivo refaz só essas
+                logger.warning(f"{file_name}: {unresolved} issues sem classificação válida ficaram fora do dataset.")
+                journal.close()
+            else:
+                journal.remove()
+                self.mark_consumed(processed_file)
+
+    def collect_batch_jobs(self, results_file: Path = None):
+        """
+        Verifica os jobs pendentes e, quando concluídos, baixa o arquivo de
+        resultado e grava os CSVs enriquecidos. Com `results_file`, usa um
+        arquivo de resultado local para o job mais recente.
+        """
+        jobs = StateStore(BATCH_JOBS_PATH)
+        pending = [(name, job) for name, job in sorted(jobs.items()) if job.get("status") != "collected"]
+        if results_file is not None:
+            pending = pending[-1:]
+
+        for job_name, job in pending:
+            if results_file is not None:
+                output_path = Path(results_file)
+            else:
+                if not job.get("batch_id"):
+                    logger.warning(f"Job {job_name} não foi submetido; use o arquivo de resultado local.")
+                    continue
+                batch = get_client().batches.retrieve(job["batch_id"])
+                if batch.status != "completed":
+                    logger.info(f"Job {job_name} ainda em '{batch.status}'.")
+                    jobs.update(job_name, status=batch.status)
+                    continue
+                output_path = self.batch_dir / f"{job_name}_output.jsonl"
+                output_path.write_text(get_client().files.content(batch.output_file_id).text)
+
+            with open(output_path, 'r') as f:
+                results = self._parse_batch_output(f)
+            logger.info(f"Job {job_name}: {len(results)}/{job['requests']} resultados válidos.")
+
+            self._apply_batch_results(job, results)
+            jobs.update(job_name, status="collected", output_file=output_path.name)
+
+        self.save_dedup_index()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Enriquecimento das issues via OpenAI")
+    parser.add_argument("--mode", choices=["single", "packed"], help="Sobrescreve enrichment.mode")
+    parser.add_argument("--batch-prepare", action="store_true",
+                        help="Gera (e submete) um job da Batch API em vez de classificar agora")
+    parser.add_argument("--no-submit", action="store_true",
+                        help="Com --batch-prepare, apenas escreve o JSONL")
+    parser.add_argument("--batch-collect", action="store_true",
+                        help="Coleta os resultados dos jobs da Batch API")
+    parser.add_argument("--results-file", type=Path,
+                        help="Com --batch-collect, arquivo de resultado local")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    with metrics.run("enrich"):
+        engine = EnrichmentEngine()
+        if args.mode:
+            engine.mode = args.mode
+
+        if args.batch_prepare:
+            engine.prepare_batch_job(submit=not args.no_submit)
+        elif args.batch_collect:
+            engine.collect_batch_jobs(results_file=args.results_file)
+        else:
+            engine.run_batch()
 
 if __name__ == "__main__":
     main()
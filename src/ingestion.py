@@ -2,23 +2,40 @@ import os
 import json
 import requests
 import logging
-import yaml  # Importante para ler o config
-from datetime import datetime, timedelta
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+from src import metrics
+from src.config import load_settings
+from src.query_planner import SEARCH_RESULT_CAP, QueryPlanner
+from src.rate_limit import RateLimitError, RateLimitScheduler
+from src.raw_store import RawStore
+from src.state import StateStore
 
 # --- CONFIGURAÇÃO DE AMBIENTE ---
 BASE_DIR = Path(__file__).resolve().parent.parent
 ENV_PATH = BASE_DIR / "config" / ".env"
 CONFIG_PATH = BASE_DIR / "config" / "settings.yaml"
+STATE_PATH = BASE_DIR / "data" / "state" / "ingestion_state.json"
+GITHUB_API_URL = "https://api.github.com"
+# A API de busca devolve no máximo 100 itens por página
+MAX_PER_PAGE = 100
 
 load_dotenv(ENV_PATH)
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+def target_name(target_query):
+    """Nome limpo do alvo (ex: repo:apache/superset is:issue -> apache_superset)."""
+    return target_query.replace("repo:", "").replace(" is:issue", "").replace("/", "_")
+
 class IngestionEngine:
-    def __init__(self, output_dir="data/raw"):
+    def __init__(self, output_dir="data/raw", api_url=None, state_path=STATE_PATH, config=None):
         self.output_dir = BASE_DIR / output_dir
         self.github_token = os.getenv("GITHUB_TOKEN")
         self.headers = {"Accept": "application/vnd.github.v3+json"}
@@ -27,61 +44,288 @@ class IngestionEngine:
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
         # Carregar configurações YAML
-        self.config = self._load_config()
+        self.config = config if config is not None else self._load_config()
+
+        # URL base configurável para permitir apontar para um stub local da API
+        self.api_url = (
+            api_url
+            or os.getenv("GITHUB_API_URL")
+            or self.config.get('github', {}).get('api_url')
+            or GITHUB_API_URL
+        ).rstrip('/')
+        params = self.config.get('parameters', {})
+        self.max_workers = params.get('max_workers', 8)
+        self.max_retries = params.get('max_retries', 5)
+        self.incremental = params.get('incremental', True)
+        self.shard_workers = params.get('shard_workers', 4)
+        self.session = self._build_session(self.max_workers * self.shard_workers)
+        # Agendador compartilhado por todos os alvos (orçamentos search/core)
+        self.scheduler = RateLimitScheduler(authenticated=bool(self.github_token))
+        # Watermark (updated_at) e ETag por alvo, persistidos entre execuções
+        self.state = StateStore(state_path)
+        # Segmentos NDJSON comprimidos e deduplicados por (id, updated_at)
+        self.store = RawStore(
+            self.output_dir,
+            compression_level=self.config.get('raw_store', {}).get('compression_level', 6),
+        )
+        # Divide janelas com mais de 1000 resultados em shards created:A..B
+        self.planner = QueryPlanner(self.count_issues)
+
+    def _build_session(self, pool_size):
+        """Cria uma sessão HTTP com pool de conexões reutilizável entre threads."""
+        session = requests.Session()
+        session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
 
     def _load_config(self):
         """Lê o arquivo de configuração settings.yaml"""
-        try:
-            with open(CONFIG_PATH, 'r') as f:
-                return yaml.safe_load(f)
-        except FileNotFoundError:
-            logger.error(f"Arquivo de configuração não encontrado em: {CONFIG_PATH}")
-            raise
-        except yaml.YAMLError as e:
-            logger.error(f"Erro ao ler YAML: {e}")
-            raise
+        return load_settings(CONFIG_PATH)
 
     def _get_date_filter(self, days_back):
         """Gera a string de data para a query da API (ex: 2024-07-01)"""
         date_limit = datetime.now() - timedelta(days=days_back)
         return date_limit.strftime("%Y-%m-%d")
 
-    def fetch_github_issues(self, query, sort="created", order="desc", per_page=100):
-        """Busca issues baseado em uma query específica"""
-        url = "https://api.github.com/search/issues"
+    def _is_rate_limited(self, response):
+        """Identifica respostas de limite primário/secundário da API."""
+        if response.status_code == 429:
+            return True
+        if response.status_code != 403:
+            return False
+        return (
+            response.headers.get("X-RateLimit-Remaining") == "0"
+            or "Retry-After" in response.headers
+            or "rate limit" in response.text.lower()
+        )
+
+    def _request(self, url, params=None, resource="search", headers=None):
+        """
+        GET passando pelo agendador de rate limit. Limites, erros 5xx e
+        falhas de rede (conexão/timeout) são retentados com backoff em vez
+        de descartar o alvo.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.scheduler.acquire(resource)
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, headers=headers)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.max_retries:
+                    raise
+                logger.warning(f"Falha de rede em {url}: {e}")
+                self.scheduler.backoff(resource, attempt)
+                continue
+            metrics.observe("http_request_seconds", time.perf_counter() - start,
+                            api="github", resource=resource, status=response.status_code)
+            self.scheduler.update(resource, response.headers)
+
+            retryable = self._is_rate_limited(response) or response.status_code >= 500
+            if not retryable:
+                response.raise_for_status()
+                return response
+            if attempt < self.max_retries:
+                self.scheduler.backoff(resource, attempt, response.headers)
+
+        raise RateLimitError(
+            f"Desistindo após {self.max_retries} retentativas (HTTP {response.status_code}): {url}"
+        )
+
+    def count_issues(self, query):
+        """Total de resultados de uma busca (uma única requisição com per_page=1)."""
+        response = self._request(f"{self.api_url}/search/issues", params={"q": query, "per_page": 1})
+        return response.json().get("total_count", 0)
+
+    def fetch_github_issues(self, query, sort="created", order="desc", per_page=100,
+                            max_results=None, etag=None, shard_cap=None):
+        """
+        Busca issues baseado em uma query específica, seguindo a paginação
+        do header Link até atingir max_results (ou o fim dos resultados).
+        Com `etag`, a primeira página é condicional (If-None-Match): um 304
+        indica que nada mudou e nenhum item é retornado.
+        Com `shard_cap`, a busca para na primeira página se o total_count
+        exceder o limite e marca o resultado com `needs_sharding`.
+        """
+        url = f"{self.api_url}/search/issues"
         params = {
             "q": query,
             "sort": sort,
             "order": order,
-            "per_page": per_page
+            "per_page": min(per_page, MAX_PER_PAGE)
         }
         
         logger.info(f"Buscando com query: {query}")
-        
-        try:
-            response = requests.get(url, headers=self.headers, params=params)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Erro na requisição: {e}")
-            return None
+
+        items = []
+        result = {
+            "total_count": 0, "incomplete_results": False, "items": items,
+            "pages": 0, "etag": None, "not_modified": False, "needs_sharding": False
+        }
+        headers = {"If-None-Match": etag} if etag else None
+
+        while url:
+            response = self._request(url, params=params, headers=headers)
+            if headers:
+                metrics.inc("cache_lookups_total", cache="github_etag",
+                            result="hit" if response.status_code == 304 else "miss")
+            if response.status_code == 304:
+                result["not_modified"] = True
+                result["etag"] = etag
+                break
+            if result["pages"] == 0:
+                result["etag"] = response.headers.get("ETag")
+            headers = None
+            payload = response.json()
+
+            result["total_count"] = payload.get("total_count", 0)
+            result["incomplete_results"] |= payload.get("incomplete_results", False)
+            result["pages"] += 1
+            items.extend(payload.get("items", []))
+
+            if shard_cap is not None and result["total_count"] > shard_cap:
+                result["needs_sharding"] = True
+                break
+
+            if max_results is not None and len(items) >= max_results:
+                del items[max_results:]
+                break
+
+            # A URL 'next' já carrega os parâmetros da query
+            url = response.links.get("next", {}).get("url")
+            params = None
+
+        return result
+
+    def _fetch_shard(self, base_query, shard, sort, order):
+        """Busca um shard; se ele ainda exceder o limite (dados mudaram), re-planeja."""
+        result = self.fetch_github_issues(
+            shard.query, sort=sort, order=order, shard_cap=SEARCH_RESULT_CAP
+        )
+        if result["needs_sharding"]:
+            items, pages = self._fetch_sharded(
+                base_query, shard.start, shard.end, result["total_count"], sort, order
+            )
+            return {"items": items, "pages": result["pages"] + pages}
+        return result
+
+    def _fetch_sharded(self, base_query, start, end, total, sort, order):
+        """Planeja os shards de uma janela, busca-os em paralelo e remove duplicatas por id."""
+        shards = self.planner.plan(base_query, start, end, total)
+        merged = {}
+        pages = 0
+
+        with ThreadPoolExecutor(max_workers=self.shard_workers) as executor:
+            results = executor.map(lambda shard: self._fetch_shard(base_query, shard, sort, order), shards)
+            for result in results:
+                pages += result["pages"]
+                for item in result["items"]:
+                    merged[item["id"]] = item
+
+        return list(merged.values()), pages
+
+    def _snapshot_files(self, source_name):
+        """Snapshots JSON do formato antigo (ingest_<nome>_<YYYYMMDD_HHMMSS>.json)."""
+        pattern = re.compile(rf"^ingest_{re.escape(source_name)}_\d{{8}}_\d{{6}}$")
+        return sorted(p for p in self.output_dir.glob(f"ingest_{source_name}_*.json") if pattern.match(p.stem))
 
     def save_raw_data(self, data, source_name):
-        """Salva o JSON bruto com o nome do repositório alvo"""
+        """Grava as issues do alvo como um novo segmento do arquivo bruto."""
         if not data:
-            return
+            return None
+
+        # Migração: snapshots JSON antigos viram o primeiro segmento do alvo
+        for snapshot in self._snapshot_files(source_name):
+            self.store.import_snapshot(source_name, snapshot)
+            snapshot.unlink()
+            logger.info(f"Snapshot antigo importado para o arquivo bruto: {snapshot.name}")
+
+        return self.store.append(source_name, data["items"])
+
+    def _ingest_target(self, target_query, date_str, max_results):
+        """Busca e salva um único alvo, registrando a vazão obtida."""
+        # Monta a query final: "repo:owner/name is:issue created:2024-XX-XX"
+        final_query = f"{target_query} created:>{date_str}"
+        
+        # Extrai nome limpo para o arquivo (ex: repo:apache/superset -> apache_superset)
+        repo_name = target_name(target_query)
+
+        state = self.state.get(repo_name, {}) if self.incremental else {}
+        watermark = state.get("watermark")
+        base_query = target_query
+        sort, order = "created", "desc"
+        if watermark:
+            # Apenas o que mudou desde a última execução, do mais antigo ao mais novo,
+            # para que um corte por max_results não pule alterações
+            base_query = f"{target_query} updated:>={watermark}"
+            final_query = f"{final_query} updated:>={watermark}"
+            sort, order = "updated", "asc"
+        etag = state.get("etag") if state.get("query") == final_query else None
+        # Só vale a pena fatiar a janela se quisermos mais do que a API expõe
+        wants_all = max_results is None or max_results > SEARCH_RESULT_CAP
+
+        start = time.perf_counter()
+        
+        # Executa busca (a primeira página também serve de sonda para o planner)
+        raw_data = self.fetch_github_issues(
+            query=final_query, 
+            sort=sort,
+            order=order,
+            max_results=max_results,
+            etag=etag,
+            shard_cap=SEARCH_RESULT_CAP if wants_all else None
+        )
 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        # O source_name será algo como "apache_superset"
-        filename = f"ingest_{source_name}_{timestamp}.json"
-        filepath = self.output_dir / filename
+        if raw_data["needs_sharding"]:
+            window_start = datetime.strptime(date_str, "%Y-%m-%d") + timedelta(days=1)
+            window_end = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+            items, pages = self._fetch_sharded(
+                base_query, window_start, window_end, raw_data["total_count"], sort, order
+            )
+            items.sort(key=lambda item: item.get(f"{sort}_at") or "", reverse=order == "desc")
+            if max_results is not None:
+                del items[max_results:]
+            raw_data.update(items=items, pages=raw_data["pages"] + pages, total_count=len(items))
+
+        n_items = len(raw_data["items"])
+        if raw_data["not_modified"]:
+            logger.info(f"[{repo_name}] 304 Not Modified, nada a atualizar.")
+        elif n_items:
+            # Só as versões novas vão para o arquivo bruto
+            with metrics.span("ingest.save", target=repo_name):
+                self.save_raw_data(raw_data, source_name=repo_name)
+
+        if not raw_data["not_modified"]:
+            latest = max((item.get("updated_at") or "" for item in raw_data["items"]), default="")
+            self.state.update(
+                repo_name,
+                watermark=max(watermark or "", latest) or None,
+                etag=raw_data["etag"],
+                query=final_query,
+                last_run=datetime.now().isoformat(timespec="seconds"),
+            )
 
-        with open(filepath, 'w') as f:
-            json.dump(data, f, indent=4)
-        logger.info(f"Salvo: {filepath}")
+        elapsed = time.perf_counter() - start
+        metrics.observe("span_seconds", elapsed, span="ingest.target", target=repo_name)
+        n_pages = raw_data["pages"]
+        logger.info(
+            f"[{repo_name}] {n_items} issues em {n_pages} páginas, "
+            f"{elapsed:.2f}s ({n_items / elapsed if elapsed else 0:.1f} issues/s)"
+        )
+        return {
+            "target": repo_name, "items": n_items, "pages": n_pages,
+            "seconds": elapsed, "not_modified": raw_data["not_modified"]
+        }
+
+    def ingest_target(self, target_query):
+        """Ingestão de um único alvo com a janela e o limite do settings.yaml (unidade da fila de trabalho)."""
+        params = self.config.get('parameters', {})
+        date_str = self._get_date_filter(params.get('days_back', 30))
+        return self._ingest_target(target_query, date_str, params.get('max_results', 100))
 
     def run(self):
-        """Executa o loop de ingestão para todos os alvos definidos no YAML"""
+        """Executa a ingestão concorrente para todos os alvos definidos no YAML"""
         targets = self.config.get('github', {}).get('targets', [])
         params = self.config.get('parameters', {})
         days_back = params.get('days_back', 30)
@@ -89,27 +333,41 @@ class IngestionEngine:
         
         date_str = self._get_date_filter(days_back)
         
-        logger.info(f"Iniciando ingestão para {len(targets)} alvos (janela: {days_back} dias).")
-
-        for target_query in targets:
-            # Monta a query final: "repo:owner/name is:issue created:2024-XX-XX"
-            final_query = f"{target_query} created:>{date_str}"
-            
-            # Extrai nome limpo para o arquivo (ex: repo:apache/superset -> apache_superset)
-            repo_name = target_query.replace("repo:", "").replace(" is:issue", "").replace("/", "_")
-            
-            # Executa busca
-            raw_data = self.fetch_github_issues(
-                query=final_query, 
-                per_page=max_results
-            )
-            
-            # Salva
-            self.save_raw_data(raw_data, source_name=repo_name)
+        logger.info(
+            f"Iniciando ingestão para {len(targets)} alvos "
+            f"(janela: {days_back} dias, concorrência: {self.max_workers})."
+        )
+
+        start = time.perf_counter()
+        stats = []
+
+        with metrics.span("ingest"), ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self._ingest_target, target_query, date_str, max_results): target_query
+                for target_query in targets
+            }
+            for future in as_completed(futures):
+                try:
+                    stats.append(future.result())
+                except Exception as e:
+                    logger.error(f"Falha ao ingerir {futures[future]}: {e}")
+
+        elapsed = time.perf_counter() - start
+        total = sum(s["items"] for s in stats)
+        metrics.inc("rows_total", total, stage="ingest")
+        logger.info(
+            f"Ingestão concluída: {total} issues de {len(stats)} alvos em {elapsed:.2f}s "
+            f"({total / elapsed if elapsed else 0:.1f} issues/s)."
+        )
+        for resource, usage in self.scheduler.report().items():
+            logger.info(f"Orçamento {resource}: {usage}")
+        return stats
 
 def main():
-    engine = IngestionEngine()
-    engine.run()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    with metrics.run("ingest"):
+        engine = IngestionEngine()
+        engine.run()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,235 @@
+import json
+import re
+import time
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.config import load_settings
+from src.storage import load_enriched
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+MODEL_PATH = BASE_DIR / "data" / "models" / "local_classifier.npz"
+
+LABEL_CLASSES = {
+    "sentiment": ["positive", "neutral", "negative"],
+    "category": ["bug", "feature_request", "documentation", "question", "other"],
+    "urgency": ["high", "medium", "low"],
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9_]{2,}")
+
+
+def hashed_ngrams(texts, n_features=2 ** 18):
+    """
+    Vetoriza textos em n-gramas de palavras (uni + bigramas) com hashing trick.
+    Retorna a matriz esparsa em formato COO: (linhas, colunas, valores), com
+    cada documento normalizado pela norma L2.
+    """
+    doc_index = []
+    tokens = []
+    for position, text in enumerate(texts):
+        words = TOKEN_PATTERN.findall(str(text).lower())
+        grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        tokens.extend(grams)
+        doc_index.extend([position] * len(grams))
+
+    if not tokens:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0)
+
+    # Hash estável entre processos (ao contrário de hash() do Python)
+    hashes = pd.util.hash_array(np.asarray(tokens, dtype=object))
+    cols = (hashes % np.uint64(n_features)).astype(np.int64)
+    rows = np.asarray(doc_index, dtype=np.int64)
+
+    # Contagem de (doc, feature) e normalização L2 por documento, tudo vetorizado
+    keys = rows * n_features + cols
+    unique_keys, counts = np.unique(keys, return_counts=True)
+    rows, cols = unique_keys // n_features, unique_keys % n_features
+    values = counts.astype(np.float64)
+    norms = np.sqrt(np.bincount(rows, weights=values ** 2, minlength=len(texts)))
+    values /= norms[rows]
+    return rows, cols, values
+
+
+def _softmax(scores):
+    scores = scores - scores.max(axis=1, keepdims=True)
+    exp = np.exp(scores)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class LocalClassifier:
+    """
+    Classificador linear local (regressão logística multinomial sobre n-gramas
+    com hashing) treinado com os rótulos do LLM já presentes em data/enriched.
+    Uma "cabeça" por rótulo: sentiment, category e urgency.
+    """
+
+    def __init__(self, n_features=2 ** 18, confidence_threshold=0.8):
+        self.n_features = n_features
+        self.confidence_threshold = confidence_threshold
+        self.weights = {}
+        self.metrics = {}
+
+    def _scores(self, features, n_docs, head):
+        rows, cols, values = features
+        W, b = self.weights[head]
+        scores = np.tile(b, (n_docs, 1))
+        np.add.at(scores, rows, W[cols] * values[:, None])
+        return scores
+
+    def fit(self, texts, labels: pd.DataFrame, epochs=30, learning_rate=0.5, l2=1e-6):
+        """Treina as três cabeças por descida de gradiente (Adagrad) em lote completo."""
+        n_docs = len(texts)
+        features = hashed_ngrams(texts, self.n_features)
+        rows, cols, values = features
+
+        for head, classes in LABEL_CLASSES.items():
+            y = pd.Categorical(labels[head], categories=classes).codes
+            known = y >= 0
+            target = np.zeros((n_docs, len(classes)))
+            target[np.arange(n_docs)[known], y[known]] = 1.0
+
+            W = np.zeros((self.n_features, len(classes)))
+            b = np.zeros(len(classes))
+            grad_sq_W = np.full_like(W, 1e-8)
+            grad_sq_b = np.full_like(b, 1e-8)
+            self.weights[head] = (W, b)
+
+            for _ in range(epochs):
+                probs = _softmax(self._scores(features, n_docs, head))
+                error = (probs - target) * known[:, None] / max(known.sum(), 1)
+                grad_W = np.zeros_like(W)
+                np.add.at(grad_W, cols, values[:, None] * error[rows])
+                grad_W += l2 * W
+                grad_b = error.sum(axis=0)
+
+                grad_sq_W += grad_W ** 2
+                grad_sq_b += grad_b ** 2
+                W -= learning_rate * grad_W / np.sqrt(grad_sq_W)
+                b -= learning_rate * grad_b / np.sqrt(grad_sq_b)
+        return self
+
+    def predict(self, texts):
+        """
+        Retorna (DataFrame de rótulos, confiança por linha). A confiança é a
+        menor probabilidade máxima entre as três cabeças.
+        """
+        n_docs = len(texts)
+        features = hashed_ngrams(texts, self.n_features)
+        predictions = {}
+        confidence = np.ones(n_docs)
+        for head, classes in LABEL_CLASSES.items():
+            probs = _softmax(self._scores(features, n_docs, head))
+            predictions[head] = np.asarray(classes)[probs.argmax(axis=1)]
+            confidence = np.minimum(confidence, probs.max(axis=1))
+        return pd.DataFrame(predictions), confidence
+
+    def evaluate(self, texts, labels: pd.DataFrame):
+        """Concordância com os rótulos do LLM, geral e acima do limiar de confiança."""
+        predicted, confidence = self.predict(texts)
+        confident = confidence >= self.confidence_threshold
+        metrics = {"holdout_size": len(texts), "coverage": round(float(confident.mean()), 3)}
+        for head in LABEL_CLASSES:
+            agree = predicted[head].to_numpy() == labels[head].to_numpy()
+            metrics[f"{head}_agreement"] = round(float(agree.mean()), 3)
+            metrics[f"{head}_agreement_confident"] = (
+                round(float(agree[confident].mean()), 3) if confident.any() else None
+            )
+        all_agree = np.all([predicted[h].to_numpy() == labels[h].to_numpy() for h in LABEL_CLASSES], axis=0)
+        metrics["all_agreement_confident"] = (
+            round(float(all_agree[confident].mean()), 3) if confident.any() else None
+        )
+        return metrics
+
+    def save(self, path: Path = MODEL_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        arrays = {}
+        for head, (W, b) in self.weights.items():
+            arrays[f"{head}_W"] = W.astype(np.float32)
+            arrays[f"{head}_b"] = b
+        meta = {"n_features": self.n_features, "metrics": self.metrics}
+        np.savez_compressed(path, meta=json.dumps(meta), **arrays)
+        logger.info(f"Modelo local salvo em {path}")
+
+    @classmethod
+    def load(cls, path: Path = MODEL_PATH, confidence_threshold=0.8):
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            model = cls(n_features=meta["n_features"], confidence_threshold=confidence_threshold)
+            model.metrics = meta.get("metrics", {})
+            for head in LABEL_CLASSES:
+                model.weights[head] = (data[f"{head}_W"].astype(np.float64), data[f"{head}_b"])
+        return model
+
+
+def load_training_data(enriched_dir: Path = BASE_DIR / "data" / "enriched" / "dataset"):
+    """
+    Lê o dataset enriquecido (só as colunas usadas) e mantém apenas linhas com
+    rótulos válidos produzidos pelo LLM (`label_source == "llm"`): rótulos do
+    próprio modelo local ou copiados de duplicatas não voltam ao treino nem à
+    avaliação. O texto de treino é montado como o da classificação
+    (corpo compacto, truncado), para que treino e uso vejam a mesma entrada.
+    """
+    from src.enrichment import build_text, prompt_bodies
+
+    columns = ["id", "title", "body", "body_compact", "label_source", *LABEL_CLASSES]
+    df = load_enriched(columns=columns, root=enriched_dir)
+    if df.empty:
+        return pd.DataFrame()
+    df = df.drop_duplicates(subset="id", keep="last")
+    valid = np.all([df[h].isin(classes) for h, classes in LABEL_CLASSES.items()], axis=0)
+    valid &= (df["label_source"] == "llm").to_numpy(dtype=bool, na_value=False)
+    df = df[valid].reset_index(drop=True)
+    for head in LABEL_CLASSES:
+        df[head] = df[head].astype(str)
+    df["text"] = [build_text(title, body) for title, body in zip(df["title"], prompt_bodies(df))]
+    return df
+
+
+def train(enriched_dir: Path = BASE_DIR / "data" / "enriched" / "dataset", path: Path = MODEL_PATH,
+          confidence_threshold=0.8, holdout=0.2, seed=42):
+    """Treina com os rótulos existentes, avalia num holdout e salva o modelo."""
+    df = load_training_data(enriched_dir)
+    if df.empty:
+        logger.warning("Nenhum rótulo do LLM em data/enriched para treinar o modelo local.")
+        return None
+
+    rng = np.random.default_rng(seed)
+    is_holdout = rng.random(len(df)) < holdout
+    train_df, test_df = df[~is_holdout], df[is_holdout]
+
+    start = time.perf_counter()
+    model = LocalClassifier(confidence_threshold=confidence_threshold)
+    model.fit(train_df["text"].tolist(), train_df)
+    logger.info(f"Modelo local treinado com {len(train_df)} issues em {time.perf_counter() - start:.2f}s.")
+
+    if len(test_df):
+        model.metrics = model.evaluate(test_df["text"].tolist(), test_df)
+        logger.info(f"Concordância com o LLM no holdout: {model.metrics}")
+
+    # O modelo final usa todos os dados rotulados
+    metrics = model.metrics
+    model = LocalClassifier(confidence_threshold=confidence_threshold).fit(df["text"].tolist(), df)
+    model.metrics = metrics
+    model.save(path)
+    return model
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    local_cfg = load_settings().get('enrichment', {}).get('local_model', {})
+    train(
+        path=BASE_DIR / local_cfg.get('path', "data/models/local_classifier.npz"),
+        confidence_threshold=local_cfg.get('confidence_threshold', 0.8),
+    )
+
+
+if __name__ == "__main__":
+    main()
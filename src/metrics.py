@@ -0,0 +1,347 @@
+"""
+Instrumentação leve do pipeline: spans de tempo, histogramas de latência,
+contadores e gauges, exportados ao fim de cada execução como textfile do
+Prometheus (data/metrics/oss_sentinel_<execução>.prom) e relatório JSON
+(data/metrics/runs/<execução>_<timestamp>.json).
+
+Desligada por padrão (metrics.enabled no settings.yaml ou OSS_SENTINEL_METRICS=1):
+nesse caso cada chamada só testa um global e `span` devolve um contexto
+vazio compartilhado.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+METRICS_DIR = BASE_DIR / "data" / "metrics"
+ENV_FLAG = "OSS_SENTINEL_METRICS"
+PREFIX = "oss_sentinel_"
+
+logger = logging.getLogger(__name__)
+
+# Limites (segundos) dos buckets dos histogramas: de chamadas HTTP a etapas inteiras
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# Descrições exportadas no textfile (# HELP)
+HELP = {
+    "span_seconds": "Duração de etapas e chamadas instrumentadas.",
+    "http_request_seconds": "Latência das requisições HTTP à API do GitHub.",
+    "llm_request_seconds": "Latência das chamadas ao LLM.",
+    "llm_tokens_total": "Tokens enviados (in) e recebidos (out) do LLM.",
+    "rate_limit_remaining": "Saldo de requisições/tokens informado pela API na última resposta.",
+    "rate_limit_limit": "Limite da janela de rate limit informado pela API.",
+    "rows_total": "Linhas tratadas por etapa.",
+    "cache_lookups_total": "Consultas a caches (hit/miss).",
+    "enrich_resolved_total": "Issues classificadas por caminho (cache, modelo local, duplicata, LLM).",
+    "report_figures_total": "Figuras do relatório por resultado (desenhada, sem alteração, removida, erro).",
+    "queue_units_total": "Unidades da fila tratadas pelo worker, por tipo e resultado (concluída, falha, perdida).",
+}
+
+
+class _NoopSpan:
+    """Contexto vazio devolvido por `span` com a instrumentação desligada."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("registry", "name", "labels", "start")
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe("span_seconds", time.perf_counter() - self.start, span=self.name, **self.labels)
+        return False
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _quantile(counts, total, q):
+    """Quantil estimado dos buckets, com interpolação linear (como histogram_quantile)."""
+    if not total:
+        return None
+    rank, cumulative, lower = q * total, 0, 0.0
+    for bound, count in zip(BUCKETS + (float("inf"),), counts):
+        if count and cumulative + count >= rank:
+            if bound == float("inf"):
+                return lower
+            return lower + (bound - lower) * (rank - cumulative) / count
+        cumulative += count
+        lower = bound
+    return lower
+
+
+class Registry:
+    """Valores de uma execução, protegidos por lock (as etapas usam threads)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        # chave -> [contagem por bucket (+Inf no fim), soma, total, máximo]
+        self.histograms = {}
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self.gauges[_key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        key = _key(name, labels)
+        index = next((i for i, bound in enumerate(BUCKETS) if value <= bound), len(BUCKETS))
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = [[0] * (len(BUCKETS) + 1), 0.0, 0, 0.0]
+            hist[0][index] += 1
+            hist[1] += value
+            hist[2] += 1
+            hist[3] = max(hist[3], value)
+
+    def snapshot(self):
+        """Cópia serializável (pickle) dos valores, para levar de um processo filho ao pai."""
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "histograms": {key: [list(h[0]), h[1], h[2], h[3]] for key, h in self.histograms.items()},
+            }
+
+    def merge(self, snapshot):
+        with self._lock:
+            for key, value in snapshot["counters"].items():
+                self.counters[key] = self.counters.get(key, 0) + value
+            self.gauges.update(snapshot["gauges"])
+            for key, (counts, total_sum, total, maximum) in snapshot["histograms"].items():
+                hist = self.histograms.setdefault(key, [[0] * (len(BUCKETS) + 1), 0.0, 0, 0.0])
+                hist[0] = [a + b for a, b in zip(hist[0], counts)]
+                hist[1] += total_sum
+                hist[2] += total
+                hist[3] = max(hist[3], maximum)
+
+    def to_prometheus(self, run):
+        """Texto no formato de exposição do Prometheus (textfile collector)."""
+        snap = self.snapshot()
+        lines, seen = [], set()
+
+        def header(name, kind):
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {PREFIX}{name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {PREFIX}{name} {kind}")
+
+        def fmt(labels, extra=()):
+            pairs = [f'{k}="{v}"' for k, v in (("run", run),) + labels + tuple(extra)]
+            return "{" + ",".join(pairs) + "}"
+
+        for (name, labels), value in sorted(snap["counters"].items()):
+            header(name, "counter")
+            lines.append(f"{PREFIX}{name}{fmt(labels)} {value}")
+        for (name, labels), value in sorted(snap["gauges"].items()):
+            header(name, "gauge")
+            lines.append(f"{PREFIX}{name}{fmt(labels)} {value}")
+        for (name, labels), (counts, total_sum, total, _) in sorted(snap["histograms"].items()):
+            header(name, "histogram")
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f"{PREFIX}{name}_bucket{fmt(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{PREFIX}{name}_sum{fmt(labels)} {total_sum:.6f}")
+            lines.append(f"{PREFIX}{name}_count{fmt(labels)} {total}")
+        header("last_run_timestamp_seconds", "gauge")
+        lines.append(f"{PREFIX}last_run_timestamp_seconds{fmt(())} {time.time():.0f}")
+        return "\n".join(lines) + "\n"
+
+    def report(self, run):
+        """Relatório JSON da execução, com os indicadores derivados já calculados."""
+        snap = self.snapshot()
+
+        def label_str(labels):
+            return ",".join(f"{k}={v}" for k, v in labels)
+
+        histograms = {}
+        for (name, labels), (counts, total_sum, total, maximum) in sorted(snap["histograms"].items()):
+            # Quantis estimados pelos buckets, limitados ao máximo observado
+            p50, p99 = (min(_quantile(counts, total, q), maximum) for q in (0.5, 0.99))
+            histograms.setdefault(name, {})[label_str(labels) or "all"] = {
+                "count": total, "seconds_total": round(total_sum, 4),
+                "seconds_mean": round(total_sum / total, 4), "seconds_max": round(maximum, 4),
+                "p50": round(p50, 4), "p99": round(p99, 4),
+            }
+        counters = {}
+        for (name, labels), value in sorted(snap["counters"].items()):
+            counters.setdefault(name, {})[label_str(labels) or "all"] = value
+        gauges = {}
+        for (name, labels), value in sorted(snap["gauges"].items()):
+            gauges.setdefault(name, {})[label_str(labels) or "all"] = value
+
+        # Vazão: linhas da etapa / tempo do span de mesmo nome
+        spans = histograms.get("span_seconds", {})
+        rows_per_second = {}
+        for labels, rows in counters.get("rows_total", {}).items():
+            stage = labels.split("=", 1)[1]
+            seconds = spans.get(f"span={stage}", {}).get("seconds_total")
+            if seconds:
+                rows_per_second[stage] = round(rows / seconds, 1)
+
+        lookups = {}
+        for labels, value in counters.get("cache_lookups_total", {}).items():
+            parts = dict(pair.split("=", 1) for pair in labels.split(","))
+            lookups.setdefault(parts["cache"], {})[parts["result"]] = value
+        cache_hit_rate = {
+            cache: round(r.get("hit", 0) / (r.get("hit", 0) + r.get("miss", 0)), 4)
+            for cache, r in lookups.items() if r.get("hit", 0) + r.get("miss", 0)
+        }
+
+        limits = gauges.get("rate_limit_limit", {})
+        headroom = {
+            labels: round(remaining / limits[labels], 4)
+            for labels, remaining in gauges.get("rate_limit_remaining", {}).items() if limits.get(labels)
+        }
+        return {
+            "run": run, "started_at": self.started_at,
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+            "rows_per_second": rows_per_second, "cache_hit_rate": cache_hit_rate,
+            "rate_limit_headroom": headroom,
+            "counters": counters, "gauges": gauges, "histograms": histograms,
+        }
+
+
+# --- API DO MÓDULO ---
+# Com _registry None (desligado), todas as funções retornam de imediato
+
+_registry = None
+_config = {}
+_depth = 0
+_state_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return _registry is not None
+
+
+def enable(textfile_dir: Path = METRICS_DIR, report_dir: Path = METRICS_DIR / "runs"):
+    global _registry, _config
+    _config = {"textfile_dir": Path(textfile_dir), "report_dir": Path(report_dir)}
+    if _registry is None:
+        _registry = Registry()
+
+
+def disable():
+    global _registry
+    _registry = None
+
+
+def reset():
+    """Descarta os valores coletados, mantendo a instrumentação ligada."""
+    global _registry
+    if _registry is not None:
+        _registry = Registry()
+
+
+def span(name, **labels):
+    if _registry is None:
+        return _NOOP_SPAN
+    return _Span(_registry, name, labels)
+
+
+def inc(name, value=1, **labels):
+    if _registry is not None:
+        _registry.inc(name, value, **labels)
+
+
+def set_gauge(name, value, **labels):
+    if _registry is not None:
+        _registry.set_gauge(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    if _registry is not None:
+        _registry.observe(name, value, **labels)
+
+
+def snapshot():
+    return _registry.snapshot() if _registry is not None else None
+
+
+def merge(snap):
+    if _registry is not None and snap:
+        _registry.merge(snap)
+
+
+def export(run):
+    """Grava o textfile do Prometheus e o relatório JSON da execução. Retorna os caminhos."""
+    if _registry is None:
+        return None
+    textfile_dir, report_dir = _config["textfile_dir"], _config["report_dir"]
+    textfile_dir.mkdir(parents=True, exist_ok=True)
+    report_dir.mkdir(parents=True, exist_ok=True)
+
+    # Gravação atômica: o node_exporter nunca lê um arquivo pela metade
+    textfile = textfile_dir / f"oss_sentinel_{run}.prom"
+    tmp_path = textfile.with_suffix(".prom.tmp")
+    tmp_path.write_text(_registry.to_prometheus(run))
+    os.replace(tmp_path, textfile)
+
+    report_path = report_dir / f"{run}_{datetime.now():%Y%m%d_%H%M%S}.json"
+    report_path.write_text(json.dumps(_registry.report(run), indent=2, default=str))
+    return textfile, report_path
+
+
+@contextmanager
+def run(name, settings=None):
+    """
+    Escopo de uma execução (um comando ou o pipeline inteiro): liga a
+    instrumentação conforme metrics.enabled / OSS_SENTINEL_METRICS e exporta
+    ao sair. Escopos aninhados (ex: analyze dentro do pipeline) não fazem nada.
+    """
+    global _depth
+    with _state_lock:
+        _depth += 1
+        outermost = _depth == 1
+    owned = False
+    if outermost and _registry is None:
+        if settings is None:
+            from src.config import load_settings
+            settings = load_settings()
+        cfg = settings.get('metrics', {}) or {}
+        if cfg.get('enabled', False) or os.getenv(ENV_FLAG, "").lower() in ("1", "true", "yes"):
+            enable(BASE_DIR / cfg.get('textfile_dir', "data/metrics"),
+                   BASE_DIR / cfg.get('report_dir', "data/metrics/runs"))
+            owned = True
+    try:
+        yield
+    finally:
+        with _state_lock:
+            _depth -= 1
+        if outermost and _registry is not None:
+            textfile, report_path = export(name)
+            logger.info(f"Métricas salvas em: {textfile} e {report_path}")
+            if owned:
+                disable()
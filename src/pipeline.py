@@ -0,0 +1,259 @@
+import hashlib
+import json
+import logging
+import time
+from collections import namedtuple
+from datetime import datetime
+from pathlib import Path
+
+from src.config import load_settings
+from src.state import StateStore
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+STATE_PATH = BASE_DIR / "data" / "state" / "pipeline_state.json"
+
+# Resultado de uma etapa: saída entregue em memória às dependentes, linhas
+# tratadas (para a vazão) e artefatos persistidos que `Stage.load` sabe reler
+StageResult = namedtuple("StageResult", ["output", "rows", "artifacts"])
+
+
+def fingerprint(value) -> str:
+    """Hash estável de qualquer valor serializável em JSON."""
+    payload = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+class Stage:
+    """
+    Uma etapa do pipeline.
+
+    - `run(inputs)` recebe {dependência: saída} e devolve um StageResult.
+    - `fingerprint(fingerprints)` descreve as entradas e a configuração da
+      etapa (recebe os fingerprints das etapas anteriores desta execução);
+      se for igual ao da última execução bem-sucedida, a etapa é pulada.
+    - `load(artifacts)` (opcional) reconstrói a saída a partir dos artefatos
+      persistidos, quando a etapa foi pulada mas uma dependente precisa rodar.
+    """
+
+    def __init__(self, name, run, fingerprint, deps=(), load=None):
+        self.name = name
+        self.run = run
+        self.fingerprint = fingerprint
+        self.deps = tuple(deps)
+        self.load = load
+
+
+class Pipeline:
+    """
+    Executa etapas em ordem topológica, entregando as saídas em memória às
+    dependentes. O fingerprint de cada etapa concluída fica em
+    data/state/pipeline_state.json, junto com tempo e linhas da execução.
+
+    Se uma etapa falha, as dependências que só lhe entregaram dados em memória
+    (sem artefatos) perdem o fingerprint e rodam de novo na próxima execução.
+    """
+
+    def __init__(self, stages, state_path: Path = STATE_PATH):
+        self.stages = self._toposort(stages)
+        self.by_name = {stage.name: stage for stage in self.stages}
+        self.state = StateStore(state_path)
+
+    @staticmethod
+    def _toposort(stages):
+        by_name = {stage.name: stage for stage in stages}
+        ordered, done, visiting = [], set(), set()
+
+        def visit(stage):
+            if stage.name in done:
+                return
+            if stage.name in visiting:
+                raise ValueError(f"Ciclo no pipeline envolvendo a etapa '{stage.name}'.")
+            visiting.add(stage.name)
+            for dep in stage.deps:
+                if dep not in by_name:
+                    raise ValueError(f"A etapa '{stage.name}' depende de '{dep}', que não existe.")
+                visit(by_name[dep])
+            visiting.discard(stage.name)
+            done.add(stage.name)
+            ordered.append(stage)
+
+        for stage in stages:
+            visit(stage)
+        return ordered
+
+    def _inputs(self, stage, outputs):
+        inputs = {}
+        for dep in stage.deps:
+            if dep in outputs:
+                inputs[dep] = outputs[dep]
+                continue
+            # Dependência pulada: relê os artefatos persistidos, se houver
+            dep_stage = self.by_name[dep]
+            artifacts = (self.state.get(dep) or {}).get("artifacts") or []
+            inputs[dep] = dep_stage.load(artifacts) if dep_stage.load and artifacts else None
+        return inputs
+
+    def run(self, force=False):
+        """
+        Executa o pipeline. `force` é True (todas as etapas) ou um conjunto de
+        nomes de etapas que rodam mesmo com o fingerprint inalterado.
+        Retorna um relatório por etapa (status, segundos, linhas, linhas/s).
+        """
+        outputs, fingerprints, report = {}, {}, []
+        for stage in self.stages:
+            start = time.perf_counter()
+            fp = fingerprint(stage.fingerprint(fingerprints))
+            fingerprints[stage.name] = fp
+            previous = self.state.get(stage.name) or {}
+            forced = force is True or (force and stage.name in force)
+
+            if previous.get("fingerprint") == fp and not forced:
+                report.append({"stage": stage.name, "status": "skipped",
+                               "seconds": time.perf_counter() - start, "rows": 0})
+                continue
+
+            logger.info(f"--- Etapa {stage.name} ---")
+            try:
+                result = stage.run(self._inputs(stage, outputs))
+            except Exception as e:
+                logger.error(f"Etapa {stage.name} falhou: {e}")
+                for dep in stage.deps:
+                    if dep in outputs and not (self.state.get(dep) or {}).get("artifacts"):
+                        self.state.update(dep, fingerprint=None)
+                report.append({"stage": stage.name, "status": "failed",
+                               "seconds": time.perf_counter() - start, "rows": 0, "error": str(e)})
+                break
+
+            elapsed = time.perf_counter() - start
+            outputs[stage.name] = result.output
+            self.state.update(
+                stage.name, fingerprint=fp, artifacts=[str(a) for a in result.artifacts or []],
+                rows=result.rows, seconds=round(elapsed, 3),
+                finished_at=datetime.now().isoformat(timespec="seconds"),
+            )
+            report.append({"stage": stage.name, "status": "ran", "seconds": elapsed, "rows": result.rows})
+
+        for entry in report:
+            entry["rows_per_second"] = entry["rows"] / entry["seconds"] if entry["rows"] and entry["seconds"] else 0.0
+        return report
+
+
+def format_report(report) -> str:
+    """Tabela de texto com status, tempo e vazão de cada etapa."""
+    lines = [f"{'etapa':>10} {'status':>8} {'segundos':>9} {'linhas':>9} {'linhas/s':>10}"]
+    for entry in report:
+        lines.append(
+            f"{entry['stage']:>10} {entry['status']:>8} {entry['seconds']:>9.2f} "
+            f"{entry['rows']:>9} {entry['rows_per_second']:>10.0f}"
+        )
+    return "\n".join(lines)
+
+
+# --- ETAPAS DO OSS SENTINEL ---
+# Os motores são importados dentro das etapas: uma execução sem mudanças só
+# calcula fingerprints e não carrega pandas/pyarrow/matplotlib/OpenAI.
+
+def _file_listing(root: Path, pattern: str):
+    """(caminho relativo, tamanho, mtime) dos arquivos: muda se qualquer um mudar."""
+    if not root.exists():
+        return []
+    return sorted(
+        (str(path.relative_to(root)), stat.st_size, stat.st_mtime_ns)
+        for path in root.glob(pattern) for stat in [path.stat()]
+    )
+
+
+def build_pipeline(settings=None, state_path: Path = STATE_PATH) -> Pipeline:
+    """Pipeline ingest -> process -> enrich -> analyze com a configuração de settings.yaml."""
+    settings = settings if settings is not None else load_settings()
+    cfg = settings.get('pipeline', {})
+    # Artefatos intermediários gravados em disco (além do arquivo bruto e do dataset)
+    checkpoints = set(cfg.get('checkpoints') or [])
+    ingest_interval = cfg.get('ingest_interval_minutes', 60) * 60
+
+    raw_dir = BASE_DIR / "data" / "raw"
+    dataset_dir = BASE_DIR / "data" / "enriched" / "dataset"
+
+    def ingest_fingerprint(_):
+        # Dentro da janela de `ingest_interval_minutes`, a mesma config não busca de novo
+        window = int(time.time() // ingest_interval) if ingest_interval else time.time()
+        return {key: settings.get(key) for key in ("github", "parameters", "raw_store")} | {"window": window}
+
+    def ingest(_):
+        from src.ingestion import IngestionEngine
+        stats = IngestionEngine().run()
+        return StageResult(None, sum(s["items"] for s in stats), [])
+
+    def process_fingerprint(_):
+        from src.raw_store import RawStore
+        # Segmentos do arquivo bruto (só crescem quando a ingestão traz versões novas)
+        manifest = RawStore(raw_dir).manifest
+        segments = {source: [seg["name"] for seg in entry.get("segments", [])] for source, entry in manifest.items()}
+        legacy = [f for f in _file_listing(raw_dir, "*.json") if f[0] != manifest.path.name]
+        return {"segments": segments, "legacy": legacy, "config": settings.get('processing'),
+                "checkpoint": "processed" in checkpoints}
+
+    def process(_):
+        from src.processing import ProcessingEngine
+        engine = ProcessingEngine(config=settings)
+        frames, cursors = engine.normalize_pending()
+        artifacts = []
+        if "processed" in checkpoints:
+            artifacts = [engine.save_processed_data(df, f"processed_{source}") for source, df in frames.items()]
+            engine.advance(cursors)
+            cursors = {}
+        rows = sum(len(df) for df in frames.values())
+        return StageResult({"frames": frames, "cursors": cursors, "files": artifacts}, rows, artifacts)
+
+    def load_processed(artifacts):
+        from src.storage import read_table
+        # processed_<alvo>_<YYYYMMDD>_<HHMMSS>.parquet -> <alvo>
+        frames = {
+            Path(path).stem[len("processed_"):].rsplit("_", 2)[0]: read_table(path)
+            for path in artifacts if Path(path).exists()
+        }
+        return {"frames": frames, "cursors": {}, "files": [path for path in artifacts if Path(path).exists()]}
+
+    def enrich_fingerprint(fingerprints):
+        return {"input": fingerprints.get("process"), "config": settings.get('enrichment'),
+                "analysis": settings.get('analysis')}
+
+    def enrich(inputs):
+        processed = inputs.get("process") or {}
+        frames, cursors = processed.get("frames") or {}, processed.get("cursors") or {}
+        if frames:
+            from src.enrichment import EnrichmentEngine
+            # O journal é nomeado pelo último segmento: a mesma entrada retoma de onde parou
+            names = {source: f"pipeline_{source}_{cursors[source]}" for source in frames if source in cursors}
+            engine = EnrichmentEngine(config=settings)
+            engine.enrich_frames(frames, names)
+            # Checkpoints em data/processed já incorporados: `enrich` avulso não os repete
+            for path in processed.get("files") or []:
+                if Path(path).exists():
+                    engine.mark_consumed(Path(path))
+        if cursors:
+            # Sem checkpoint em disco, o cursor do processamento só avança aqui
+            from src.processing import ProcessingEngine
+            ProcessingEngine(config=settings).advance(cursors)
+        return StageResult(None, sum(len(df) for df in frames.values()), [])
+
+    def analyze_fingerprint(_):
+        return {"dataset": _file_listing(dataset_dir, "source_repo=*/*/*.parquet"),
+                "legacy": _file_listing(dataset_dir.parent, "enriched_*.csv"),
+                "analysis": settings.get('analysis')}
+
+    def analyze(_):
+        from src.analyze import main as run_analysis
+        summary = run_analysis()
+        rows = 0 if summary is None or summary.empty else int(summary['Total_Issues'].sum())
+        return StageResult(None, rows, [])
+
+    stages = [
+        Stage("ingest", ingest, ingest_fingerprint),
+        Stage("process", process, process_fingerprint, deps=["ingest"], load=load_processed),
+        Stage("enrich", enrich, enrich_fingerprint, deps=["process"]),
+        Stage("analyze", analyze, analyze_fingerprint, deps=["enrich"]),
+    ]
+    return Pipeline(stages, state_path=state_path)
@@ -1,83 +1,296 @@
 import pandas as pd
 import json
 import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
+
+from src import metrics
+from src.config import load_settings
+import pyarrow.parquet as pq
+
+from src.raw_store import RawStore
+from src.state import StateStore
+from src.storage import PROCESSED_SCHEMA, to_arrow
 
-# Configuração de Logs
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
+# --- COMPACTAÇÃO DO CORPO DAS ISSUES ---
+# Boilerplate de template, checklists vazias e dumps de código/log consomem o
+# orçamento de caracteres do prompt sem ajudar a classificação.
+HTML_COMMENT = r"<!--.*?-->"
+FENCED_BLOCK = re.compile(r"```([^\n]*)\n(.*?)(?:```|\Z)", re.S)
+LANGUAGE_TAG = re.compile(r"^\s*[\w+.-]*\s*$")
+IMAGE_TAG = r"<img\b[^>]*>|!\[[^\]]*\]\([^)]*\)"
+# Sequências de 4+ linhas com cara de stack trace ou log fora de blocos de código
+LOG_LINE = r"(?:\s+at |\s*File \"|\s*Traceback|\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}|\s*\[?(?:DEBUG|INFO|WARN|WARNING|ERROR|FATAL)\b|\s*goroutine \d+|\s+\S+\.go:\d+)"
+LOG_BLOCK = re.compile(rf"(?m)(?:^{LOG_LINE}.*(?:\n|$)){{4,}}")
+UNCHECKED_ITEM = r"(?m)^[ \t]*[-*] \[ \].*$\n?"
+# Título markdown ou linha inteira em negrito; só sai quando a seção abaixo
+# dele está vazia (ou só com o "_No response_" dos issue forms), para não
+# apagar títulos escritos pelo autor nem os de seções preenchidas
+HEADING_LINE = r"[ \t]*(?:#{1,6}[ \t][^\n]*|\*\*[^*\n]{1,80}\*\*:?[ \t]*)$"
+EMPTY_SECTION = rf"(?m)^{HEADING_LINE}(?:\n[ \t]*(?:_No response_)?[ \t]*$)*(?:\n(?={HEADING_LINE})|\s*\Z)"
+DETAILS_TAG = r"(?m)^[ \t]*</?(?:details|summary)>.*$\n?"
+EXTRA_BLANK_LINES = r"\n[ \t]*(?:\n[ \t]*)+"
+SUMMARY_LINE_CHARS = 120
+# Limite de caracteres do texto enviado ao classificador (título + corpo)
+MAX_TEXT_CHARS = 2000
+
+
+def _summarize_block(lines, kind):
+    """Resumo curto de um bloco: tamanho, primeira e última linha não vazias."""
+    lines = [line.strip() for line in lines if line.strip()]
+    if not lines:
+        return ""
+    summary = f"[{kind}: {len(lines)} lines] {lines[0][:SUMMARY_LINE_CHARS]}"
+    if len(lines) > 1:
+        summary += f" ... {lines[-1][:SUMMARY_LINE_CHARS]}"
+    return summary + "\n"
+
+
+def _summarize_fence(match):
+    # Texto logo após a crase tripla só é conteúdo se não for uma tag de linguagem
+    info, content = match.group(1), match.group(2).splitlines()
+    lines = content if LANGUAGE_TAG.match(info) else [info] + content
+    return _summarize_block(lines, "code")
+
+
+def compact_bodies(bodies: pd.Series) -> pd.Series:
+    """
+    Remove comentários HTML, checklists não marcadas e títulos de seções vazias,
+    troca imagens por "[image]" e blocos de código/log por um resumo de uma linha. Cada etapa é
+    aplicada à coluna inteira via pandas.Series.str. Um corpo que ficaria vazio
+    (só títulos ou boilerplate) mantém o original, truncado ao limite do prompt.
+    """
+    original = bodies.fillna("").astype(str)
+    text = original
+    text = text.str.replace("\r\n", "\n", regex=False)
+    text = text.str.replace(HTML_COMMENT, "", regex=True, flags=re.S)
+    text = text.str.replace(FENCED_BLOCK, _summarize_fence, regex=True)
+    text = text.str.replace(IMAGE_TAG, "[image]", regex=True)
+    text = text.str.replace(
+        LOG_BLOCK, lambda m: _summarize_block(m.group(0).splitlines(), "log"), regex=True
+    )
+    text = text.str.replace(UNCHECKED_ITEM, "", regex=True)
+    text = text.str.replace(DETAILS_TAG, "", regex=True)
+    text = text.str.replace(EMPTY_SECTION, "", regex=True)
+    text = text.str.replace(EXTRA_BLANK_LINES, "\n\n", regex=True)
+    text = text.str.strip()
+    return text.where(text != "", original.str.slice(0, MAX_TEXT_CHARS).str.strip())
+
+
+def compaction_report(df: pd.DataFrame) -> Dict[str, Any]:
+    """Economia de caracteres e tokens (~4 caracteres/token) de body -> body_compact."""
+    before = int(df['body'].fillna("").str.len().sum())
+    after = int(df['body_compact'].str.len().sum())
+    return summarize_compaction(before, after)
+
+
+def summarize_compaction(before: int, after: int) -> Dict[str, Any]:
+    """Relatório de compactação a partir dos totais (somáveis entre blocos)."""
+    return {
+        "chars_before": before,
+        "chars_after": after,
+        "tokens_saved": (before - after) // 4,
+        "saving_pct": round(100 * (before - after) / before, 1) if before else 0.0,
+    }
+
+
+# --- LEITURA INCREMENTAL DO JSON BRUTO ---
+
+_WHITESPACE = re.compile(r"[ \t\r\n]*")
+
+
+class _JSONStream:
+    """Cursor sobre um arquivo JSON lido em blocos, decodificando um valor por vez."""
+
+    def __init__(self, f, buffer_size):
+        self.f = f
+        self.buffer_size = buffer_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        # Descarta o prefixo já consumido antes de ler mais
+        if self.pos:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        data = self.f.read(self.buffer_size)
+        if not data:
+            self.eof = True
+        self.buf += data
+
+    def peek(self) -> str:
+        """Próximo caractere não branco (sem consumi-lo); "" no fim do arquivo."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf) or self.eof:
+                return self.buf[self.pos:self.pos + 1]
+            self._fill()
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"JSON inválido: esperado {char!r}, encontrado {found!r}")
+        self.pos += 1
+
+    def decode(self):
+        """Decodifica o próximo valor, lendo mais do arquivo se ele estiver incompleto."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self._fill()
+                continue
+            # Um número no fim do buffer pode continuar no próximo bloco
+            if end == len(self.buf) and not self.eof:
+                self._fill()
+                continue
+            self.pos = end
+            return value
+
+    def iter_array(self) -> Iterator[Any]:
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.decode()
+            if self.peek() == ",":
+                self.pos += 1
+                continue
+            self.expect("]")
+            return
+
+
+def iter_raw_items(filepath: Path, buffer_size=1 << 20) -> Iterator[Dict[str, Any]]:
+    """
+    Itera sobre as issues de um JSON bruto (lista ou dict com 'items') sem
+    carregar o arquivo inteiro: só o item corrente e um buffer de leitura
+    ficam em memória.
+    """
+    with open(filepath, 'r') as f:
+        stream = _JSONStream(f, buffer_size)
+        first = stream.peek()
+        if first == "[":
+            yield from stream.iter_array()
+            return
+        if first != "{":
+            raise ValueError(f"Formato JSON inválido no arquivo {Path(filepath).name}")
+
+        # Dict de resposta da Search API: pula as demais chaves até 'items'
+        stream.expect("{")
+        while stream.peek() != "}":
+            key = stream.decode()
+            stream.expect(":")
+            if key == "items":
+                yield from stream.iter_array()
+            else:
+                stream.decode()
+            if stream.peek() == ",":
+                stream.pos += 1
+        stream.pos += 1
+
+
+def iter_chunks(items: Iterator[Dict[str, Any]], chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+OUTPUT_COLUMNS = [
+    "id", "number", "title", "state", "body", "body_compact",
+    "author", "comments_count", "labels", "url",
+    "created_at", "closed_at"
+]
+
+# Campos da API -> colunas do schema
+FIELD_MAP = {
+    "id": "id",
+    "number": "number",
+    "title": "title",
+    "state": "state",
+    "created_at": "created_at",
+    "closed_at": "closed_at",
+    "body": "body",
+    "comments": "comments_count",
+    "html_url": "url",
+}
+
+
+def _run_job(fn, *args):
+    """Executa um job num processo do pool e devolve também as métricas coletadas nele."""
+    metrics.reset()
+    return fn(*args), metrics.snapshot()
+
+
 class ProcessingEngine:
-    def __init__(self, raw_dir="data/raw", processed_dir="data/processed"):
+    def __init__(self, raw_dir="data/raw", processed_dir="data/processed", config=None,
+                 state_path="data/state/processing_state.json"):
         base_dir = Path(__file__).resolve().parent.parent
         self.raw_dir = base_dir / raw_dir
         self.processed_dir = base_dir / processed_dir
         self.processed_dir.mkdir(parents=True, exist_ok=True)
+        # Último segmento do arquivo bruto já processado, por alvo
+        self.state_path = base_dir / state_path
+
+        settings = config if config is not None else load_settings()
+        cfg = settings.get('processing', {})
+        # Issues normalizadas por vez (limita o pico de memória por arquivo)
+        self.chunk_size = cfg.get('chunk_size', 5000)
+        # Arquivos brutos processados em paralelo (processos)
+        self.max_workers = cfg.get('max_workers', os.cpu_count() or 1)
 
     def load_raw_data(self, filepath: Path) -> List[Dict[str, Any]]:
         """Carrega o JSON bruto. Aceita lista ou dict com 'items'."""
         try:
-            with open(filepath, 'r') as f:
-                data = json.load(f)
-            
-            if isinstance(data, list):
-                return data
-            elif isinstance(data, dict) and 'items' in data:
-                return data['items']
-            else:
-                logger.error(f"Formato JSON inválido no arquivo {filepath.name}")
-                return []
+            return list(iter_raw_items(filepath))
         except Exception as e:
             logger.error(f"Erro ao ler {filepath.name}: {e}")
             return []
 
     def normalize_github_data(self, raw_items: List[Dict]) -> pd.DataFrame:
-        """Normaliza dados de Issues para o Schema padrão."""
+        """
+        Normaliza dados de Issues para o Schema padrão. Cada campo é extraído
+        direto para uma coluna, e o DataFrame é montado uma única vez a
+        partir delas.
+        """
         if not raw_items:
             return pd.DataFrame()
+        with metrics.span("process.normalize"):
+            # Uma lista por coluna (sem montar um dict por issue)
+            columns = {column: [item.get(field) for item in raw_items] for field, column in FIELD_MAP.items()}
+            columns['author'] = [(item.get('user') or {}).get('login', 'Unknown') for item in raw_items]
+            columns['labels'] = [
+                ", ".join([label.get('name', '') for label in labels]) if labels else ""
+                for labels in (item.get('labels') for item in raw_items)
+            ]
+            df = pd.DataFrame(columns)
+            df['body'] = df['body'].fillna("")
 
-        processed_data = []
-
-        for item in raw_items:
-            # Mapeamento de campos (API -> Schema)
-            user_login = item.get('user', {}).get('login', 'Unknown')
-            labels_list = item.get('labels', [])
-            labels_str = ", ".join([l.get('name', '') for l in labels_list])
-
-            record = {
-                "id": item.get("id"),
-                "number": item.get("number"),
-                "title": item.get("title"),
-                "state": item.get("state"),
-                "created_at": item.get("created_at"),
-                "closed_at": item.get("closed_at"),
-                "author": user_login,
-                "body": item.get("body") or "",
-                "comments_count": item.get("comments"),
-                "labels": labels_str,
-                "url": item.get("html_url")
-            }
-            processed_data.append(record)
-
-        df = pd.DataFrame(processed_data)
-        
-        # Ordenação das colunas
-        cols = [
-            "id", "number", "title", "state", "body", 
-            "author", "comments_count", "labels", "url", 
-            "created_at", "closed_at"
-        ]
-        df = df[[c for c in cols if c in df.columns]]
-        
-        return df
+            # Versão compacta do corpo, usada nos prompts de classificação
+            df['body_compact'] = compact_bodies(df['body'])
+
+            # Ordenação das colunas
+            return df[OUTPUT_COLUMNS]
 
     def save_processed_data(self, df: pd.DataFrame, output_filename_base: str):
         """
-        Salva o CSV e JSON.
+        Salva o Parquet tipado.
         output_filename_base: ex: 'processed_apache_superset'
         """
         if df.empty:
@@ -87,58 +300,189 @@ class ProcessingEngine:
         # Adiciona timestamp ao arquivo de saída para versionamento
         timestamp = pd.Timestamp.now().strftime("%Y%m%d_%H%M%S")
         
-        csv_path = self.processed_dir / f"{output_filename_base}_{timestamp}.csv"
-        df.to_csv(csv_path, index=False)
-        logger.info(f"CSV salvo: {csv_path}")
+        parquet_path = self.processed_dir / f"{output_filename_base}_{timestamp}.parquet"
+        pq.write_table(to_arrow(df, PROCESSED_SCHEMA), parquet_path)
+        logger.info(f"Parquet salvo: {parquet_path}")
+        return parquet_path
 
-        json_path = self.processed_dir / f"{output_filename_base}_{timestamp}.json"
-        df.to_json(json_path, orient='records', indent=4)
+    @staticmethod
+    def output_name(raw_file: Path) -> str:
+        """
+        Nome base de saída a partir do arquivo bruto.
+        Input: ingest_apache_superset_20231223_120000.json -> processed_apache_superset
+        """
+        # Remove timestamp do final (últimos 2 separadores _) e prefixo 'ingest_'
+        stem = raw_file.stem
+        parts = stem.rsplit('_', 2)
+        if len(parts) >= 3:
+            return f"processed_{parts[0].replace('ingest_', '')}"
+        # Fallback se o nome estiver estranho
+        return f"processed_{stem}"
 
-    def run_batch(self):
+    def _write_outputs(self, items, output_name: str, label: str) -> Dict[str, Any]:
         """
-        Varre a pasta data/raw e processa todos os arquivos .json encontrados.
+        Normaliza e grava as issues bloco a bloco (chunk_size issues): cada bloco
+        vira um row group do Parquet de saída, gravado num arquivo temporário
+        e movido para o nome final ao terminar.
         """
-        raw_files = list(self.raw_dir.glob("*.json"))
-        
-        if not raw_files:
-            logger.warning("Nenhum arquivo .json encontrado em data/raw.")
-            return
+        timestamp = pd.Timestamp.now().strftime("%Y%m%d_%H%M%S")
+        parquet_path = self.processed_dir / f"{output_name}_{timestamp}.parquet"
+        tmp_path = parquet_path.with_suffix(".parquet.tmp")
+
+        rows = chars_before = chars_after = 0
+        try:
+            with pq.ParquetWriter(tmp_path, PROCESSED_SCHEMA) as writer:
+                for chunk in iter_chunks(items, self.chunk_size):
+                    df = self.normalize_github_data(chunk)
+                    writer.write_table(to_arrow(df, PROCESSED_SCHEMA))
+                    rows += len(df)
+                    chars_before += int(df['body'].str.len().sum())
+                    chars_after += int(df['body_compact'].str.len().sum())
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+        if not rows:
+            tmp_path.unlink()
+            logger.warning(f"Nenhuma issue em {label}. Pulando salvamento.")
+            return {"file": label, "rows": 0}
+
+        os.replace(tmp_path, parquet_path)
+        report = summarize_compaction(chars_before, chars_after)
+        logger.info(f"Compactação do corpo ({output_name}): {report}")
+        logger.info(f"Concluído: {label} -> {parquet_path.name} ({rows} issues)")
+        return {"file": label, "rows": rows, **report}
+
+    def process_file(self, raw_file: Path) -> Dict[str, Any]:
+        """Processa um arquivo JSON bruto (formato antigo) em streaming."""
+        return self._write_outputs(iter_raw_items(raw_file), self.output_name(raw_file), raw_file.name)
+
+    def process_segments(self, source: str, segments: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Processa apenas os segmentos informados do arquivo bruto de um alvo."""
+        store = RawStore(self.raw_dir)
+        label = f"{source} (segmentos {segments[0]['seq']}..{segments[-1]['seq']})"
+        result = self._write_outputs(store.iter_items(source, segments), f"processed_{source}", label)
+        return dict(result, source=source, last_segment=segments[-1]["seq"])
+
+    @staticmethod
+    def file_stamp(raw_file: Path) -> Dict[str, int]:
+        """Tamanho e mtime de um .json antigo: registrado quando ele é processado."""
+        stat = raw_file.stat()
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
 
+    def pending(self):
+        """
+        Trabalho pendente: segmentos do arquivo bruto após o cursor de cada alvo
+        ({alvo: [segmentos]}) e arquivos .json do formato antigo em data/raw
+        ainda não processados (ou alterados desde então).
+        """
+        state = StateStore(self.state_path)
+        store = RawStore(self.raw_dir)
+        segments = {}
+        for source in store.sources():
+            new_segments = store.segments(source, after=(state.get(source) or {}).get("last_segment", 0))
+            if new_segments:
+                segments[source] = new_segments
+        legacy_files = [
+            f for f in sorted(self.raw_dir.glob("*.json"))
+            if f.name != store.manifest.path.name
+            and {k: v for k, v in (state.get(f.name) or {}).items() if k in ("size", "mtime_ns")} != self.file_stamp(f)
+        ]
+        return segments, legacy_files
+
+    def advance(self, cursors: Dict[str, Any]):
+        """
+        Avança o cursor de cada alvo até o último segmento já entregue
+        ({alvo: segmento}) e registra os .json antigos já entregues
+        ({nome do arquivo: file_stamp}).
+        """
+        state = StateStore(self.state_path)
+        now = datetime.now().isoformat(timespec="seconds")
+        for key, cursor in cursors.items():
+            if isinstance(cursor, dict):
+                state.update(key, **cursor, last_run=now)
+            else:
+                state.update(key, last_segment=cursor, last_run=now)
+
+    def _normalize_all(self, items) -> pd.DataFrame:
+        frames = [self.normalize_github_data(chunk) for chunk in iter_chunks(items, self.chunk_size)]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=OUTPUT_COLUMNS)
+
+    def normalize_pending(self):
+        """
+        Normaliza em memória todo o trabalho pendente, um DataFrame por alvo,
+        para o pipeline entregar direto ao enriquecimento sem gravar Parquet.
+        Retorna (frames, cursores); o cursor só avança com `advance`, depois
+        que o consumidor terminou.
+        """
+        store = RawStore(self.raw_dir)
+        segments, legacy_files = self.pending()
+        frames, cursors = {}, {}
+        with metrics.span("process"):
+            for source, new_segments in segments.items():
+                frames[source] = self._normalize_all(store.iter_items(source, new_segments))
+                cursors[source] = new_segments[-1]["seq"]
+            for raw_file in legacy_files:
+                source = self.output_name(raw_file)[len("processed_"):]
+                cursors[raw_file.name] = self.file_stamp(raw_file)
+                df = self._normalize_all(iter_raw_items(raw_file))
+                frames[source] = pd.concat([frames[source], df], ignore_index=True) if source in frames else df
+        metrics.inc("rows_total", sum(len(df) for df in frames.values()), stage="process")
+        return {source: df for source, df in frames.items() if not df.empty}, cursors
+
+    def run_batch(self):
+        """
+        Processa os segmentos do arquivo bruto ainda não lidos (e arquivos .json
+        do formato antigo em data/raw), um alvo/arquivo por processo.
+        """
+        segments, legacy_files = self.pending()
+        # Registrado antes de ler: um .json alterado durante o processamento é refeito
+        legacy_stamps = {raw_file: self.file_stamp(raw_file) for raw_file in legacy_files}
+        jobs = [(self.process_segments, (source, segs), source) for source, segs in segments.items()]
         # Ordena para garantir processamento consistente (opcional)
-        raw_files.sort()
-
-        logger.info(f"Iniciando processamento em lote. {len(raw_files)} arquivos encontrados.")
-
-        for raw_file in raw_files:
-            logger.info(f"--- Processando: {raw_file.name} ---")
-            
-            # 1. Extrair o nome base do arquivo para criar o nome de saída
-            # Input: ingest_apache_superset_20231223_120000.json
-            # Lógica: Remove timestamp do final (últimos 2 separadores _) e prefixo 'ingest_'
-            stem = raw_file.stem  # ingest_apache_superset_20231223_120000
-            parts = stem.rsplit('_', 2) # ['ingest_apache_superset', '20231223', '120000']
-            
-            if len(parts) >= 3:
-                core_name = parts[0].replace("ingest_", "")
-                output_name = f"processed_{core_name}"
+        jobs += [(self.process_file, (raw_file,), raw_file.name) for raw_file in legacy_files]
+
+        if not jobs:
+            logger.info("Nenhum segmento novo ou arquivo .json em data/raw.")
+            return []
+
+        logger.info(f"Iniciando processamento em lote. {len(jobs)} alvos/arquivos com dados novos.")
+
+        results = []
+        workers = max(1, min(self.max_workers, len(jobs)))
+        with metrics.span("process"):
+            if workers == 1:
+                for fn, args, label in jobs:
+                    try:
+                        results.append(fn(*args))
+                    except Exception as e:
+                        logger.error(f"Erro ao processar {label}: {e}")
             else:
-                # Fallback se o nome estiver estranho
-                output_name = f"processed_{stem}"
-
-            # 2. Carregar
-            raw_data = self.load_raw_data(raw_file)
-            
-            # 3. Normalizar
-            df_clean = self.normalize_github_data(raw_data)
-            
-            # 4. Salvar
-            self.save_processed_data(df_clean, output_name)
-            
-            logger.info(f"Concluído: {raw_file.name} -> {output_name}")
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    futures = {pool.submit(_run_job, fn, *args): label for fn, args, label in jobs}
+                    for future in as_completed(futures):
+                        try:
+                            result, snapshot = future.result()
+                        except Exception as e:
+                            logger.error(f"Erro ao processar {futures[future]}: {e}")
+                            continue
+                        results.append(result)
+                        # Spans e contadores registrados no processo filho
+                        metrics.merge(snapshot)
+        metrics.inc("rows_total", sum(r["rows"] for r in results), stage="process")
+
+        # O cursor só avança depois que a saída do alvo foi gravada
+        cursors = {r["source"]: r["last_segment"] for r in results if "last_segment" in r}
+        written = {r["file"] for r in results}
+        cursors.update({f.name: stamp for f, stamp in legacy_stamps.items() if f.name in written})
+        self.advance(cursors)
+        return sorted(results, key=lambda r: r["file"])
 
 def main():
-    engine = ProcessingEngine()
-    engine.run_batch()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    with metrics.run("process"):
+        engine = ProcessingEngine()
+        engine.run_batch()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,83 @@
+import logging
+from collections import namedtuple
+from datetime import timedelta
+
+logger = logging.getLogger(__name__)
+
+# A Search API só expõe os primeiros 1000 resultados de qualquer query
+SEARCH_RESULT_CAP = 1000
+
+# `measured`: False quando a contagem foi deduzida (total do pai menos a
+# metade esquerda) em vez de consultada
+Shard = namedtuple("Shard", ["query", "start", "end", "count", "measured"], defaults=(True,))
+
+
+def format_ts(dt):
+    """Formata um datetime UTC no padrão aceito pelos qualifiers da busca."""
+    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def shard_query(base_query, start, end):
+    return f"{base_query} created:{format_ts(start)}..{format_ts(end)}"
+
+
+class QueryPlanner:
+    """
+    Divide a janela de criação de uma query em sub-intervalos `created:A..B`,
+    bissectando pelo `total_count` até que cada shard fique abaixo do limite.
+
+    count_fn(query) -> int deve retornar o total_count da busca (uma chamada
+    barata com per_page=1).
+
+    O total_count da busca é aproximado, então a contagem deduzida da metade
+    direita (total do pai menos a esquerda) pode errar: um shard deduzido
+    nunca é descartado por ter contagem zero. A primeira página da busca do
+    shard traz o total real, e a ingestão re-planeja se ele passar do limite.
+    """
+
+    def __init__(self, count_fn, cap=SEARCH_RESULT_CAP, min_span=timedelta(seconds=1)):
+        self.count_fn = count_fn
+        self.cap = cap
+        self.min_span = min_span
+
+    def plan(self, base_query, start, end, total=None):
+        """Retorna a lista de Shards (ordenada por início) cobrindo [start, end]."""
+        if total is None:
+            total = self.count_fn(shard_query(base_query, start, end))
+
+        shards = []
+        pending = [(start, end, total, True)]
+        probes = 0
+
+        while pending:
+            lo, hi, count, measured = pending.pop()
+            if count == 0 and measured:
+                continue
+            if count <= self.cap:
+                shards.append(Shard(shard_query(base_query, lo, hi), lo, hi, count, measured))
+                continue
+            if hi - lo <= self.min_span:
+                # Não há como dividir mais: aceita o shard truncado, mas avisa
+                logger.warning(
+                    f"Shard {format_ts(lo)}..{format_ts(hi)} ainda tem {count} resultados "
+                    f"(limite {self.cap}); o excedente será perdido."
+                )
+                shards.append(Shard(shard_query(base_query, lo, hi), lo, hi, count, measured))
+                continue
+
+            # Os limites do qualifier são inclusivos: [lo, mid] e [mid + 1s, hi]
+            mid = lo + (hi - lo) / 2
+            mid = mid.replace(microsecond=0)
+            left = self.count_fn(shard_query(base_query, lo, mid))
+            probes += 1
+            # A metade direita não é consultada: a contagem é deduzida do total
+            pending.append((mid + timedelta(seconds=1), hi, max(count - left, 0), False))
+            pending.append((lo, mid, left, True))
+
+        shards.sort(key=lambda s: s.start)
+        inferred = sum(not s.measured for s in shards)
+        logger.info(
+            f"Plano para '{base_query}': {len(shards)} shards, {inferred} com contagem deduzida "
+            f"(~{sum(s.count for s in shards)} resultados, {probes} consultas de contagem)."
+        )
+        return shards
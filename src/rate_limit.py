@@ -0,0 +1,161 @@
+import random
+import threading
+import time
+import logging
+
+from src import metrics
+
+logger = logging.getLogger(__name__)
+
+# Orçamentos documentados da API do GitHub (requisições, janela em segundos)
+GITHUB_BUDGETS = {
+    "authenticated": {"search": (30, 60), "core": (5000, 3600)},
+    "anonymous": {"search": (10, 60), "core": (60, 3600)},
+}
+
+
+class RateLimitError(Exception):
+    """Orçamento esgotado após todas as tentativas de retry."""
+
+
+class TokenBucket:
+    """
+    Balde de tokens thread-safe com reabastecimento contínuo.
+    Pode ser sincronizado com o saldo informado pelo servidor (headers).
+    """
+
+    def __init__(self, capacity, period, clock=time.monotonic, sleep=time.sleep):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = float(capacity)
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+        # Estatísticas de uso
+        self.acquired = 0
+        self.waited = 0.0
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self._updated = now
+
+    def acquire(self, amount=1):
+        """Bloqueia até haver `amount` tokens disponíveis e os consome."""
+        # Um pedido maior que a capacidade nunca seria atendido
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._refill(now)
+                if now >= self._blocked_until and self.tokens >= amount:
+                    self.tokens -= amount
+                    self.acquired += amount
+                    return
+                wait = max(self._blocked_until - now, (amount - self.tokens) / self.rate)
+                self.waited += wait
+            self._sleep(wait)
+
+    def sync(self, remaining, wait_seconds=None):
+        """
+        Ajusta o saldo local ao saldo do servidor. Se o servidor informar
+        saldo zero, bloqueia novas aquisições por `wait_seconds`.
+        """
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            self.tokens = min(self.tokens, float(remaining))
+            if wait_seconds is not None and wait_seconds > 0:
+                self._blocked_until = max(self._blocked_until, now + wait_seconds)
+
+    def pause(self, seconds):
+        """Suspende o balde por `seconds` (ex: Retry-After)."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, self._clock() + seconds)
+
+
+class RateLimitScheduler:
+    """
+    Agendador compartilhado entre todos os alvos: um TokenBucket por recurso
+    da API (search, core), mantido em sincronia com os headers X-RateLimit-*
+    e Retry-After, e backoff exponencial com jitter para as retentativas.
+    """
+
+    def __init__(self, authenticated=True, base_delay=1.0, max_delay=120.0,
+                 clock=time.monotonic, sleep=time.sleep):
+        budgets = GITHUB_BUDGETS["authenticated" if authenticated else "anonymous"]
+        self.buckets = {
+            resource: TokenBucket(capacity, period, clock=clock, sleep=sleep)
+            for resource, (capacity, period) in budgets.items()
+        }
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._server_state = {}
+        self.retries = {resource: 0 for resource in self.buckets}
+
+    def acquire(self, resource="search"):
+        self.buckets[resource].acquire()
+
+    def update(self, resource, headers):
+        """Sincroniza o balde do recurso com os headers da resposta."""
+        resource = headers.get("X-RateLimit-Resource", resource)
+        bucket = self.buckets.get(resource)
+        remaining = headers.get("X-RateLimit-Remaining")
+        if bucket is None or remaining is None:
+            return
+
+        remaining = int(remaining)
+        reset = headers.get("X-RateLimit-Reset")
+        wait = None
+        if remaining == 0 and reset is not None:
+            wait = max(0.0, int(reset) - time.time()) + 1
+
+        with self._lock:
+            self._server_state[resource] = {
+                "limit": int(headers.get("X-RateLimit-Limit", bucket.capacity)),
+                "remaining": remaining,
+                "reset": int(reset) if reset is not None else None,
+            }
+        bucket.sync(remaining, wait)
+        metrics.set_gauge("rate_limit_remaining", remaining, api="github", resource=resource)
+        metrics.set_gauge("rate_limit_limit", int(headers.get("X-RateLimit-Limit", bucket.capacity)),
+                          api="github", resource=resource)
+
+    def backoff(self, resource, attempt, headers=None):
+        """
+        Calcula e aplica a espera antes da próxima tentativa.
+        Prioridade: Retry-After > X-RateLimit-Reset > exponencial com jitter.
+        """
+        headers = headers or {}
+        with self._lock:
+            self.retries[resource] = self.retries.get(resource, 0) + 1
+
+        retry_after = headers.get("Retry-After")
+        if retry_after is not None:
+            delay = float(retry_after)
+        elif headers.get("X-RateLimit-Remaining") == "0" and headers.get("X-RateLimit-Reset"):
+            delay = max(0.0, int(headers["X-RateLimit-Reset"]) - time.time()) + 1
+        else:
+            # "Full jitter": evita que vários alvos retentem em sincronia
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+        logger.warning(f"Rate limit ({resource}): aguardando {delay:.1f}s (tentativa {attempt + 1}).")
+        self.buckets[resource].pause(delay)
+        return delay
+
+    def report(self):
+        """Resumo do orçamento consumido por recurso na execução."""
+        summary = {}
+        for resource, bucket in self.buckets.items():
+            summary[resource] = {
+                "requests": bucket.acquired,
+                "retries": self.retries.get(resource, 0),
+                "waited_seconds": round(bucket.waited, 2),
+                **self._server_state.get(resource, {}),
+            }
+        return summary
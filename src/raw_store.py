@@ -0,0 +1,150 @@
+import gzip
+import json
+import os
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+from src.state import StateStore
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+RAW_DIR = BASE_DIR / "data" / "raw"
+
+# Campos da Search API usados pelo processamento; o resto do payload é descartado
+PROJECTED_FIELDS = (
+    "id", "number", "title", "state", "body", "comments", "html_url",
+    "created_at", "updated_at", "closed_at",
+)
+
+
+def project_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduz uma issue da API aos campos usados, mantendo o formato de user/labels."""
+    record = {field: item.get(field) for field in PROJECTED_FIELDS}
+    record["user"] = {"login": (item.get("user") or {}).get("login", "Unknown")}
+    record["labels"] = [{"name": label.get("name", "")} for label in item.get("labels") or []]
+    return record
+
+
+class RawStore:
+    """
+    Arquivo bruto append-only: cada ingestão de um alvo grava um segmento
+    NDJSON comprimido (gzip) em data/raw/<alvo>/, só com as versões de issues
+    ainda não vistas (par id + updated_at) e só com os campos projetados.
+
+    O manifest (data/raw/manifest.json) lista os segmentos de cada alvo em
+    ordem; consumidores guardam o número do último segmento lido e pedem
+    apenas os seguintes.
+    """
+
+    def __init__(self, root: Path = RAW_DIR, compression_level=6):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.compression_level = compression_level
+        self.manifest = StateStore(self.root / "manifest.json")
+
+    def sources(self) -> List[str]:
+        return sorted(source for source, _ in self.manifest.items())
+
+    def segments(self, source, after=0) -> List[Dict[str, Any]]:
+        """Segmentos do alvo com número maior que `after`, em ordem."""
+        entry = self.manifest.get(source, {})
+        return [seg for seg in entry.get("segments", []) if seg["seq"] > after]
+
+    def _index_path(self, source):
+        return self.root / source / "index.json"
+
+    def load_index(self, source) -> Dict[str, str]:
+        """Última versão conhecida de cada issue: {id (str): updated_at}."""
+        path = self._index_path(source)
+        if not path.exists():
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def _write_atomic(self, path: Path, write):
+        tmp_path = path.with_name(path.name + ".tmp")
+        write(tmp_path)
+        os.replace(tmp_path, path)
+
+    def append(self, source, items) -> Dict[str, Any]:
+        """
+        Grava num novo segmento as issues novas ou alteradas desde a última
+        versão indexada. Retorna {"segment", "written", "skipped"}.
+        """
+        index = self.load_index(source)
+        fresh = {}
+        for item in items:
+            key, updated_at = str(item["id"]), item.get("updated_at") or ""
+            known = index.get(key)
+            if known is not None and known >= updated_at:
+                continue
+            # Dentro do lote, vale a versão mais recente
+            if key not in fresh or (fresh[key].get("updated_at") or "") < updated_at:
+                fresh[key] = item
+
+        skipped = len(items) - len(fresh)
+        if not fresh:
+            logger.info(f"[{source}] Nenhuma versão nova de issue; nenhum segmento gravado.")
+            return {"segment": None, "written": 0, "skipped": skipped}
+
+        entry = self.manifest.get(source, {})
+        seq = entry.get("next_segment", 1)
+        directory = self.root / source
+        directory.mkdir(parents=True, exist_ok=True)
+        name = f"segment-{seq:06d}.ndjson.gz"
+
+        def write_segment(path):
+            with gzip.open(path, "wt", compresslevel=self.compression_level) as f:
+                for item in fresh.values():
+                    f.write(json.dumps(project_item(item), separators=(",", ":")) + "\n")
+
+        self._write_atomic(directory / name, write_segment)
+
+        index.update({key: item.get("updated_at") or "" for key, item in fresh.items()})
+
+        def write_index(path):
+            with open(path, "w") as f:
+                json.dump(index, f, separators=(",", ":"))
+
+        self._write_atomic(self._index_path(source), write_index)
+
+        # O manifest é o último a mudar: um segmento só "existe" depois dele
+        segment = {
+            "seq": seq,
+            "name": name,
+            "rows": len(fresh),
+            "bytes": (directory / name).stat().st_size,
+            "max_updated_at": max(item.get("updated_at") or "" for item in fresh.values()),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        self.manifest.update(
+            source, segments=entry.get("segments", []) + [segment], next_segment=seq + 1
+        )
+        logger.info(
+            f"[{source}] Segmento {name}: {len(fresh)} issues ({skipped} versões já conhecidas), "
+            f"{segment['bytes'] / 1024:.0f} KB."
+        )
+        return {"segment": seq, "written": len(fresh), "skipped": skipped}
+
+    def iter_items(self, source, segments) -> Iterator[Dict[str, Any]]:
+        """
+        Issues dos segmentos informados, uma linha por vez. Versões superadas
+        por um segmento posterior são ignoradas (o índice guarda a mais recente).
+        """
+        index = self.load_index(source)
+        for segment in segments:
+            with gzip.open(self.root / source / segment["name"], "rt") as f:
+                for line in f:
+                    item = json.loads(line)
+                    if index.get(str(item["id"]), "") <= (item.get("updated_at") or ""):
+                        yield item
+
+    def import_snapshot(self, source, path: Path) -> Dict[str, Any]:
+        """Importa um snapshot JSON antigo (ingest_<alvo>_<ts>.json) como segmento."""
+        with open(path) as f:
+            data = json.load(f)
+        items = data.get("items", []) if isinstance(data, dict) else data
+        return self.append(source, items)
@@ -0,0 +1,425 @@
+"""
+Renderização dos gráficos do relatório em data/analysis/plots.
+
+Cada figura é descrita por um FigureSpec: chave (caminho do PNG sem
+extensão), tipo, título, os DataFrames agregados de onde é desenhada e
+parâmetros de layout. A impressão digital da figura é o hash desses dados;
+figuras cuja impressão não mudou desde a última renderização (registrada em
+index.json) não são redesenhadas. As demais são renderizadas num pool de
+processos com o backend Agg, pela API orientada a objetos do matplotlib (sem
+o estado global do pyplot).
+
+Tipos de figura:
+- heatmap: sentimento médio repositório x top labels, paginado por repositórios
+- ranking: Pain Index médio por repositório, paginado
+- repo: uma por repositório (Pain Index semanal + labels do repositório)
+- label_group: small multiples, um painel por label mais frequente, com os
+  repositórios que mais usam o label
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from html import escape
+from pathlib import Path
+
+import pandas as pd
+
+from src import metrics
+from src.config import load_settings
+
+logger = logging.getLogger(__name__)
+
+# Muda quando o desenho das figuras muda, para invalidar as já renderizadas
+STYLE_VERSION = 1
+
+FigureSpec = namedtuple("FigureSpec", ["key", "kind", "title", "data", "params"])
+
+HEATMAP_KEY = "heatmap_sentiment_labels"
+RANKING_KEY = "barplot_pain_index_comparison"
+
+
+def _slug(name) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", str(name)).strip("_") or "_"
+
+
+def _paged_key(key, page):
+    # A primeira página mantém o nome histórico do arquivo
+    return key if page == 1 else f"{key}_p{page}"
+
+
+def _round(frame, decimals=4):
+    """Arredonda as colunas numéricas: ruído de ponto flutuante não invalida a figura."""
+    numeric = frame.select_dtypes("number").columns
+    return frame.assign(**{column: frame[column].round(decimals) for column in numeric})
+
+
+def figure_fingerprint(spec: FigureSpec) -> str:
+    """Hash dos dados agregados, do título e dos parâmetros de uma figura."""
+    head = json.dumps([STYLE_VERSION, spec.kind, spec.title, spec.params], sort_keys=True, default=str)
+    digest = hashlib.sha256(head.encode())
+    for name in sorted(spec.data):
+        frame = spec.data[name]
+        digest.update(f"{name}:{list(frame.columns)}:{list(frame.index.names)}".encode())
+        digest.update(pd.util.hash_pandas_object(frame, index=True).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+# --- ESPECIFICAÇÃO DAS FIGURAS ---
+
+def heatmap_specs(stats, top_labels, repos_per_page=40):
+    """Sentimento médio por repositório x top labels, `repos_per_page` repositórios por página."""
+    if not top_labels or stats is None or stats.empty:
+        return []
+    top_stats = stats[stats.index.get_level_values('label').isin(top_labels)]
+    # Repositórios nas linhas, top labels nas colunas (vazio onde o repo não usa o label)
+    wide = _round(top_stats['mean_sentiment'].unstack('label').reindex(columns=top_labels).sort_index())
+    pages = max(1, -(-len(wide) // repos_per_page))
+    title = 'Sentimento Médio por Repositório e Top Labels'
+    return [
+        FigureSpec(_paged_key(HEATMAP_KEY, page), "heatmap",
+                   title if pages == 1 else f"{title} ({page}/{pages})",
+                   {"sentiment": wide.iloc[(page - 1) * repos_per_page:page * repos_per_page]}, {})
+        for page in range(1, pages + 1)
+    ]
+
+
+def ranking_specs(summary, repos_per_page=40):
+    """Pain Index médio por repositório (pior clima primeiro), paginado."""
+    if summary.empty:
+        return []
+    repo_pain = summary[['source_repo', 'Pain_Index_Mean']].rename(columns={'Pain_Index_Mean': 'pain_index'})
+    repo_pain = _round(repo_pain.sort_values(['pain_index', 'source_repo']).reset_index(drop=True))
+    pages = max(1, -(-len(repo_pain) // repos_per_page))
+    title = 'Comparação de "Clima" (Pain Index Médio) por Repositório'
+    return [
+        FigureSpec(_paged_key(RANKING_KEY, page), "ranking",
+                   title if pages == 1 else f"{title} ({page}/{pages})",
+                   {"pain": repo_pain.iloc[(page - 1) * repos_per_page:page * repos_per_page].reset_index(drop=True)},
+                   {})
+        for page in range(1, pages + 1)
+    ]
+
+
+def repo_specs(summary, label_summary, weekly, weeks=52, labels_per_repo=10):
+    """
+    Uma figura por repositório: Pain Index semanal (e média móvel) nas
+    últimas `weeks` semanas com issues e os labels mais usados no repositório.
+    As semanas vazias depois da última issue do repositório ficam de fora,
+    para que semanas novas de outros repositórios não invalidem a figura.
+    """
+    if summary.empty:
+        return []
+    trend_columns = ["bucket", "issues", "pain_index", "pain_index_rolling"]
+    by_repo = {}
+    if not weekly.empty:
+        active = weekly[weekly['issues'] > 0]
+        last = active.groupby('source_repo')['bucket'].max()
+        trimmed = weekly[weekly['bucket'] <= weekly['source_repo'].map(last)]
+        by_repo = {repo: frame for repo, frame in trimmed.groupby('source_repo', sort=False)}
+    label_columns = ["label", "Total_Issues", "Pain_Index_Mean"]
+    labels_by_repo = {}
+    if not label_summary.empty:
+        labels_by_repo = {repo: frame for repo, frame in label_summary.groupby('source_repo', sort=False)}
+
+    specs = []
+    for row in summary.itertuples(index=False):
+        repo = row.source_repo
+        trend = by_repo.get(repo, pd.DataFrame(columns=trend_columns))[trend_columns].tail(weeks)
+        labels = labels_by_repo.get(repo, pd.DataFrame(columns=label_columns))
+        labels = labels.sort_values(['Total_Issues', 'label'], ascending=[False, True]).head(labels_per_repo)
+        specs.append(FigureSpec(
+            f"repos/{_slug(repo)}", "repo",
+            f"{repo}: {int(row.Total_Issues)} issues, Pain Index médio {row.Pain_Index_Mean:.2f}",
+            {"weekly": _round(trend.reset_index(drop=True)), "labels": _round(labels[label_columns].reset_index(drop=True))},
+            {"repo": repo},
+        ))
+    return specs
+
+
+def label_group_specs(label_summary, groups=4, labels_per_group=6, repos_per_label=15):
+    """
+    Os `groups * labels_per_group` labels com mais issues, em grupos de
+    `labels_per_group` painéis; cada painel mostra o Pain Index médio dos
+    `repos_per_label` repositórios com mais issues daquele label.
+    """
+    if label_summary.empty:
+        return []
+    totals = label_summary.groupby('label')['Total_Issues'].sum()
+    ranked = totals.reset_index().sort_values(['Total_Issues', 'label'], ascending=[False, True])['label']
+    top = list(ranked.head(groups * labels_per_group))
+    columns = ["label", "source_repo", "Total_Issues", "Pain_Index_Mean"]
+    selected = label_summary[label_summary['label'].isin(top)][columns]
+    selected = (selected.sort_values(['label', 'Total_Issues', 'source_repo'], ascending=[True, False, True])
+                .groupby('label', sort=False).head(repos_per_label))
+
+    specs = []
+    count = -(-len(top) // labels_per_group)
+    for group in range(count):
+        labels = top[group * labels_per_group:(group + 1) * labels_per_group]
+        panels = selected[selected['label'].isin(labels)]
+        panels = panels.assign(order=panels['label'].map({label: i for i, label in enumerate(labels)}))
+        panels = panels.sort_values(['order', 'Total_Issues', 'source_repo'], ascending=[True, False, True])
+        specs.append(FigureSpec(
+            f"labels/group_{group + 1:02d}", "label_group",
+            f"Pain Index Médio por Repositório nos Labels Mais Frequentes ({group + 1}/{count})",
+            {"panels": _round(panels.drop(columns="order").reset_index(drop=True))},
+            {"labels": labels},
+        ))
+    return specs
+
+
+# --- DESENHO (roda nos processos do pool) ---
+
+def _init_backend():
+    """Backend sem display e tema do seaborn, uma vez por processo."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import seaborn as sns
+
+    # Estilo profissional para plots
+    sns.set_theme(style="whitegrid")
+
+
+def _draw_heatmap(title, data, params):
+    import seaborn as sns
+    from matplotlib.figure import Figure
+
+    heatmap_df = data["sentiment"]
+    fig = Figure(figsize=(10, max(6, 0.35 * len(heatmap_df) + 2)))
+    ax = fig.subplots()
+    sns.heatmap(heatmap_df, annot=True, cmap='coolwarm', center=0, fmt=".2f", linewidths=.5, ax=ax)
+    ax.set_title(title, fontsize=14, fontweight='bold')
+    ax.set_ylabel('Repositório', fontsize=12)
+    ax.set_xlabel('Label', fontsize=12)
+    return fig
+
+
+def _draw_ranking(title, data, params):
+    import seaborn as sns
+    from matplotlib.figure import Figure
+
+    repo_pain = data["pain"]
+    fig = Figure(figsize=(10, max(6, 0.3 * len(repo_pain) + 2)))
+    ax = fig.subplots()
+    # Usando uma paleta que indica intensidade
+    sns.barplot(x='pain_index', y='source_repo', hue='source_repo', data=repo_pain,
+                palette="vlag", legend=False, ax=ax)
+    # Adicionar linha de referência (Neutro = 0)
+    ax.axvline(x=0, color='black', linestyle='--', linewidth=1)
+    ax.set_title(title, fontsize=14, fontweight='bold')
+    ax.set_xlabel('Pain Index Médio (Negativo = Dor, Positivo = Oportunidade)', fontsize=12)
+    ax.set_ylabel('Repositório', fontsize=12)
+    return fig
+
+
+def _bar_colors(values):
+    return ["#b2182b" if v < 0 else "#2166ac" for v in values]
+
+
+def _draw_repo(title, data, params):
+    from matplotlib.figure import Figure
+
+    weekly, labels = data["weekly"], data["labels"]
+    fig = Figure(figsize=(13, 4.5))
+    trend_ax, label_ax = fig.subplots(1, 2, gridspec_kw={"width_ratios": [3, 2]})
+
+    if weekly.empty:
+        trend_ax.text(0.5, 0.5, "Sem issues no período", ha='center', va='center', transform=trend_ax.transAxes)
+    else:
+        buckets = pd.to_datetime(weekly['bucket'])
+        trend_ax.plot(buckets, weekly['pain_index'], marker='o', markersize=3, linewidth=1, label='Semana')
+        trend_ax.plot(buckets, weekly['pain_index_rolling'], linewidth=2, label='Média móvel')
+        trend_ax.axhline(0, color='black', linestyle='--', linewidth=1)
+        trend_ax.legend(loc='lower left', fontsize=9)
+        trend_ax.tick_params(axis='x', labelrotation=30)
+    trend_ax.set_title('Pain Index Semanal', fontsize=12)
+    trend_ax.set_ylabel('Pain Index Médio')
+
+    if labels.empty:
+        label_ax.text(0.5, 0.5, "Sem labels", ha='center', va='center', transform=label_ax.transAxes)
+    else:
+        names = [f"{label} ({int(n)})" for label, n in zip(labels['label'], labels['Total_Issues'])]
+        label_ax.barh(names, labels['Pain_Index_Mean'], color=_bar_colors(labels['Pain_Index_Mean']))
+        label_ax.invert_yaxis()
+        label_ax.axvline(0, color='black', linestyle='--', linewidth=1)
+    label_ax.set_title('Labels Mais Usados (Pain Index Médio, nº de issues)', fontsize=12)
+
+    fig.suptitle(title, fontsize=14, fontweight='bold')
+    return fig
+
+
+def _draw_label_group(title, data, params):
+    from matplotlib.figure import Figure
+
+    panels, labels = data["panels"], params["labels"]
+    columns = min(3, len(labels))
+    rows = -(-len(labels) // columns)
+    fig = Figure(figsize=(5 * columns, 4.5 * rows))
+    axes = fig.subplots(rows, columns, squeeze=False).ravel()
+    for ax, label in zip(axes, labels):
+        panel = panels[panels['label'] == label]
+        ax.barh(panel['source_repo'], panel['Pain_Index_Mean'], color=_bar_colors(panel['Pain_Index_Mean']))
+        ax.invert_yaxis()
+        ax.axvline(0, color='black', linestyle='--', linewidth=1)
+        ax.set_title(f"{label} ({int(panel['Total_Issues'].sum())} issues)", fontsize=11)
+        ax.tick_params(axis='y', labelsize=8)
+    for ax in axes[len(labels):]:
+        ax.set_visible(False)
+    fig.suptitle(title, fontsize=14, fontweight='bold')
+    return fig
+
+
+DRAWERS = {
+    "heatmap": _draw_heatmap,
+    "ranking": _draw_ranking,
+    "repo": _draw_repo,
+    "label_group": _draw_label_group,
+}
+
+
+def render_figure(kind, title, data, params, path: Path) -> float:
+    """Desenha uma figura e grava o PNG de forma atômica. Devolve a duração em segundos."""
+    start = time.perf_counter()
+    fig = DRAWERS[kind](title, data, params)
+    fig.tight_layout()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    fig.savefig(tmp_path, format="png")
+    os.replace(tmp_path, path)
+    return time.perf_counter() - start
+
+
+# --- RENDERIZAÇÃO INCREMENTAL ---
+
+class ReportRenderer:
+    """
+    Renderiza FigureSpecs em `plots_dir`, pulando as figuras cujos dados não
+    mudaram. O índice (index.json, com uma página index.html para navegação)
+    guarda, por figura, o arquivo, o tipo, o título e a impressão digital.
+    """
+
+    def __init__(self, plots_dir, config=None):
+        settings = config if config is not None else load_settings()
+        cfg = settings.get('analysis', {}).get('report', {})
+        self.plots_dir = Path(plots_dir)
+        self.index_path = self.plots_dir / "index.json"
+        # Processos desenhando figuras em paralelo (desenhar é só CPU: no máximo um por núcleo)
+        self.max_workers = min(cfg.get('workers') or os.cpu_count() or 1, os.cpu_count() or 1)
+
+    def load_index(self):
+        if not self.index_path.exists():
+            return {}
+        try:
+            return json.loads(self.index_path.read_text()).get("figures", {})
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"Índice de figuras corrompido, todas serão redesenhadas: {e}")
+            return {}
+
+    def path(self, key) -> Path:
+        return self.plots_dir / f"{key}.png"
+
+    def render(self, specs):
+        """
+        Redesenha só as figuras novas ou com dados alterados. Figuras dos
+        tipos em `specs` que deixaram de existir (ex: repositório removido,
+        página a menos) são apagadas; as de outros tipos ficam como estão.
+        """
+        index = self.load_index()
+        kinds = {spec.kind for spec in specs}
+        figures = {key: entry for key, entry in index.items() if entry.get("kind") not in kinds}
+
+        stale = []
+        for spec in specs:
+            digest = figure_fingerprint(spec)
+            entry = index.get(spec.key)
+            if entry and entry.get("fingerprint") == digest and self.path(spec.key).exists():
+                figures[spec.key] = entry
+            else:
+                stale.append((spec, digest))
+        skipped = len(specs) - len(stale)
+
+        rendered = 0
+        for spec, digest, seconds in self._render_all(stale):
+            metrics.observe("span_seconds", seconds, span="analyze.figure", kind=spec.kind)
+            figures[spec.key] = {
+                "file": f"{spec.key}.png",
+                "kind": spec.kind,
+                "title": spec.title,
+                "fingerprint": digest,
+                "rendered_at": datetime.now().isoformat(timespec="seconds"),
+                **spec.params,
+            }
+            rendered += 1
+
+        live = {spec.key for spec in specs}
+        removed = [key for key, entry in index.items() if entry.get("kind") in kinds and key not in live]
+        for key in removed:
+            self.path(key).unlink(missing_ok=True)
+
+        self._save_index(figures)
+        result = {"rendered": rendered, "skipped": skipped, "removed": len(removed), "failed": len(stale) - rendered}
+        for outcome, count in result.items():
+            metrics.inc("report_figures_total", count, result=outcome)
+        return result
+
+    def _render_all(self, stale):
+        """Gera (spec, impressão digital, segundos) das figuras desenhadas com sucesso."""
+        if not stale:
+            return
+        workers = max(1, min(self.max_workers, len(stale)))
+        if workers == 1:
+            _init_backend()
+            for spec, digest in stale:
+                try:
+                    yield spec, digest, render_figure(spec.kind, spec.title, spec.data, spec.params, self.path(spec.key))
+                except Exception as e:
+                    logger.error(f"Erro ao desenhar {spec.key}: {e}")
+            return
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_backend) as pool:
+            futures = {
+                pool.submit(render_figure, spec.kind, spec.title, spec.data, spec.params, self.path(spec.key)):
+                    (spec, digest)
+                for spec, digest in stale
+            }
+            for future in as_completed(futures):
+                spec, digest = futures[future]
+                try:
+                    yield spec, digest, future.result()
+                except Exception as e:
+                    logger.error(f"Erro ao desenhar {spec.key}: {e}")
+
+    def _save_index(self, figures):
+        self.plots_dir.mkdir(parents=True, exist_ok=True)
+        payload = {"generated_at": datetime.now().isoformat(timespec="seconds"),
+                   "figures": dict(sorted(figures.items()))}
+        tmp_path = self.index_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(payload, indent=2, ensure_ascii=False))
+        os.replace(tmp_path, self.index_path)
+
+        sections = []
+        for kind in DRAWERS:
+            entries = [entry for entry in payload["figures"].values() if entry.get("kind") == kind]
+            if not entries:
+                continue
+            items = "\n".join(
+                f'<figure><a href="{escape(e["file"])}"><img src="{escape(e["file"])}" loading="lazy"></a>'
+                f'<figcaption>{escape(e["title"])}</figcaption></figure>'
+                for e in entries
+            )
+            sections.append(f"<h2>{kind} ({len(entries)})</h2>\n{items}")
+        html = (
+            '<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>OSS Sentinel - Gráficos</title>'
+            "<style>figure{display:inline-block;width:32%;margin:.5%;vertical-align:top}"
+            "img{width:100%}</style></head><body>\n"
+            f"<h1>OSS Sentinel ({payload['generated_at']})</h1>\n" + "\n".join(sections) + "\n</body></html>\n"
+        )
+        tmp_path = self.index_path.with_name("index.html.tmp")
+        tmp_path.write_text(html)
+        os.replace(tmp_path, self.index_path.with_name("index.html"))
@@ -0,0 +1,97 @@
+import json
+import os
+import threading
+import logging
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: só a exclusão entre threads do mesmo processo
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def file_lock(path: Path):
+    """Lock exclusivo entre processos (fcntl.flock) sobre um arquivo auxiliar `path`."""
+    if fcntl is None:
+        yield
+        return
+    with open(path, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class StateStore:
+    """
+    Armazena estado persistente (dict de chave -> dict) em um arquivo JSON.
+    As escritas são atômicas (arquivo temporário + os.replace) e thread-safe.
+
+    Vários processos (workers da fila, inclusive em outras máquinas com o
+    mesmo volume) podem compartilhar o arquivo: `update` relê o arquivo sob
+    um lock de arquivo e altera só a sua chave, e as leituras recarregam o
+    arquivo quando outro processo o trocou.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._data = self._load()
+
+    def _stat(self):
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _load(self):
+        self._stamp = self._stat()
+        if self._stamp is None:
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"Estado corrompido em {self.path.name}, recomeçando do zero: {e}")
+            return {}
+
+    def _refresh(self):
+        """Recarrega o arquivo se outro processo o gravou desde a última leitura."""
+        if self._stat() != self._stamp:
+            self._data = self._load()
+
+    def get(self, key, default=None):
+        with self._lock:
+            self._refresh()
+            if key not in self._data:
+                return default
+            return dict(self._data[key])
+
+    def items(self):
+        """Cópia (chave, dict) de todas as entradas."""
+        with self._lock:
+            self._refresh()
+            return [(key, dict(value)) for key, value in self._data.items()]
+
+    def update(self, key, **fields):
+        """Atualiza campos de uma chave e persiste imediatamente."""
+        with self._lock, file_lock(self.path.with_suffix(self.path.suffix + ".lock")):
+            self._refresh()
+            entry = self._data.setdefault(key, {})
+            entry.update(fields)
+            self._save()
+
+    def _save(self):
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(self._data, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        self._stamp = self._stat()
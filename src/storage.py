@@ -0,0 +1,288 @@
+import logging
+import os
+import shutil
+from collections import namedtuple
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+# Dataset Parquet particionado: source_repo=<repo>/created_month=<YYYY-MM>/
+ENRICHED_DATASET_DIR = BASE_DIR / "data" / "enriched" / "dataset"
+
+_CATEGORY = pa.dictionary(pa.int32(), pa.string())
+_TIMESTAMP = pa.timestamp("us", tz="UTC")
+
+PROCESSED_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("number", pa.int64()),
+    ("title", pa.string()),
+    ("state", _CATEGORY),
+    ("body", pa.string()),
+    ("body_compact", pa.string()),
+    ("author", pa.string()),
+    ("comments_count", pa.int64()),
+    ("labels", pa.string()),
+    ("url", pa.string()),
+    ("created_at", _TIMESTAMP),
+    ("closed_at", _TIMESTAMP),
+])
+
+ENRICHED_SCHEMA = pa.schema(list(PROCESSED_SCHEMA) + [
+    ("sentiment", _CATEGORY),
+    ("category", _CATEGORY),
+    ("urgency", _CATEGORY),
+    ("duplicate_of", pa.int64()),
+    ("label_source", _CATEGORY),
+])
+
+# Resultado de EnrichedStore.upsert_source: linhas gravadas, linhas mantidas
+# das partições regravadas e número de partições regravadas
+UpsertStats = namedtuple("UpsertStats", ["rows", "kept", "partitions"])
+
+PARTITIONING = ds.partitioning(pa.schema([("created_month", pa.string())]), flavor="hive")
+
+DATASET_PARTITIONING = ds.partitioning(
+    pa.schema([("source_repo", pa.string()), ("created_month", pa.string())]), flavor="hive"
+)
+
+# Schemas de leitura com as colunas de partição: arquivos gravados antes de uma
+# coluna nova existir a leem como nula
+_SOURCE_READ_SCHEMA = ENRICHED_SCHEMA.append(pa.field("created_month", pa.string()))
+_DATASET_READ_SCHEMA = ENRICHED_SCHEMA.append(pa.field("source_repo", pa.string())).append(
+    pa.field("created_month", pa.string())
+)
+
+
+def to_arrow(df: pd.DataFrame, schema: pa.Schema) -> pa.Table:
+    """Converte um DataFrame para o schema tipado (colunas ausentes viram nulas)."""
+    df = df.reindex(columns=schema.names)
+    for field in schema:
+        column = df[field.name]
+        if pa.types.is_timestamp(field.type):
+            df[field.name] = pd.to_datetime(column, utc=True, errors="coerce")
+        elif pa.types.is_integer(field.type):
+            df[field.name] = pd.to_numeric(column, errors="coerce").astype("Int64")
+        elif pa.types.is_dictionary(field.type) or pa.types.is_string(field.type):
+            df[field.name] = column.astype(object).where(column.notna(), None)
+    table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+    return table.replace_schema_metadata(None)
+
+
+def from_arrow(table: pa.Table) -> pd.DataFrame:
+    """Tabela Arrow -> DataFrame com inteiros anuláveis, categóricas e timestamps reais."""
+    return table.to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get)
+
+
+def read_rows(path: Path, start: int, stop: int, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Linhas [start, stop) de um arquivo Parquet, lendo só os row groups que as contêm."""
+    parquet_file = pq.ParquetFile(path)
+    groups, offset, first = [], 0, 0
+    for group in range(parquet_file.num_row_groups):
+        rows = parquet_file.metadata.row_group(group).num_rows
+        if offset + rows > start and offset < stop:
+            first = offset if not groups else first
+            groups.append(group)
+        offset += rows
+    if not groups:
+        table = parquet_file.schema_arrow.empty_table()
+        return from_arrow(table.select(columns) if columns else table)
+    table = parquet_file.read_row_groups(groups, columns=columns)
+    return from_arrow(table.slice(start - first, stop - start))
+
+
+def read_table(path: Path, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Lê um arquivo Parquet (apenas as colunas pedidas)."""
+    return from_arrow(pq.read_table(path, columns=columns))
+
+
+def iter_table(path: Path, batch_size: int, columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+    """Lê um arquivo Parquet em blocos de até `batch_size` linhas."""
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        yield from_arrow(pa.Table.from_batches([batch]))
+
+
+class EnrichedStore:
+    """
+    Dataset Parquet das issues enriquecidas, particionado por `source_repo` e
+    mês de criação (`created_month`). Leitores pedem só as colunas e as
+    partições necessárias. Cada partição de mês tem um único arquivo, trocado
+    com os.replace ao ser regravado, então leitores nunca veem uma partição
+    pela metade nem ausente.
+    """
+
+    def __init__(self, root: Path = ENRICHED_DATASET_DIR, legacy_dir: Path = None):
+        self.root = Path(root)
+        # enriched_<repo>.csv antigos ficam no diretório pai do dataset
+        self.legacy_dir = Path(legacy_dir) if legacy_dir is not None else self.root.parent
+
+    def _source_dir(self, source) -> Path:
+        return self.root / f"source_repo={source}"
+
+    def sources(self) -> List[str]:
+        if not self.root.exists():
+            return []
+        return sorted(p.name.split("=", 1)[1] for p in self.root.glob("source_repo=*") if p.is_dir())
+
+    def iter_source(self, source, batch_size: int, columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+        """Linhas atuais de um repositório, em blocos."""
+        directory = self._source_dir(source)
+        if not directory.exists():
+            return
+        dataset = ds.dataset(directory, schema=_SOURCE_READ_SCHEMA, format="parquet", partitioning=PARTITIONING)
+        for batch in dataset.to_batches(columns=columns or ENRICHED_SCHEMA.names, batch_size=batch_size):
+            if batch.num_rows:
+                yield from_arrow(pa.Table.from_batches([batch]))
+
+    def _stage(self, source, frames: Iterable[pd.DataFrame]):
+        """
+        Grava os blocos num diretório temporário particionado por mês.
+        Devolve (diretório, linhas, ids gravados).
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_dir = self.root / f".tmp-{source}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        rows, ids = 0, []
+
+        def batches():
+            nonlocal rows
+            for frame in frames:
+                if frame.empty:
+                    continue
+                table = to_arrow(frame, ENRICHED_SCHEMA)
+                created = pc.strftime(table["created_at"], format="%Y-%m")
+                months = pc.fill_null(created, "unknown")
+                rows += table.num_rows
+                ids.append(table["id"])
+                yield from table.append_column("created_month", months).to_batches()
+
+        schema = ENRICHED_SCHEMA.append(pa.field("created_month", pa.string()))
+        ds.write_dataset(
+            batches(), tmp_dir, schema=schema, format="parquet", partitioning=PARTITIONING,
+            basename_template="part-{i}.parquet", existing_data_behavior="overwrite_or_ignore",
+        )
+        ids = pa.chunked_array(ids, type=pa.int64()).combine_chunks() if ids else pa.array([], pa.int64())
+        return tmp_dir, rows, ids
+
+    @staticmethod
+    def _read_partition(files: List[Path]) -> pa.Table:
+        """Arquivos de uma partição de mês, no schema do dataset (sem a coluna da partição)."""
+        return ds.dataset([str(f) for f in files], schema=ENRICHED_SCHEMA, format="parquet").to_table()
+
+    @staticmethod
+    def _swap_partition(table: pa.Table, partition: Path):
+        """
+        Troca o conteúdo de uma partição de mês por `table`: o arquivo novo é
+        gravado ao lado e entra com os.replace, então leitores veem a versão
+        anterior ou a nova, nunca a partição ausente.
+        """
+        partition.mkdir(parents=True, exist_ok=True)
+        target = partition / "part-0.parquet"
+        tmp_path = partition / "part-0.parquet.tmp"
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, target)
+        for stale in partition.glob("*.parquet"):
+            if stale != target:
+                stale.unlink()
+
+    def write_source(self, source, frames: Iterable[pd.DataFrame]) -> int:
+        """Regrava todas as linhas de um repositório a partir de blocos de DataFrame."""
+        tmp_dir, rows, _ = self._stage(source, frames)
+        target = self._source_dir(source)
+        months = set()
+        for staged in sorted(tmp_dir.glob("created_month=*")) if tmp_dir.exists() else []:
+            months.add(staged.name)
+            self._swap_partition(self._read_partition(sorted(staged.glob("*.parquet"))), target / staged.name)
+        # Meses que sumiram da versão nova só são apagados depois da troca dos demais
+        for partition in target.glob("created_month=*") if target.exists() else []:
+            if partition.name not in months:
+                shutil.rmtree(partition, ignore_errors=True)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return rows
+
+    def upsert_source(self, source, frames: Iterable[pd.DataFrame]) -> UpsertStats:
+        """
+        Upsert por `id`: as linhas dos blocos substituem as de mesmo id e o
+        resto do repositório é mantido. Só as partições de mês que recebem
+        linhas novas são regravadas, uma a uma (o mês de criação de uma issue
+        não muda, então a versão anterior está na mesma partição).
+        """
+        tmp_dir, rows, ids = self._stage(source, frames)
+        target = self._source_dir(source)
+        kept = partitions = 0
+        for staged in sorted(tmp_dir.glob("created_month=*")) if tmp_dir.exists() else []:
+            fresh = self._read_partition(sorted(staged.glob("*.parquet")))
+            previous = sorted((target / staged.name).glob("*.parquet"))
+            if previous:
+                old = self._read_partition(previous)
+                old = old.filter(pc.invert(pc.is_in(old["id"], value_set=ids)))
+                kept += old.num_rows
+                fresh = pa.concat_tables([fresh, old])
+            self._swap_partition(fresh, target / staged.name)
+            partitions += 1
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return UpsertStats(rows, kept, partitions)
+
+    def import_legacy_csv(self):
+        """Importa os enriched_<repo>.csv antigos (sem POCs) de repositórios ainda fora do dataset."""
+        existing = set(self.sources())
+        for csv_file in sorted(self.legacy_dir.glob("enriched_*.csv")):
+            source = csv_file.stem[len("enriched_"):]
+            if "_poc" in csv_file.name or source in existing:
+                continue
+            rows = self.write_source(source, pd.read_csv(csv_file, chunksize=50_000))
+            existing.add(source)
+            logger.info(f"{csv_file.name} importado para o dataset Parquet ({rows} issues).")
+
+    def load(self, columns: Optional[List[str]] = None, repos: Optional[List[str]] = None,
+             months: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Carrega o dataset com poda de colunas e partições: `repos` e `months`
+        (YYYY-MM) filtram diretórios inteiros antes de qualquer leitura.
+        """
+        self.import_legacy_csv()
+        if not self.sources():
+            return pd.DataFrame(columns=columns)
+        if repos is None and months is None:
+            dataset = ds.dataset(self.root, schema=_DATASET_READ_SCHEMA, format="parquet",
+                                 partitioning=DATASET_PARTITIONING)
+        else:
+            # Só os diretórios pedidos são listados; o resto do dataset nem é descoberto
+            files = [str(f) for f in self._partition_files(repos, months)]
+            if not files:
+                return pd.DataFrame(columns=columns)
+            dataset = ds.dataset(files, schema=_DATASET_READ_SCHEMA, format="parquet",
+                                 partitioning=DATASET_PARTITIONING, partition_base_dir=str(self.root))
+        table = dataset.to_table(columns=columns)
+        # Colunas de partição como categorias, como as demais colunas de baixa cardinalidade
+        for name in ("source_repo", "created_month"):
+            if name in table.column_names:
+                index = table.column_names.index(name)
+                table = table.set_column(index, name, pc.dictionary_encode(table[name]))
+        return from_arrow(table)
+
+    def _partition_files(self, repos, months) -> List[Path]:
+        sources = self.sources() if repos is None else list(repos)
+        files = []
+        for source in sources:
+            directory = self._source_dir(source)
+            if months is None:
+                files.extend(sorted(directory.glob("created_month=*/*.parquet")))
+                continue
+            for month in months:
+                files.extend(sorted((directory / f"created_month={month}").glob("*.parquet")))
+        return files
+
+
+def load_enriched(columns: Optional[List[str]] = None, repos: Optional[List[str]] = None,
+                  months: Optional[List[str]] = None, root: Path = ENRICHED_DATASET_DIR) -> pd.DataFrame:
+    """Atalho para EnrichedStore(root).load(...)."""
+    return EnrichedStore(root).load(columns=columns, repos=repos, months=months)
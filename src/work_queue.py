@@ -0,0 +1,319 @@
+"""
+Fila de trabalho durável em SQLite, no diretório de dados compartilhado,
+para distribuir alvos da ingestão e blocos do enriquecimento entre vários
+workers (no mesmo host ou em máquinas que montam o mesmo volume).
+
+Cada unidade (tipo, chave) existe uma única vez na fila. Um worker a
+arrenda por `lease_seconds` e renova o arrendamento com heartbeats enquanto
+trabalha; se o worker morrer, o arrendamento vence e a unidade volta a ser
+entregue (até `max_attempts` tentativas). Renovações e conclusões só valem
+com o token do arrendamento vigente, então um worker que perdeu a unidade
+não a conclui por cima de outro.
+
+- Unidades com o mesmo `grp` nunca ficam arrendadas ao mesmo tempo (ex.:
+  finalizações que regravam o mesmo repositório no dataset).
+- Unidades com o mesmo `batch` formam um lote: `complete(..., then=...)`
+  enfileira a unidade seguinte, na mesma transação, quando a última unidade
+  do lote termina.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from collections import namedtuple
+from contextlib import contextmanager
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+QUEUE_PATH = BASE_DIR / "data" / "state" / "work_queue.sqlite"
+
+STATES = ("pending", "leased", "done", "failed")
+
+# Unidade arrendada: `token` identifica este arrendamento em heartbeat/complete/fail
+Lease = namedtuple("Lease", ["kind", "key", "payload", "token", "attempts"])
+
+
+class LeaseLost(Exception):
+    """O arrendamento venceu e a unidade foi (ou pode ser) entregue a outro worker."""
+
+
+class WorkQueue:
+    def __init__(self, path: Path = QUEUE_PATH, lease_seconds=300, max_attempts=5, retry_delay=30,
+                 journal_mode="WAL"):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # Espera antes de uma nova tentativa, multiplicada pelo número de tentativas
+        self.retry_delay = retry_delay
+        # A thread de heartbeat usa a mesma conexão
+        self._lock = threading.Lock()
+        # Transações explícitas (BEGIN IMMEDIATE): escolher e arrendar é atômico entre processos
+        self._conn = sqlite3.connect(self.path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS units (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                grp TEXT,
+                batch TEXT,
+                state TEXT NOT NULL DEFAULT 'pending',
+                rerun INTEGER NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                owner TEXT,
+                token TEXT,
+                lease_expires REAL,
+                available_at REAL NOT NULL DEFAULT 0,
+                enqueued_at REAL NOT NULL,
+                finished_at REAL,
+                result TEXT,
+                error TEXT,
+                PRIMARY KEY (kind, key)
+            );
+            CREATE INDEX IF NOT EXISTS idx_units_state ON units(state, available_at);
+            CREATE INDEX IF NOT EXISTS idx_units_grp ON units(grp, state);
+            CREATE INDEX IF NOT EXISTS idx_units_batch ON units(batch, state);
+            """
+        )
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _enqueue(self, conn, kind, key, payload, group, batch, rerun, now):
+        row = conn.execute("SELECT state FROM units WHERE kind = ? AND key = ?", (kind, key)).fetchone()
+        payload = json.dumps(payload or {})
+        if row is None:
+            conn.execute(
+                "INSERT INTO units (kind, key, payload, grp, batch, enqueued_at, available_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (kind, key, payload, group, batch, now, now),
+            )
+            return True
+        if not rerun:
+            return False
+        if row[0] == "leased":
+            # Em andamento com a versão anterior: volta para a fila quando concluir
+            conn.execute("UPDATE units SET rerun = 1, payload = ?, batch = ? WHERE kind = ? AND key = ?",
+                         (payload, batch, kind, key))
+        else:
+            conn.execute(
+                "UPDATE units SET state = 'pending', payload = ?, grp = ?, batch = ?, attempts = 0, "
+                "available_at = ?, enqueued_at = ?, finished_at = NULL, result = NULL, error = NULL "
+                "WHERE kind = ? AND key = ?",
+                (payload, group, batch, now, now, kind, key),
+            )
+        return True
+
+    def enqueue(self, kind, key, payload=None, group=None, batch=None, rerun=False) -> bool:
+        """
+        Enfileira uma unidade. Se ela já existe, nada muda, a não ser com
+        `rerun=True`: concluída ou com falha, volta a pendente; arrendada,
+        volta à fila quando o worker atual concluir. Devolve se a unidade
+        ficou (ou continua) para ser executada.
+        """
+        return self.enqueue_many([(kind, key, payload, group, batch)], rerun=rerun) == 1
+
+    def enqueue_many(self, units, rerun=False) -> int:
+        """Enfileira (tipo, chave, payload, grupo, lote) numa única transação; devolve quantas entraram."""
+        now = time.time()
+        with self._transaction() as conn:
+            return sum(self._enqueue(conn, *unit, rerun, now) for unit in units)
+
+    def _requeue_expired(self, conn, now):
+        """Arrendamentos vencidos (worker morto ou travado) voltam para a fila, ou falham de vez."""
+        expired = conn.execute(
+            "SELECT kind, key, owner FROM units WHERE state = 'leased' AND lease_expires < ?", (now,)
+        ).fetchall()
+        for kind, key, owner in expired:
+            logger.warning(f"Arrendamento de {kind}:{key} por {owner} venceu; unidade devolvida à fila.")
+        conn.execute(
+            "UPDATE units SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "owner = NULL, token = NULL, lease_expires = NULL, available_at = ?, "
+            "error = 'arrendamento vencido' WHERE state = 'leased' AND lease_expires < ?",
+            (self.max_attempts, now, now),
+        )
+        return len(expired)
+
+    def lease(self, owner: str, kinds=None):
+        """
+        Arrenda a próxima unidade pendente (dos tipos em `kinds`, se
+        informados), na ordem de chegada, ou devolve None se não há nenhuma.
+        """
+        now = time.time()
+        kind_filter, params = "", [now]
+        if kinds:
+            kind_filter = f"AND kind IN ({','.join('?' * len(kinds))})"
+            params += list(kinds)
+        with self._transaction() as conn:
+            self._requeue_expired(conn, now)
+            row = conn.execute(
+                f"""
+                SELECT kind, key, payload, attempts FROM units AS u
+                WHERE state = 'pending' AND available_at <= ? {kind_filter}
+                  AND (grp IS NULL OR NOT EXISTS (
+                      SELECT 1 FROM units AS o WHERE o.grp = u.grp AND o.state = 'leased'))
+                ORDER BY enqueued_at, key LIMIT 1
+                """,
+                params,
+            ).fetchone()
+            if row is None:
+                return None
+            kind, key, payload, attempts = row
+            token = uuid.uuid4().hex
+            conn.execute(
+                "UPDATE units SET state = 'leased', owner = ?, token = ?, lease_expires = ?, "
+                "attempts = attempts + 1, rerun = 0 WHERE kind = ? AND key = ?",
+                (owner, token, now + self.lease_seconds, kind, key),
+            )
+        return Lease(kind, key, json.loads(payload), token, attempts + 1)
+
+    def heartbeat(self, lease: Lease):
+        """Renova o arrendamento; LeaseLost se ele já venceu e foi devolvido."""
+        with self._transaction() as conn:
+            renewed = conn.execute(
+                "UPDATE units SET lease_expires = ? WHERE kind = ? AND key = ? AND token = ? AND state = 'leased'",
+                (time.time() + self.lease_seconds, lease.kind, lease.key, lease.token),
+            ).rowcount
+        if not renewed:
+            raise LeaseLost(f"{lease.kind}:{lease.key}")
+
+    def complete(self, lease: Lease, result=None, then=None):
+        """
+        Conclui a unidade. `then` = (tipo, chave, payload, grupo): unidade
+        enfileirada quando não resta nenhuma unidade pendente, arrendada ou
+        com falha no lote (`batch`) desta. LeaseLost se o arrendamento venceu.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            done = conn.execute(
+                "UPDATE units SET state = CASE WHEN rerun THEN 'pending' ELSE 'done' END, "
+                "attempts = CASE WHEN rerun THEN 0 ELSE attempts END, rerun = 0, owner = NULL, "
+                "token = NULL, lease_expires = NULL, available_at = ?, finished_at = ?, result = ?, error = NULL "
+                "WHERE kind = ? AND key = ? AND token = ?",
+                (now, now, json.dumps(result), lease.kind, lease.key, lease.token),
+            ).rowcount
+            if not done:
+                raise LeaseLost(f"{lease.kind}:{lease.key}")
+            if then is not None:
+                batch = conn.execute("SELECT batch FROM units WHERE kind = ? AND key = ?",
+                                     (lease.kind, lease.key)).fetchone()[0]
+                remaining = conn.execute(
+                    "SELECT COUNT(*) FROM units WHERE batch = ? AND state != 'done'", (batch,)
+                ).fetchone()[0] if batch is not None else 0
+                if not remaining:
+                    self._enqueue(conn, *then, None, True, now)
+
+    def fail(self, lease: Lease, error: str):
+        """Devolve a unidade para nova tentativa (com espera crescente) ou a marca como falha."""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE units SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "available_at = ? + ? * attempts, owner = NULL, token = NULL, lease_expires = NULL, "
+                "finished_at = ?, error = ? WHERE kind = ? AND key = ? AND token = ?",
+                (self.max_attempts, now, self.retry_delay, now, error, lease.kind, lease.key, lease.token),
+            )
+
+    def release(self, lease: Lease):
+        """Devolve a unidade sem contar a tentativa (ex.: worker encerrado no meio)."""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE units SET state = 'pending', attempts = attempts - 1, owner = NULL, token = NULL, "
+                "lease_expires = NULL WHERE kind = ? AND key = ? AND token = ?",
+                (lease.kind, lease.key, lease.token),
+            )
+
+    def retry_failed(self, kinds=None) -> int:
+        """Unidades com falha voltam a pendentes, com as tentativas zeradas."""
+        kind_filter = f"AND kind IN ({','.join('?' * len(kinds))})" if kinds else ""
+        with self._transaction() as conn:
+            return conn.execute(
+                f"UPDATE units SET state = 'pending', attempts = 0, available_at = ?, error = NULL "
+                f"WHERE state = 'failed' {kind_filter}",
+                [time.time()] + list(kinds or []),
+            ).rowcount
+
+    def stats(self):
+        """{tipo: {estado: unidades}}, com os arrendamentos vencidos contados como pendentes."""
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT kind, CASE WHEN state = 'leased' AND lease_expires < ? THEN 'pending' ELSE state END, "
+                "COUNT(*) FROM units GROUP BY 1, 2",
+                (now,),
+            ).fetchall()
+        stats = {}
+        for kind, state, count in rows:
+            stats.setdefault(kind, dict.fromkeys(STATES, 0))[state] += count
+        return stats
+
+    def failures(self, limit=20):
+        """Últimas unidades com falha: (tipo, chave, tentativas, erro)."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT kind, key, attempts, error FROM units WHERE state = 'failed' "
+                "ORDER BY finished_at DESC LIMIT ?", (limit,),
+            ).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class Heartbeat:
+    """
+    Renova um arrendamento numa thread enquanto a unidade é processada.
+    Se a renovação falhar, `lost` fica verdadeiro; `check()` deve ser
+    chamado antes de publicar resultados (ex.: regravar o dataset).
+    """
+
+    def __init__(self, queue: WorkQueue, lease: Lease, interval=None):
+        self.queue = queue
+        self.lease = lease
+        self.interval = interval or max(1.0, queue.lease_seconds / 3)
+        self._stop = threading.Event()
+        self._lost = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"heartbeat-{lease.key}", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.queue.heartbeat(self.lease)
+            except LeaseLost:
+                logger.error(f"Arrendamento de {self.lease.kind}:{self.lease.key} perdido.")
+                self._lost.set()
+                return
+            except sqlite3.Error as e:
+                # Fila momentaneamente indisponível: tenta de novo no próximo intervalo
+                logger.warning(f"Heartbeat de {self.lease.kind}:{self.lease.key} falhou: {e}")
+
+    @property
+    def lost(self) -> bool:
+        return self._lost.is_set()
+
+    def check(self):
+        if self.lost:
+            raise LeaseLost(f"{self.lease.kind}:{self.lease.key}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
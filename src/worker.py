@@ -0,0 +1,245 @@
+"""
+Worker da fila de trabalho (src/work_queue.py). Vários workers, no mesmo
+host ou em máquinas que montam o mesmo diretório de dados, dividem a
+ingestão e o enriquecimento: para escalar, basta iniciar mais workers.
+
+Tipos de unidade:
+- ingest: um alvo de github.targets. Quando todos os alvos da rodada
+  terminam, entra a unidade `process` da rodada.
+- process: normaliza os segmentos brutos novos (ProcessingEngine.run_batch)
+  e enfileira os blocos dos Parquets processados ainda não enfileirados.
+- enrich.chunk: `enrichment.chunk_size` linhas de um Parquet processado.
+  Quando todos os blocos do arquivo terminam, entra o `enrich.finalize` dele.
+- enrich.finalize: grava o arquivo no dataset e nos agregados (no máximo um
+  por repositório ao mesmo tempo).
+
+Uso:
+    python -m src.worker --enqueue ingest   # nova rodada com todos os alvos
+    python -m src.worker --enqueue enrich   # blocos dos Parquets em data/processed
+    python -m src.worker                    # trabalha até a fila esvaziar
+    python -m src.worker --follow           # continua esperando novas unidades
+    python -m src.worker --status
+"""
+import argparse
+import logging
+import os
+import socket
+import time
+from datetime import datetime
+from pathlib import Path
+
+from src import metrics
+from src.config import load_settings
+from src.work_queue import Heartbeat, LeaseLost, WorkQueue
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+PROCESSED_DIR = BASE_DIR / "data" / "processed"
+
+logger = logging.getLogger(__name__)
+
+
+def open_queue(settings=None) -> WorkQueue:
+    """Fila no caminho e com os prazos da seção `queue` do settings.yaml."""
+    settings = settings if settings is not None else load_settings()
+    cfg = settings.get('queue', {})
+    return WorkQueue(
+        BASE_DIR / cfg.get('path', "data/state/work_queue.sqlite"),
+        lease_seconds=cfg.get('lease_seconds', 300),
+        max_attempts=cfg.get('max_attempts', 5),
+        retry_delay=cfg.get('retry_delay_seconds', 30),
+        journal_mode=cfg.get('sqlite_journal_mode', 'WAL'),
+    )
+
+
+def enqueue_ingest(queue: WorkQueue, settings=None) -> int:
+    """
+    Nova rodada de ingestão: um `ingest` por alvo (alvos já concluídos voltam
+    para a fila; os em andamento rodam de novo ao terminar).
+    """
+    from src.ingestion import target_name
+
+    settings = settings if settings is not None else load_settings()
+    round_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+    targets = settings.get('github', {}).get('targets', [])
+    units = [
+        ("ingest", target_name(query), {"query": query, "round": round_id}, None, f"ingest:{round_id}")
+        for query in targets
+    ]
+    return queue.enqueue_many(units, rerun=True)
+
+
+def enqueue_enrich(queue: WorkQueue, settings=None, processed_dir: Path = PROCESSED_DIR) -> int:
+    """
+    Blocos de `enrichment.chunk_size` linhas de cada Parquet processado ainda
+    não enfileirado; os blocos de um arquivo formam um lote.
+    """
+    import pyarrow.parquet as pq
+
+    settings = settings if settings is not None else load_settings()
+    chunk_size = settings.get('enrichment', {}).get('chunk_size', 500)
+    units = []
+    for path in sorted(processed_dir.glob("processed_*.parquet")):
+        rows = pq.ParquetFile(path).metadata.num_rows
+        units += [
+            ("enrich.chunk", f"{path.name}#{start:09d}",
+             {"file": path.name, "start": start, "stop": min(start + chunk_size, rows)}, None, path.name)
+            for start in range(0, rows, chunk_size)
+        ]
+    return queue.enqueue_many(units)
+
+
+class Worker:
+    def __init__(self, config=None, worker_id=None, kinds=None, queue: WorkQueue = None):
+        self.settings = config if config is not None else load_settings()
+        self.queue = queue or open_queue(self.settings)
+        self.id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.kinds = kinds
+        self.completed = 0
+        # Motores criados na primeira unidade de cada tipo e reaproveitados
+        self._engines = {}
+
+    def _engine(self, name):
+        if name not in self._engines:
+            if name == "ingest":
+                from src.ingestion import IngestionEngine
+                self._engines[name] = IngestionEngine(config=self.settings)
+            elif name == "process":
+                from src.processing import ProcessingEngine
+                self._engines[name] = ProcessingEngine(config=self.settings)
+            else:
+                from src.enrichment import EnrichmentEngine
+                self._engines[name] = EnrichmentEngine(config=self.settings)
+        return self._engines[name]
+
+    # --- UNIDADES: devolvem (resultado, unidade seguinte do lote ou None) ---
+
+    def _ingest(self, lease, heartbeat):
+        stats = self._engine("ingest").ingest_target(lease.payload["query"])
+        round_id = lease.payload["round"]
+        return stats, ("process", round_id, {"round": round_id}, "process")
+
+    def _process(self, lease, heartbeat):
+        results = self._engine("process").run_batch()
+        chunks = enqueue_enrich(self.queue, self.settings, self._engine("process").processed_dir)
+        logger.info(f"{len(results)} alvos processados; {chunks} blocos enfileirados para o enriquecimento.")
+        return {"files": len(results), "rows": sum(r["rows"] for r in results), "chunks": chunks}, None
+
+    def _enrich_chunk(self, lease, heartbeat):
+        engine = self._engine("enrich")
+        path = engine.processed_dir / lease.payload["file"]
+        classified = engine.enrich_chunk(path, lease.payload["start"], lease.payload["stop"])
+        return {"classified": classified}, ("enrich.finalize", path.name, {"file": path.name},
+                                            engine._source_name(path))
+
+    def _enrich_finalize(self, lease, heartbeat):
+        engine = self._engine("enrich")
+        # Só regrava o dataset se a unidade ainda é nossa
+        heartbeat.check()
+        engine.finalize_file(engine.processed_dir / lease.payload["file"])
+        return None, None
+
+    HANDLERS = {
+        "ingest": _ingest,
+        "process": _process,
+        "enrich.chunk": _enrich_chunk,
+        "enrich.finalize": _enrich_finalize,
+    }
+
+    def run_unit(self, lease):
+        """Executa uma unidade arrendada, com heartbeat, e a conclui ou devolve com o erro."""
+        label = f"{lease.kind}:{lease.key}"
+        start = time.perf_counter()
+        try:
+            with metrics.span("worker.unit", kind=lease.kind), Heartbeat(self.queue, lease) as heartbeat:
+                result, then = self.HANDLERS[lease.kind](self, lease, heartbeat)
+                heartbeat.check()
+                self.queue.complete(lease, result, then)
+        except LeaseLost:
+            logger.warning(f"[{label}] arrendamento perdido; a unidade ficou com outro worker.")
+            metrics.inc("queue_units_total", kind=lease.kind, outcome="lost")
+            return False
+        except (KeyboardInterrupt, SystemExit):
+            self.queue.release(lease)
+            raise
+        except Exception as e:
+            logger.error(f"[{label}] falhou (tentativa {lease.attempts}): {e}")
+            self.queue.fail(lease, f"{type(e).__name__}: {e}")
+            metrics.inc("queue_units_total", kind=lease.kind, outcome="failed")
+            return False
+        self.completed += 1
+        metrics.inc("queue_units_total", kind=lease.kind, outcome="done")
+        logger.info(f"[{label}] concluída em {time.perf_counter() - start:.2f}s.")
+        return True
+
+    def run(self, follow=False, poll_seconds=5.0, max_units=None):
+        """
+        Arrenda e executa unidades até não restar nenhuma pendente nem em
+        andamento (unidades em andamento podem gerar novas), ou para sempre
+        com `follow`. Devolve quantas unidades este worker concluiu.
+        """
+        kinds = self.kinds or list(self.HANDLERS)
+        logger.info(f"Worker {self.id} iniciado (tipos: {', '.join(kinds)}).")
+        while max_units is None or self.completed < max_units:
+            lease = self.queue.lease(self.id, kinds)
+            if lease is None:
+                stats = self.queue.stats()
+                active = sum(s["pending"] + s["leased"] for s in stats.values())
+                if not follow and not active:
+                    break
+                time.sleep(poll_seconds)
+                continue
+            self.run_unit(lease)
+        logger.info(f"Worker {self.id} encerrado: {self.completed} unidades concluídas.")
+        return self.completed
+
+
+def print_status(queue: WorkQueue):
+    stats = queue.stats()
+    if not stats:
+        print("Fila vazia.")
+        return
+    print(f"{'tipo':<16} {'pendentes':>10} {'em curso':>9} {'concluídas':>11} {'falhas':>7}")
+    for kind, counts in sorted(stats.items()):
+        print(f"{kind:<16} {counts['pending']:>10} {counts['leased']:>9} {counts['done']:>11} {counts['failed']:>7}")
+    for kind, key, attempts, error in queue.failures():
+        print(f"  falha: {kind}:{key} ({attempts} tentativas): {error}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Worker da fila de trabalho compartilhada (ingestão e enriquecimento)")
+    parser.add_argument("--enqueue", choices=["ingest", "enrich"],
+                        help="Só enfileira: nova rodada com todos os alvos, ou os blocos dos Parquets processados")
+    parser.add_argument("--status", action="store_true", help="Mostra as unidades da fila por tipo e estado")
+    parser.add_argument("--retry-failed", action="store_true", help="Devolve à fila as unidades com falha")
+    parser.add_argument("--kinds", nargs="+", choices=list(Worker.HANDLERS),
+                        help="Tipos de unidade que este worker aceita (padrão: todos)")
+    parser.add_argument("--follow", action="store_true", help="Com a fila vazia, continua esperando novas unidades")
+    parser.add_argument("--poll-seconds", type=float, default=5.0)
+    parser.add_argument("--max-units", type=int, help="Encerra depois de concluir N unidades")
+    parser.add_argument("--id", help="Identificador do worker (padrão: host:pid)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    settings = load_settings()
+    queue = open_queue(settings)
+    if args.status:
+        print_status(queue)
+        return
+    if args.retry_failed:
+        logger.info(f"{queue.retry_failed(args.kinds)} unidades com falha devolvidas à fila.")
+        return
+    if args.enqueue == "ingest":
+        logger.info(f"{enqueue_ingest(queue, settings)} alvos enfileirados.")
+        return
+    if args.enqueue == "enrich":
+        logger.info(f"{enqueue_enrich(queue, settings)} blocos enfileirados.")
+        return
+
+    with metrics.run("worker", settings):
+        Worker(settings, worker_id=args.id, kinds=args.kinds, queue=queue).run(
+            follow=args.follow, poll_seconds=args.poll_seconds, max_units=args.max_units
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Fixtures compartilhadas: servidores locais da GitHub Search API e da OpenAI
+(benchmarks/fake_github.py e benchmarks/fake_openai.py) e um settings.yaml
+com todos os caminhos de estado dentro do diretório temporário do teste.
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+BENCH_DIR = BASE_DIR / "benchmarks"
+sys.path.insert(0, str(BASE_DIR))
+# fake_github importa o gerador de corpus como módulo de topo
+sys.path.insert(0, str(BENCH_DIR))
+
+from fake_github import FakeGitHubServer  # noqa: E402
+from fake_openai import FakeOpenAIServer  # noqa: E402
+
+TEST_REPO = "octo/demo"
+
+
+@pytest.fixture
+def github_server():
+    """Search API local com 250 issues de um repositório."""
+    with FakeGitHubServer(repos=[TEST_REPO], issues_per_repo=250) as server:
+        yield server
+
+
+@pytest.fixture
+def openai_server(monkeypatch):
+    """Chat completions locais; o cliente OpenAI do módulo é recriado apontando para ele."""
+    import src.enrichment as enrichment
+
+    with FakeOpenAIServer() as server:
+        monkeypatch.setenv("OPENAI_BASE_URL", server.url)
+        monkeypatch.setenv("OPENAI_API_KEY", "fake")
+        monkeypatch.setattr(enrichment, "_client", None)
+        yield server
+
+
+@pytest.fixture
+def settings(tmp_path):
+    """Configuração mínima com caches, agregados, índice e fila em `tmp_path`."""
+    return {
+        "github": {"targets": [f"repo:{TEST_REPO} is:issue"]},
+        "parameters": {"days_back": 400, "max_results": None, "max_retries": 0, "incremental": True,
+                       "max_workers": 2, "shard_workers": 2},
+        "enrichment": {
+            "mode": "single", "chunk_size": 50, "max_concurrency": 4, "max_retries": 0,
+            "cache": {"enabled": False, "path": str(tmp_path / "cache.sqlite")},
+            "local_model": {"enabled": False},
+            "dedup": {"enabled": False, "path": str(tmp_path / "minhash")},
+        },
+        "analysis": {"aggregates_path": str(tmp_path / "aggregates.sqlite")},
+        "queue": {"path": str(tmp_path / "queue.sqlite"), "sqlite_journal_mode": "WAL"},
+    }
@@ -0,0 +1,76 @@
+import pandas as pd
+import pytest
+
+from src.aggregates import HealthAggregates
+
+
+def rows(*records):
+    return pd.DataFrame(records, columns=["id", "source_repo", "sentiment", "category", "urgency", "labels"])
+
+
+INITIAL = rows(
+    (1, "octo_demo", "negative", "bug", "high", "bug, ui"),
+    (2, "octo_demo", "neutral", "question", "low", "question"),
+    (3, "octo_demo", "positive", "feature_request", "medium", "ui"),
+    (4, "octo_other", "negative", "bug", "medium", "bug"),
+)
+# Issue 1 reclassificada e sem o label "ui"; issue 4 muda de label
+RECLASSIFIED = rows(
+    (1, "octo_demo", "positive", "question", "low", "question"),
+    (4, "octo_other", "negative", "bug", "medium", "bug, crash"),
+)
+
+
+@pytest.fixture
+def aggregates(tmp_path):
+    store = HealthAggregates(tmp_path / "aggregates.sqlite")
+    yield store
+    store.close()
+
+
+def final_state():
+    return pd.concat([INITIAL, RECLASSIFIED]).drop_duplicates("id", keep="last").sort_values("id")
+
+
+def test_reclassification_retracts_previous_contribution(aggregates, tmp_path):
+    assert aggregates.apply(INITIAL) == 0
+    assert aggregates.apply(RECLASSIFIED) == 2
+
+    fresh = HealthAggregates(tmp_path / "fresh.sqlite")
+    fresh.apply(final_state())
+    pd.testing.assert_frame_equal(aggregates.summary(), fresh.summary())
+    pd.testing.assert_frame_equal(aggregates.label_summary(), fresh.label_summary())
+    fresh.close()
+
+
+def test_summary_counts_after_retraction(aggregates):
+    aggregates.apply(INITIAL)
+    aggregates.apply(RECLASSIFIED)
+
+    demo = aggregates.summary().set_index("source_repo").loc["octo_demo"]
+    assert demo["Total_Issues"] == 3
+    assert demo["Sentiment_positive"] == 2 and demo["Sentiment_negative"] == 0
+    # Pain Index: (1*1) + (0*1) + (1*2) -> média 1
+    assert demo["Pain_Index_Mean"] == pytest.approx(1.0)
+
+    labels = aggregates.label_summary().set_index(["source_repo", "label"])["Total_Issues"]
+    assert labels[("octo_demo", "ui")] == 1
+    assert labels[("octo_demo", "question")] == 2
+    assert ("octo_demo", "bug") not in labels.index
+    assert labels[("octo_other", "crash")] == 1
+
+
+def test_reapplying_same_rows_is_idempotent(aggregates):
+    aggregates.apply(INITIAL)
+    before = aggregates.summary()
+    assert aggregates.apply(INITIAL) == len(INITIAL)
+    pd.testing.assert_frame_equal(aggregates.summary(), before)
+
+
+def test_rebuild_replaces_incremental_state(aggregates):
+    aggregates.apply(INITIAL)
+    assert not aggregates.initialized
+    aggregates.rebuild([final_state()])
+
+    assert aggregates.initialized
+    assert aggregates.summary()["Total_Issues"].sum() == 4
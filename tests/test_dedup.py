@@ -0,0 +1,66 @@
+from itertools import product
+
+from src.dedup import MinHashIndex, _choose_bands, normalize_text
+
+WORDS = ["".join(letters) for letters in product("abcdefgh", repeat=3)]
+BASE = " ".join(WORDS[:60])
+
+
+def replace_every(step, offset=100):
+    """Troca uma palavra a cada `step` por outra fora do texto base."""
+    words = BASE.split()
+    for i in range(0, len(words), step):
+        words[i] = WORDS[offset + i]
+    return " ".join(words)
+
+
+def test_normalization_ignores_numbers_urls_and_hashes():
+    first = normalize_text("Crash in v1.2", "See https://ci.example/run/123 at commit 3f9a2b1c <!-- template -->")
+    second = normalize_text("Crash in v1.9", "See https://ci.example/run/456 at commit 0d1e2f3a")
+    assert first == second == "crash in v see at commit"
+
+
+def test_bands_keep_the_s_curve_below_the_threshold():
+    for threshold in (0.5, 0.8, 0.9):
+        bands, rows = _choose_bands(128, threshold)
+        assert bands * rows == 128
+        assert (1 / bands) ** (1 / rows) <= threshold - 0.05
+
+
+def test_similarity_above_threshold_joins_the_first_issue():
+    index = MinHashIndex(threshold=0.8)
+    one_word = " ".join(["zzz"] + BASE.split()[1:])
+    assignments = index.add([1, 2, 3], ["Title"] * 3, [BASE, one_word, replace_every(3)])
+
+    assert assignments[2] == assignments[1] == (1, assignments[1].group)
+    assert assignments[3].representative == 3
+    assert assignments[3].group != assignments[1].group
+
+
+def test_higher_threshold_splits_the_same_pair():
+    bodies = [BASE, replace_every(10)]
+    assert MinHashIndex(threshold=0.5).add([1, 2], ["Title"] * 2, bodies)[2].representative == 1
+    assert MinHashIndex(threshold=0.95).add([1, 2], ["Title"] * 2, bodies)[2].representative == 2
+
+
+def test_edited_issue_leaves_its_old_group():
+    index = MinHashIndex()
+    index.add([1, 2], ["Title"] * 2, [BASE, BASE])
+    edited = index.add([2], ["Other"], [replace_every(2)])
+    assert edited[2].representative == 2
+    # Conteúdo igual ao já indexado não é reprocessado
+    assert index.add([1], ["Title"], [BASE])[1].representative == 1
+    assert index.size == 3
+
+
+def test_saved_index_reloads_only_with_the_same_parameters(tmp_path):
+    index = MinHashIndex()
+    first = index.add([1, 2], ["Title"] * 2, [BASE, BASE])
+    index.labels[first[1].group] = {"sentiment": "neutral", "category": "bug", "urgency": "low"}
+    index.save(tmp_path)
+
+    loaded = MinHashIndex.load(tmp_path)
+    assert loaded.size == 2
+    assert loaded.add([3], ["Title"], [BASE])[3] == first[1]
+    assert loaded.labels == index.labels
+    assert MinHashIndex.load(tmp_path, threshold=0.9).size == 0
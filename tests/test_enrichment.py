@@ -0,0 +1,206 @@
+import json
+
+import pandas as pd
+import pytest
+
+import fake_openai
+import src.enrichment as enrichment
+from src.enrichment import EnrichmentEngine
+from src.local_model import LocalClassifier
+from src.storage import load_enriched
+
+SOURCE = "octo_demo"
+
+
+def issues(n, offset=0):
+    """Issues já normalizadas, com títulos e corpos distintos."""
+    ids = range(offset + 1, offset + n + 1)
+    return pd.DataFrame({
+        "id": list(ids),
+        "number": list(ids),
+        "title": [f"Issue {i}: dashboard fails to load" for i in ids],
+        "body": [f"Steps {i}: open the dashboard and wait." for i in ids],
+        "body_compact": [f"Steps {i}: open the dashboard and wait." for i in ids],
+        "labels": ["bug, ui" if i % 2 else "question" for i in ids],
+        "created_at": pd.date_range("2024-01-01", periods=n, freq="D", tz="UTC"),
+    })
+
+
+@pytest.fixture
+def make_engine(tmp_path, settings):
+    def make(**enrichment_cfg):
+        config = dict(settings, enrichment=dict(settings["enrichment"], **enrichment_cfg))
+        return EnrichmentEngine(processed_dir=str(tmp_path / "processed"), enriched_dir=str(tmp_path / "enriched"),
+                                batch_dir=str(tmp_path / "batch"), config=config)
+    return make
+
+
+def dataset(engine):
+    return load_enriched(columns=["id", "sentiment", "category", "urgency"], root=engine.store.root)
+
+
+def test_interrupted_run_resumes_from_journal(openai_server, make_engine, monkeypatch):
+    engine = make_engine()
+    df = issues(120)
+    classify = engine.classify_dataframe
+    calls = []
+
+    def crash_on_third_chunk(chunk):
+        calls.append(len(chunk))
+        if len(calls) == 3:
+            raise KeyboardInterrupt
+        return classify(chunk)
+
+    monkeypatch.setattr(engine, "classify_dataframe", crash_on_third_chunk)
+    with pytest.raises(KeyboardInterrupt):
+        engine.enrich_frame(SOURCE, df, "resume_test")
+    assert openai_server.request_count == 100
+    assert (engine.journal_dir / "resume_test.sqlite").exists()
+
+    # Nova execução: só o bloco que não chegou ao journal vai ao LLM
+    resumed = make_engine()
+    assert resumed.enrich_frame(SOURCE, df, "resume_test") == 0
+    assert openai_server.request_count == 120
+    assert not (resumed.journal_dir / "resume_test.sqlite").exists()
+    out = dataset(resumed)
+    assert sorted(out["id"]) == list(range(1, 121))
+
+
+def test_failed_classifications_are_not_journaled(openai_server, make_engine):
+    openai_server.error_rate = 0.5
+    engine = make_engine()
+    df = issues(60)
+    unresolved = engine.enrich_frame(SOURCE, df, "errors_test")
+
+    assert 0 < unresolved < 60
+    out = dataset(engine)
+    assert len(out) == 60 - unresolved
+    assert set(out["sentiment"]) <= enrichment.LABEL_VALUES["sentiment"]
+    # O journal fica para a retomada, só com as classificações válidas
+    assert (engine.journal_dir / "errors_test.sqlite").exists()
+
+    openai_server.error_rate = 0.0
+    before = openai_server.request_count
+    assert make_engine().enrich_frame(SOURCE, df, "errors_test") == 0
+    assert openai_server.request_count - before == unresolved
+    assert sorted(dataset(engine)["id"]) == list(range(1, 61))
+
+
+def test_cache_hits_skip_the_llm(openai_server, make_engine, tmp_path):
+    cache = {"enabled": True, "path": str(tmp_path / "cache.sqlite")}
+    df = issues(30)
+    first = make_engine(cache=cache)
+    results = first.classify_dataframe(df)
+    assert openai_server.request_count == 30
+    first.cache.close()
+
+    # Outro processo com o mesmo modelo e prompt: tudo sai do cache em disco
+    second = make_engine(cache=cache)
+    assert second.classify_dataframe(df) == results
+    assert openai_server.request_count == 30
+    assert second.cache.stats()["hits"] == 30
+    second.cache.close()
+
+    # Modelo diferente invalida as entradas
+    third = make_engine(cache=cache, model="other-model")
+    third.classify_dataframe(df)
+    assert openai_server.request_count == 60
+    assert third.cache.stats()["hits"] == 0
+
+
+def test_invalid_cache_entry_is_reclassified(openai_server, make_engine, tmp_path):
+    cache = {"enabled": True, "path": str(tmp_path / "cache.sqlite")}
+    df = issues(3)
+    engine = make_engine(cache=cache)
+    texts = [enrichment.build_text(t, b) for t, b in zip(df["title"], enrichment.prompt_bodies(df))]
+    engine.cache.put(texts[0], dict(enrichment.ERROR_RESULT))
+
+    results = engine.classify_dataframe(df)
+    assert openai_server.request_count == 3
+    assert all(enrichment.is_valid_result(result) for result in results)
+    # A entrada inválida conta como miss e é substituída pela classificação nova
+    assert engine.cache.stats()["hits"] == 0
+    assert engine.cache.get(texts[0]) == {key: results[0][key] for key in enrichment.LABEL_VALUES}
+
+
+def test_failed_classifications_are_not_cached(openai_server, make_engine, tmp_path):
+    cache = {"enabled": True, "path": str(tmp_path / "cache.sqlite")}
+    df = issues(10)
+    openai_server.error_rate = 1.0
+    results = make_engine(cache=cache).classify_dataframe(df)
+    assert not any(enrichment.is_valid_result(result) for result in results)
+
+    openai_server.error_rate = 0.0
+    before = openai_server.request_count
+    engine = make_engine(cache=cache)
+    engine.classify_dataframe(df)
+    assert openai_server.request_count - before == 10
+    assert engine.cache.stats()["hits"] == 0
+
+
+def test_packed_mode_matches_single_requests(openai_server, make_engine):
+    df = issues(30)
+    single = make_engine().classify_dataframe(df)
+    assert openai_server.request_count == 30
+
+    packed = make_engine(mode="packed", pack_size=10).classify_dataframe(df)
+    assert openai_server.request_count == 33
+    assert packed == single
+
+
+def test_packed_items_missing_from_response_are_classified_alone(openai_server, make_engine, monkeypatch):
+    complete = fake_openai.fake_completion
+
+    def drop_first_item(request):
+        payload = json.loads(complete(request))
+        if "results" in payload:
+            payload["results"] = payload["results"][1:]
+        return json.dumps(payload)
+
+    monkeypatch.setattr(fake_openai, "fake_completion", drop_first_item)
+    results = make_engine(mode="packed", pack_size=10).classify_dataframe(issues(10))
+    assert openai_server.request_count == 2
+    assert all(enrichment.is_valid_result(result) for result in results)
+
+
+def test_batch_output_keeps_only_valid_results(make_engine, tmp_path):
+    engine = make_engine()
+    texts = {f"processed_x.parquet:{i}": f"Title: Issue {i}\nBody: crash" for i in range(5)}
+    input_path = tmp_path / "input.jsonl"
+    with open(input_path, "w") as f:
+        for custom_id, text in texts.items():
+            f.write(json.dumps({"custom_id": custom_id, "method": "POST", "url": enrichment.BATCH_ENDPOINT,
+                                "body": engine._request_body(enrichment.SYSTEM_PROMPT, text)}) + "\n")
+    output_path = tmp_path / "output.jsonl"
+    fake_openai.run_batch_file(input_path, output_path)
+
+    lines = output_path.read_text().splitlines()
+    failed = {"custom_id": "processed_x.parquet:97", "response": {"status_code": 500, "body": {}}}
+    invalid = json.loads(lines[0])
+    invalid["custom_id"] = "processed_x.parquet:98"
+    invalid["response"]["body"]["choices"][0]["message"]["content"] = '{"sentiment": "angry"}'
+    truncated = json.loads(lines[0])
+    truncated["custom_id"] = "processed_x.parquet:99"
+    truncated["response"]["body"]["choices"][0]["message"]["content"] = '{"sentiment": '
+    lines += ["", json.dumps(failed), json.dumps(invalid), json.dumps(truncated)]
+
+    results = engine._parse_batch_output(lines)
+    assert results == {custom_id: fake_openai.fake_labels(text) for custom_id, text in texts.items()}
+
+
+def test_label_source_records_where_labels_came_from(openai_server, make_engine, tmp_path):
+    df = issues(4)
+    texts = ["Crash when saving large files", "Add a dark theme to settings", "Typo in the install guide"]
+    df["title"] = texts + texts[:1]
+    df["body"] = df["body_compact"] = [f"{text}, see the attached logs." for text in df["title"]]
+    engine = make_engine(dedup={"enabled": True, "path": str(tmp_path / "minhash")})
+    results = engine.classify_dataframe(df)
+    assert [result["label_source"] for result in results] == ["llm", "llm", "llm", "duplicate"]
+    assert openai_server.request_count == 3
+
+    model = LocalClassifier(n_features=2 ** 12, confidence_threshold=0.0)
+    model.fit(df["title"].tolist(), pd.DataFrame(results)).save(tmp_path / "model.npz")
+    local = make_engine(local_model={"enabled": True, "path": str(tmp_path / "model.npz"),
+                                     "confidence_threshold": 0.0})
+    assert {result["label_source"] for result in local.classify_dataframe(df)} == {"local_model"}
+    assert openai_server.request_count == 3
@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import requests
+
+from fake_github import FakeGitHubServer
+from src.ingestion import IngestionEngine
+from src.rate_limit import TokenBucket
+from tests.conftest import TEST_REPO
+
+TARGET = f"repo:{TEST_REPO} is:issue"
+
+
+@pytest.fixture
+def make_engine(tmp_path, settings):
+    def make(server):
+        engine = IngestionEngine(output_dir=str(tmp_path / "raw"), api_url=server.url,
+                                 state_path=tmp_path / "ingestion_state.json", config=settings)
+        # Servidor local sem limite: o orçamento do cliente também é liberado
+        engine.scheduler.buckets = {resource: TokenBucket(10**6, 60) for resource in engine.scheduler.buckets}
+        return engine
+    return make
+
+
+def test_pagination_follows_link_header(github_server, make_engine):
+    engine = make_engine(github_server)
+    result = engine.fetch_github_issues(f"{TARGET} created:>2000-01-01")
+
+    assert result["total_count"] == 250
+    assert result["pages"] == 3
+    assert len({item["id"] for item in result["items"]}) == 250
+
+
+def test_pagination_stops_at_max_results(github_server, make_engine):
+    engine = make_engine(github_server)
+    result = engine.fetch_github_issues(f"{TARGET} created:>2000-01-01", max_results=150)
+
+    assert len(result["items"]) == 150
+    assert result["pages"] == 2
+
+
+def test_network_errors_are_retried_with_backoff(github_server, make_engine):
+    engine = make_engine(github_server)
+    engine.max_retries = 2
+    engine.scheduler.base_delay = 0.01
+    get = engine.session.get
+    failures = [requests.ConnectionError("reset"), requests.Timeout("read timeout")]
+
+    def flaky_get(*args, **kwargs):
+        if failures:
+            raise failures.pop(0)
+        return get(*args, **kwargs)
+
+    engine.session.get = flaky_get
+    assert engine.count_issues(f"{TARGET} created:>2000-01-01") == 250
+    assert engine.scheduler.retries["search"] == 2
+
+
+def test_network_errors_propagate_after_max_retries(github_server, make_engine):
+    engine = make_engine(github_server)
+    engine.max_retries = 1
+    engine.scheduler.base_delay = 0.01
+
+    def down(*args, **kwargs):
+        raise requests.ConnectionError("refused")
+
+    engine.session.get = down
+    with pytest.raises(requests.ConnectionError):
+        engine.count_issues(TARGET)
+    assert engine.scheduler.retries["search"] == 1
+
+
+def test_etag_turns_unchanged_rerun_into_304(github_server, make_engine):
+    engine = make_engine(github_server)
+    first = engine.ingest_target(TARGET)
+    # Com watermark, a query muda uma vez; a partir daí é a mesma e o ETag vale
+    engine.ingest_target(TARGET)
+    before = github_server.request_count
+    third = engine.ingest_target(TARGET)
+
+    assert first["items"] == 250
+    assert third["not_modified"] and third["items"] == 0
+    assert github_server.request_count - before == 1
+
+
+def test_watermark_fetches_only_updated_issues(github_server, make_engine):
+    engine = make_engine(github_server)
+    engine.ingest_target(TARGET)
+    watermark = engine.state.get("octo_demo")["watermark"]
+    assert watermark == max(issue["updated_at"] for issue in github_server.issues[TEST_REPO])
+
+    edited = github_server.issues[TEST_REPO][10]
+    # Uma hora à frente: o corpus limita updated_at ao instante em que foi gerado
+    edited["updated_at"] = (datetime.now(timezone.utc) + timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    edited["title"] = "Edited title"
+    stats = engine.ingest_target(TARGET)
+
+    # `updated:>=` também devolve as issues com updated_at igual ao watermark anterior
+    previous = sum(issue["updated_at"] >= watermark for issue in github_server.issues[TEST_REPO])
+    assert stats["items"] == previous
+    assert engine.state.get("octo_demo")["watermark"] == edited["updated_at"]
+    # Só a versão nova entra no arquivo bruto
+    segment = engine.store.segments("octo_demo", after=1)
+    assert [item["id"] for item in engine.store.iter_items("octo_demo", segment)] == [edited["id"]]
+
+
+def test_window_over_search_cap_is_sharded(tmp_path, settings, make_engine):
+    with FakeGitHubServer(repos=[TEST_REPO], issues_per_repo=1200) as server:
+        stats = make_engine(server).ingest_target(TARGET)
+
+    assert stats["items"] == 1200
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+import src.local_model as local_model
+from src.local_model import LocalClassifier, load_training_data
+from src.storage import EnrichedStore
+
+TEMPLATES = {
+    ("negative", "bug", "high"): "App crashes with a broken stack trace on startup {i}",
+    ("positive", "feature_request", "low"): "Please add support for dark theme export {i}",
+    ("neutral", "documentation", "medium"): "Readme typo in the install docs section {i}",
+}
+
+
+def labelled(n):
+    rows = [
+        {"text": template.format(i=i), "sentiment": s, "category": c, "urgency": u}
+        for i in range(n) for (s, c, u), template in TEMPLATES.items()
+    ]
+    return pd.DataFrame(rows)
+
+
+def test_fit_predict_and_save_load(tmp_path):
+    train_df = labelled(20)
+    model = LocalClassifier(n_features=2 ** 12).fit(train_df["text"].tolist(), train_df)
+    test_df = labelled(3)
+    predicted, confidence = model.predict(test_df["text"].tolist())
+
+    for head in local_model.LABEL_CLASSES:
+        assert predicted[head].tolist() == test_df[head].tolist()
+    assert (confidence > 0.5).all()
+
+    path = tmp_path / "model.npz"
+    model.save(path)
+    loaded = LocalClassifier.load(path, confidence_threshold=0.6)
+    reloaded, reloaded_confidence = loaded.predict(test_df["text"].tolist())
+    assert reloaded.equals(predicted)
+    assert np.allclose(reloaded_confidence, confidence, atol=1e-4)
+    assert loaded.confidence_threshold == 0.6
+
+
+def test_training_data_keeps_only_llm_labels(tmp_path):
+    sources = ["llm", "local_model", "duplicate", None, "llm"]
+    df = pd.DataFrame({
+        "id": range(1, 6),
+        "title": [f"Issue {i}" for i in range(1, 6)],
+        "body": ["Crash on save"] * 5,
+        "body_compact": ["Crash on save"] * 5,
+        "created_at": pd.Timestamp("2024-03-01", tz="UTC"),
+        "sentiment": ["negative"] * 5,
+        "category": ["bug"] * 5,
+        "urgency": ["high"] * 5,
+        "label_source": sources,
+    })
+    EnrichedStore(tmp_path / "dataset").write_source("octo_demo", [df])
+
+    training = load_training_data(tmp_path / "dataset")
+    assert sorted(training["id"]) == [1, 5]
+    assert training["text"].iloc[0].startswith("Title: Issue")
+
+
+def test_main_reads_model_settings(tmp_path, monkeypatch):
+    calls = []
+    settings = {"enrichment": {"local_model": {"path": str(tmp_path / "model.npz"), "confidence_threshold": 0.65}}}
+    monkeypatch.setattr(local_model, "load_settings", lambda: settings)
+    monkeypatch.setattr(local_model, "train", lambda **kwargs: calls.append(kwargs))
+
+    local_model.main()
+    assert calls == [{"path": tmp_path / "model.npz", "confidence_threshold": 0.65}]
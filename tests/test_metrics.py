@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from src import metrics
+
+
+@pytest.fixture(autouse=True)
+def disabled_metrics(monkeypatch):
+    monkeypatch.setattr(metrics, "_registry", None)
+    monkeypatch.delenv(metrics.ENV_FLAG, raising=False)
+
+
+def test_disabled_instrumentation_records_nothing():
+    assert metrics.span("process") is metrics._NOOP_SPAN
+    metrics.inc("rows_total", 10, stage="process")
+    metrics.observe("llm_request_seconds", 0.2)
+    assert metrics.snapshot() is None and metrics.export("test") is None
+
+
+def test_histograms_export_cumulative_buckets_and_quantiles():
+    registry = metrics.Registry()
+    for value in (0.004, 0.02, 0.02, 0.3):
+        registry.observe("http_request_seconds", value, resource="search")
+
+    text = registry.to_prometheus("ingest")
+    assert '# TYPE oss_sentinel_http_request_seconds histogram' in text
+    assert 'oss_sentinel_http_request_seconds_bucket{run="ingest",resource="search",le="0.005"} 1' in text
+    assert 'oss_sentinel_http_request_seconds_bucket{run="ingest",resource="search",le="0.025"} 3' in text
+    assert 'oss_sentinel_http_request_seconds_bucket{run="ingest",resource="search",le="+Inf"} 4' in text
+    assert 'oss_sentinel_http_request_seconds_count{run="ingest",resource="search"} 4' in text
+
+    summary = registry.report("ingest")["histograms"]["http_request_seconds"]["resource=search"]
+    assert summary["count"] == 4 and summary["seconds_max"] == 0.3
+    assert 0.01 < summary["p50"] <= 0.025
+    assert summary["p99"] <= 0.3
+
+
+def test_child_snapshots_merge_into_the_parent():
+    parent, child = metrics.Registry(), metrics.Registry()
+    parent.inc("rows_total", 5, stage="process")
+    child.inc("rows_total", 7, stage="process")
+    child.observe("span_seconds", 2.0, span="process")
+    parent.merge(child.snapshot())
+
+    report = parent.report("process")
+    assert report["counters"]["rows_total"]["stage=process"] == 12
+    assert report["rows_per_second"] == {"process": 6.0}
+
+
+def test_run_scope_exports_once_and_switches_off(tmp_path):
+    settings = {"metrics": {"enabled": True, "textfile_dir": str(tmp_path), "report_dir": str(tmp_path / "runs")}}
+    with metrics.run("pipeline", settings):
+        with metrics.run("analyze", settings):
+            metrics.inc("cache_lookups_total", 3, cache="classification", result="hit")
+            metrics.inc("cache_lookups_total", 1, cache="classification", result="miss")
+            metrics.set_gauge("rate_limit_remaining", 25, api="github", resource="search")
+            metrics.set_gauge("rate_limit_limit", 30, api="github", resource="search")
+
+    assert not metrics.enabled()
+    assert [p.name for p in tmp_path.glob("*.prom")] == ["oss_sentinel_pipeline.prom"]
+    (report_path,) = (tmp_path / "runs").glob("pipeline_*.json")
+    report = json.loads(report_path.read_text())
+    assert report["cache_hit_rate"] == {"classification": 0.75}
+    assert report["rate_limit_headroom"] == {"api=github,resource=search": 0.8333}
@@ -0,0 +1,86 @@
+import pytest
+
+from src.pipeline import Pipeline, Stage, StageResult
+
+
+class Source:
+    """Etapa de origem cujo conteúdo (e fingerprint) o teste controla."""
+
+    def __init__(self, value, artifacts=()):
+        self.value = value
+        self.artifacts = list(artifacts)
+        self.runs = 0
+
+    def stage(self):
+        def run(_):
+            self.runs += 1
+            return StageResult(self.value, 1, self.artifacts)
+        return Stage("source", run, lambda _: self.value, load=lambda artifacts: f"loaded:{artifacts[0]}")
+
+
+def double_stage(seen, fail=None):
+    def run(inputs):
+        if fail and fail[0]:
+            raise RuntimeError("boom")
+        seen.append(inputs["source"])
+        return StageResult(inputs["source"] * 2, 1, [])
+    # A dependente muda sempre que a etapa anterior muda
+    return Stage("double", run, lambda fingerprints: fingerprints["source"], deps=["source"])
+
+
+def statuses(report):
+    return {entry["stage"]: entry["status"] for entry in report}
+
+
+def test_stages_run_in_dependency_order(tmp_path):
+    seen = []
+    source = Source(3)
+    pipeline = Pipeline([double_stage(seen), source.stage()], state_path=tmp_path / "state.json")
+    assert [stage.name for stage in pipeline.stages] == ["source", "double"]
+    assert statuses(pipeline.run()) == {"source": "ran", "double": "ran"}
+    assert seen == [3]
+
+
+def test_invalid_graphs_are_rejected(tmp_path):
+    noop = lambda _: StageResult(None, 0, [])  # noqa: E731
+    with pytest.raises(ValueError, match="Ciclo"):
+        Pipeline([Stage("a", noop, str, deps=["b"]), Stage("b", noop, str, deps=["a"])], tmp_path / "s.json")
+    with pytest.raises(ValueError, match="não existe"):
+        Pipeline([Stage("a", noop, str, deps=["missing"])], tmp_path / "s.json")
+
+
+def test_unchanged_fingerprints_skip_and_changes_propagate(tmp_path):
+    seen = []
+    source = Source(3)
+    pipeline = Pipeline([source.stage(), double_stage(seen)], state_path=tmp_path / "state.json")
+    pipeline.run()
+
+    assert statuses(pipeline.run()) == {"source": "skipped", "double": "skipped"}
+    source.value = 4
+    assert statuses(pipeline.run()) == {"source": "ran", "double": "ran"}
+    assert seen == [3, 4]
+
+
+def test_skipped_stage_is_reloaded_from_its_artifacts(tmp_path):
+    seen = []
+    source = Source(3, artifacts=["out.parquet"])
+    pipeline = Pipeline([source.stage(), double_stage(seen)], state_path=tmp_path / "state.json")
+    pipeline.run()
+
+    assert statuses(pipeline.run(force={"double"})) == {"source": "skipped", "double": "ran"}
+    assert seen == [3, "loaded:out.parquet"]
+    assert source.runs == 1
+
+
+def test_failure_reruns_in_memory_dependencies(tmp_path):
+    seen, fail = [], [True]
+    source = Source(3)
+    pipeline = Pipeline([source.stage(), double_stage(seen, fail)], state_path=tmp_path / "state.json")
+    report = pipeline.run()
+    assert statuses(report) == {"source": "ran", "double": "failed"}
+    assert report[-1]["error"] == "boom"
+
+    # A saída em memória da origem se perdeu: ela roda de novo
+    fail[0] = False
+    assert statuses(pipeline.run()) == {"source": "ran", "double": "ran"}
+    assert source.runs == 2 and seen == [3]
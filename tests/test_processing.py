@@ -0,0 +1,100 @@
+import json
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from src.processing import MAX_TEXT_CHARS, ProcessingEngine, compact_bodies, iter_raw_items
+
+
+def raw_issue(i):
+    return {
+        "id": 1000 + i, "number": i, "title": f"Issue {i}", "state": "open",
+        "body": f"Body {i} with a number 1.5e3 and unicode \u00e9" if i % 3 else None,
+        "comments": i, "html_url": f"https://github.com/octo/demo/issues/{i}",
+        "user": {"login": f"user{i}"} if i % 4 else None,
+        "labels": [{"name": "bug"}, {"name": "ui"}] if i % 2 else [],
+        "created_at": f"2024-01-{i + 1:02d}T10:00:00Z", "closed_at": None,
+    }
+
+
+def compact(body):
+    return compact_bodies(pd.Series([body])).iloc[0]
+
+
+def test_empty_template_sections_are_removed():
+    body = "### Describe the bug\n\nCrash on save\n\n### Screenshots\n\n_No response_\n\n### Additional context\n"
+    assert compact(body) == "### Describe the bug\n\nCrash on save"
+
+
+def test_comments_unchecked_items_and_images_are_stripped():
+    body = ("<!-- Please fill the template -->\n**Version**\n\n- [ ] I searched existing issues\n"
+            "- [x] I read the docs\n\nIt fails ![shot](http://x/y.png)")
+    assert compact(body) == "**Version**\n\n- [x] I read the docs\n\nIt fails [image]"
+
+
+def test_code_and_log_blocks_become_one_line_summaries():
+    code = "Trace:\n```python\nline1\nline2\nline3\n```\nend"
+    assert compact(code) == "Trace:\n[code: 3 lines] line1 ... line3\n\nend"
+
+    log = "Boom\n" + "".join(f"2024-01-01 10:0{i} ERROR step {i}\n" for i in range(4)) + "after"
+    assert compact(log) == "Boom\n[log: 4 lines] 2024-01-01 10:00 ERROR step 0 ... 2024-01-01 10:03 ERROR step 3\nafter"
+
+
+def test_details_tags_keep_their_content():
+    assert compact("<details>\n<summary>Logs</summary>\nsome text\n</details>") == "some text"
+
+
+def test_heading_only_body_falls_back_to_the_original():
+    body = "### Describe the bug\n\n### Steps to reproduce\n\n_No response_\n"
+    assert compact(body) == body.strip()
+
+    long_heading = "# " + "x" * (MAX_TEXT_CHARS * 2)
+    assert compact(long_heading) == long_heading[:MAX_TEXT_CHARS]
+
+
+def test_missing_and_blank_bodies_stay_empty():
+    assert compact_bodies(pd.Series([None, "   ", ""])).tolist() == ["", "", ""]
+
+
+def test_normalization_maps_api_fields(tmp_path):
+    engine = ProcessingEngine(raw_dir=str(tmp_path / "raw"), processed_dir=str(tmp_path / "processed"),
+                              config={}, state_path=str(tmp_path / "state.json"))
+    df = engine.normalize_github_data([raw_issue(i) for i in range(4)])
+
+    assert df.columns.tolist()[:4] == ["id", "number", "title", "state"]
+    assert df["author"].tolist() == ["Unknown", "user1", "user2", "user3"]
+    assert df["labels"].tolist() == ["", "bug, ui", "", "bug, ui"]
+    assert df["body"].iloc[0] == "" and df["comments_count"].tolist() == [0, 1, 2, 3]
+
+
+def test_streaming_reader_matches_json_load(tmp_path):
+    items = [raw_issue(i) for i in range(25)]
+    search = tmp_path / "search.json"
+    search.write_text(json.dumps({"total_count": 25, "incomplete_results": False, "items": items, "extra": [1, 2]},
+                                 indent=2))
+    listing = tmp_path / "list.json"
+    listing.write_text(json.dumps(items))
+
+    # Buffer pequeno: valores (inclusive números) atravessam a fronteira dos blocos
+    assert list(iter_raw_items(search, buffer_size=7)) == items
+    assert list(iter_raw_items(listing, buffer_size=5)) == items
+    empty = tmp_path / "empty.json"
+    empty.write_text("[ ]")
+    assert list(iter_raw_items(empty)) == []
+
+
+def test_raw_file_is_written_in_chunks_once(tmp_path):
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    (raw_dir / "ingest_octo_demo_20240101_000000.json").write_text(json.dumps([raw_issue(i) for i in range(10)]))
+    engine = ProcessingEngine(raw_dir=str(raw_dir), processed_dir=str(tmp_path / "processed"),
+                              config={"processing": {"chunk_size": 3, "max_workers": 1}},
+                              state_path=str(tmp_path / "state.json"))
+
+    results = engine.run_batch()
+    assert [r["rows"] for r in results] == [10]
+    (output,) = (tmp_path / "processed").glob("processed_octo_demo_*.parquet")
+    assert pq.ParquetFile(output).num_row_groups == 4
+    assert pq.read_table(output, columns=["id"]).column("id").to_pylist() == list(range(1000, 1010))
+    # Arquivo inalterado não é processado de novo
+    assert engine.run_batch() == []
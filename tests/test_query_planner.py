@@ -0,0 +1,72 @@
+import bisect
+from datetime import datetime, timedelta
+
+from src.query_planner import QueryPlanner
+
+START = datetime(2024, 1, 1)
+END = datetime(2024, 12, 31, 23, 59, 59)
+
+
+def parse_window(query):
+    lo, hi = query.split("created:")[1].split("..")
+    return (datetime.strptime(lo, "%Y-%m-%dT%H:%M:%SZ"), datetime.strptime(hi, "%Y-%m-%dT%H:%M:%SZ"))
+
+
+def counter(timestamps):
+    """count_fn exato sobre uma lista de instantes de criação, registrando as consultas."""
+    timestamps = sorted(timestamps)
+
+    def count(query):
+        lo, hi = parse_window(query)
+        count.calls += 1
+        return bisect.bisect_right(timestamps, hi) - bisect.bisect_left(timestamps, lo)
+
+    count.calls = 0
+    return count
+
+
+def spread(n, start=START, seconds=365 * 86400):
+    return [start + timedelta(seconds=i * seconds // n) for i in range(n)]
+
+
+def test_shards_cover_window_under_cap():
+    timestamps = spread(3500)
+    count = counter(timestamps)
+    shards = QueryPlanner(count, cap=1000).plan("repo:o/r", START, END)
+
+    assert all(shard.count <= 1000 for shard in shards)
+    assert sum(shard.count for shard in shards) == 3500
+    assert shards[0].start == START and shards[-1].end == END
+    # Intervalos contíguos e sem sobreposição (limites inclusivos, resolução de 1s)
+    for left, right in zip(shards, shards[1:]):
+        assert right.start == left.end + timedelta(seconds=1)
+
+
+def test_window_under_cap_needs_no_probe():
+    count = counter(spread(800))
+    shards = QueryPlanner(count, cap=1000).plan("repo:o/r", START, END, total=800)
+
+    assert len(shards) == 1 and shards[0].measured
+    assert count.calls == 0
+
+
+def test_measured_empty_halves_are_dropped():
+    # Tudo em dezembro: as metades esquerdas consultadas vêm vazias e ficam de fora
+    count = counter(spread(1500, start=datetime(2024, 12, 1), seconds=20 * 86400))
+    shards = QueryPlanner(count, cap=1000).plan("repo:o/r", START, END)
+
+    assert sum(shard.count for shard in shards) == 1500
+    assert shards[0].start > START
+    assert all(shard.count > 0 or not shard.measured for shard in shards)
+
+
+def test_inferred_empty_shard_is_kept():
+    # O total_count informado é aproximado: subestima e a metade direita sai com zero
+    timestamps = spread(1200, seconds=150 * 86400) + spread(300, start=datetime(2024, 9, 1), seconds=86400)
+    count = counter(timestamps)
+    shards = QueryPlanner(count, cap=1000).plan("repo:o/r", START, END, total=1100)
+
+    right = [shard for shard in shards if shard.start > datetime(2024, 7, 1)]
+    assert right and not right[0].measured
+    # O shard deduzido cobre as issues de setembro, que a ingestão busca de verdade
+    assert right[-1].end == END and right[0].start <= datetime(2024, 9, 1)
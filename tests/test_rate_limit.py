@@ -0,0 +1,78 @@
+import pytest
+
+from src.rate_limit import RateLimitScheduler, TokenBucket
+
+
+class FakeClock:
+    """Relógio manual: `sleep` só avança o tempo."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_burst_up_to_capacity_then_refill_rate(clock):
+    bucket = TokenBucket(5, 1, clock=clock, sleep=clock.sleep)
+    for _ in range(5):
+        bucket.acquire()
+    assert clock.slept == []
+
+    # Sem tokens: espera 1/rate para o próximo
+    bucket.acquire()
+    assert clock.now == pytest.approx(0.2)
+    assert bucket.acquired == 6
+    assert bucket.waited == pytest.approx(0.2)
+
+
+def test_refill_is_capped_at_capacity(clock):
+    bucket = TokenBucket(5, 1, clock=clock, sleep=clock.sleep)
+    for _ in range(5):
+        bucket.acquire()
+    clock.now += 60
+    for _ in range(5):
+        bucket.acquire()
+    assert clock.slept == []
+    bucket.acquire()
+    assert clock.slept == [pytest.approx(0.2)]
+
+
+def test_request_larger_than_capacity_is_clamped(clock):
+    bucket = TokenBucket(10, 10, clock=clock, sleep=clock.sleep)
+    bucket.acquire(50)
+    assert bucket.acquired == 10
+    assert clock.slept == []
+
+
+def test_sync_with_exhausted_server_budget_blocks_until_reset(clock):
+    bucket = TokenBucket(30, 60, clock=clock, sleep=clock.sleep)
+    bucket.sync(remaining=0, wait_seconds=12)
+    bucket.acquire()
+    assert clock.now >= 12
+
+
+def test_pause_delays_next_acquire(clock):
+    bucket = TokenBucket(30, 60, clock=clock, sleep=clock.sleep)
+    bucket.pause(3)
+    bucket.acquire()
+    assert clock.now == pytest.approx(3)
+    assert bucket.tokens == pytest.approx(29)
+
+
+def test_scheduler_syncs_bucket_from_headers(clock):
+    scheduler = RateLimitScheduler(clock=clock, sleep=clock.sleep)
+    scheduler.update("search", {"X-RateLimit-Remaining": "2", "X-RateLimit-Limit": "30",
+                                "X-RateLimit-Resource": "search"})
+    assert scheduler.buckets["search"].tokens == 2
+    assert scheduler.report()["search"]["remaining"] == 2
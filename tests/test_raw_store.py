@@ -0,0 +1,59 @@
+import gzip
+import json
+
+from src.raw_store import PROJECTED_FIELDS, RawStore
+
+SOURCE = "octo_demo"
+
+
+def issue(i, updated_at="2024-01-01T00:00:00Z", **fields):
+    return dict({
+        "id": i, "number": i, "title": f"Issue {i}", "state": "open", "body": "Body",
+        "updated_at": updated_at, "user": {"login": "octocat", "avatar_url": "x"},
+        "labels": [{"name": "bug", "color": "red"}], "reactions": {"+1": 3},
+    }, **fields)
+
+
+def test_segments_keep_only_projected_fields(tmp_path):
+    store = RawStore(tmp_path)
+    assert store.append(SOURCE, [issue(1), issue(2)]) == {"segment": 1, "written": 2, "skipped": 0}
+
+    (segment,) = store.segments(SOURCE)
+    with gzip.open(tmp_path / SOURCE / segment["name"], "rt") as f:
+        record = json.loads(f.readline())
+    assert set(record) == set(PROJECTED_FIELDS) | {"user", "labels"}
+    assert record["user"] == {"login": "octocat"} and record["labels"] == [{"name": "bug"}]
+
+
+def test_known_versions_are_not_written_again(tmp_path):
+    store = RawStore(tmp_path)
+    store.append(SOURCE, [issue(1), issue(2)])
+    # Mesma versão não gera segmento; a versão mais nova do lote vence
+    assert store.append(SOURCE, [issue(1), issue(2)])["segment"] is None
+    result = store.append(SOURCE, [issue(2, "2024-02-01T00:00:00Z", title="Old"),
+                                   issue(2, "2024-03-01T00:00:00Z", title="New"), issue(1)])
+    assert result == {"segment": 2, "written": 1, "skipped": 2}
+
+    assert [s["seq"] for s in store.segments(SOURCE, after=1)] == [2]
+    assert store.load_index(SOURCE) == {"1": "2024-01-01T00:00:00Z", "2": "2024-03-01T00:00:00Z"}
+
+
+def test_iteration_skips_superseded_versions(tmp_path):
+    store = RawStore(tmp_path)
+    store.append(SOURCE, [issue(1), issue(2)])
+    store.append(SOURCE, [issue(2, "2024-02-01T00:00:00Z", title="Edited")])
+
+    items = list(store.iter_items(SOURCE, store.segments(SOURCE)))
+    assert [(item["id"], item["title"]) for item in items] == [(1, "Issue 1"), (2, "Edited")]
+
+
+def test_snapshot_import_and_manifest_reload(tmp_path):
+    snapshot = tmp_path / "ingest_octo_demo_20240101_000000.json"
+    snapshot.write_text(json.dumps({"total_count": 2, "items": [issue(1), issue(2)]}, indent=2))
+    RawStore(tmp_path / "raw").import_snapshot(SOURCE, snapshot)
+
+    reopened = RawStore(tmp_path / "raw")
+    assert reopened.sources() == [SOURCE]
+    (segment,) = reopened.segments(SOURCE)
+    assert segment["rows"] == 2 and segment["max_updated_at"] == "2024-01-01T00:00:00Z"
+    assert segment["bytes"] < snapshot.stat().st_size
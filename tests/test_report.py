@@ -0,0 +1,62 @@
+import json
+
+import pandas as pd
+
+from src import report
+from src.report import RANKING_KEY, ReportRenderer, figure_fingerprint, ranking_specs
+
+CONFIG = {"analysis": {"report": {"workers": 1}}}
+
+
+def summary(**pain):
+    return pd.DataFrame({"source_repo": list(pain), "Pain_Index_Mean": list(pain.values())})
+
+
+def test_fingerprint_ignores_float_noise_but_not_data():
+    (base,) = ranking_specs(summary(a=-1.2, b=0.5))
+    (noisy,) = ranking_specs(summary(a=-1.2 + 1e-9, b=0.5))
+    (changed,) = ranking_specs(summary(a=-1.3, b=0.5))
+    assert figure_fingerprint(base) == figure_fingerprint(noisy)
+    assert figure_fingerprint(base) != figure_fingerprint(changed)
+
+
+def test_ranking_is_paged_by_repository():
+    specs = ranking_specs(summary(a=-1.0, b=0.5, c=0.0), repos_per_page=2)
+    assert [spec.key for spec in specs] == [RANKING_KEY, f"{RANKING_KEY}_p2"]
+    assert specs[0].data["pain"]["source_repo"].tolist() == ["a", "c"]
+    assert specs[1].title.endswith("(2/2)")
+
+
+def test_only_changed_figures_are_redrawn(tmp_path):
+    renderer = ReportRenderer(tmp_path, config=CONFIG)
+    specs = ranking_specs(summary(a=-1.0, b=0.5, c=0.0), repos_per_page=2)
+    assert renderer.render(specs) == {"rendered": 2, "skipped": 0, "removed": 0, "failed": 0}
+    assert renderer.render(specs) == {"rendered": 0, "skipped": 2, "removed": 0, "failed": 0}
+
+    first_page = renderer.path(RANKING_KEY).stat().st_mtime_ns
+    specs = ranking_specs(summary(a=-1.0, b=0.9, c=0.0), repos_per_page=2)
+    assert renderer.render(specs) == {"rendered": 1, "skipped": 1, "removed": 0, "failed": 0}
+    assert renderer.path(RANKING_KEY).stat().st_mtime_ns == first_page
+
+    # Página que deixou de existir é apagada
+    assert renderer.render(ranking_specs(summary(a=-1.0, b=0.9), repos_per_page=2))["removed"] == 1
+    assert not renderer.path(f"{RANKING_KEY}_p2").exists()
+    index = json.loads((tmp_path / "index.json").read_text())["figures"]
+    assert list(index) == [RANKING_KEY]
+    assert (tmp_path / "index.html").exists()
+
+
+def test_failed_figure_is_retried_on_the_next_run(tmp_path, monkeypatch):
+    renderer = ReportRenderer(tmp_path, config=CONFIG)
+    specs = ranking_specs(summary(a=-1.0))
+    draw = report.DRAWERS["ranking"]
+
+    def broken(*args):
+        raise ValueError("no data")
+
+    monkeypatch.setitem(report.DRAWERS, "ranking", broken)
+    assert renderer.render(specs)["failed"] == 1
+    assert renderer.load_index() == {}
+
+    monkeypatch.setitem(report.DRAWERS, "ranking", draw)
+    assert renderer.render(specs)["rendered"] == 1
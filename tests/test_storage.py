@@ -0,0 +1,77 @@
+import pandas as pd
+import pyarrow.parquet as pq
+
+from src.storage import ENRICHED_SCHEMA, PROCESSED_SCHEMA, EnrichedStore, UpsertStats, to_arrow
+
+SOURCE = "octo_demo"
+
+
+def rows(ids, month, sentiment="neutral"):
+    return pd.DataFrame({
+        "id": ids,
+        "title": [f"Issue {i}" for i in ids],
+        "created_at": pd.Timestamp(f"{month}-10", tz="UTC"),
+        "sentiment": sentiment,
+        "category": "bug",
+        "urgency": "low",
+    })
+
+
+def partition_file(store, month):
+    return store.root / f"source_repo={SOURCE}" / f"created_month={month}" / "part-0.parquet"
+
+
+def test_to_arrow_fills_missing_columns_with_typed_nulls():
+    table = to_arrow(pd.DataFrame({"id": ["7"], "title": ["x"], "created_at": ["2024-01-01T00:00:00Z"]}),
+                     PROCESSED_SCHEMA)
+    assert table.schema == PROCESSED_SCHEMA
+    assert table.column("id").to_pylist() == [7]
+    assert table.column("closed_at").null_count == 1
+
+
+def test_upsert_rewrites_only_the_partitions_it_touches(tmp_path):
+    store = EnrichedStore(tmp_path / "dataset")
+    store.write_source(SOURCE, [rows([1, 2], "2024-01"), rows([3, 4], "2024-02")])
+    february = partition_file(store, "2024-02").stat()
+
+    stats = store.upsert_source(SOURCE, [rows([2, 5], "2024-01", sentiment="negative")])
+    assert stats == UpsertStats(rows=2, kept=1, partitions=1)
+    assert partition_file(store, "2024-02").stat().st_mtime_ns == february.st_mtime_ns
+
+    df = store.load(columns=["id", "sentiment"]).sort_values("id")
+    assert df["id"].tolist() == [1, 2, 3, 4, 5]
+    assert df["sentiment"].tolist() == ["neutral", "negative", "neutral", "neutral", "negative"]
+    # Uma partição tem sempre um único arquivo
+    assert [p.name for p in partition_file(store, "2024-01").parent.iterdir()] == ["part-0.parquet"]
+
+
+def test_write_source_drops_months_missing_from_the_new_version(tmp_path):
+    store = EnrichedStore(tmp_path / "dataset")
+    store.write_source(SOURCE, [rows([1], "2024-01"), rows([2], "2024-02")])
+    assert store.write_source(SOURCE, [rows([2], "2024-02")]) == 1
+    assert not partition_file(store, "2024-01").parent.exists()
+    assert store.load(columns=["id"])["id"].tolist() == [2]
+
+
+def test_load_prunes_partitions_and_keeps_types(tmp_path):
+    store = EnrichedStore(tmp_path / "dataset")
+    store.write_source(SOURCE, [rows([1], "2024-01"), rows([2], "2024-02")])
+    store.write_source("other", [rows([3], "2024-02")])
+
+    df = store.load(columns=["id", "sentiment", "source_repo", "created_month"], months=["2024-02"])
+    assert sorted(df["id"]) == [2, 3]
+    assert str(df["sentiment"].dtype) == "category"
+    assert set(df["source_repo"]) == {SOURCE, "other"}
+    assert store.load(columns=["id"], repos=["other"])["id"].tolist() == [3]
+
+
+def test_partitions_written_before_a_new_column_read_it_as_null(tmp_path):
+    store = EnrichedStore(tmp_path / "dataset")
+    legacy_schema = ENRICHED_SCHEMA.remove(ENRICHED_SCHEMA.get_field_index("label_source"))
+    path = partition_file(store, "2024-01")
+    path.parent.mkdir(parents=True)
+    pq.write_table(to_arrow(rows([1], "2024-01"), legacy_schema), path)
+
+    assert store.load(columns=["id", "label_source"])["label_source"].isna().all()
+    (chunk,) = store.iter_source(SOURCE, batch_size=10)
+    assert chunk["label_source"].isna().all()
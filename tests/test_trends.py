@@ -0,0 +1,75 @@
+import pandas as pd
+import pytest
+
+from src.analyze import PainTrendEngine, bucket_stats
+from src.storage import EnrichedStore
+
+# 2024-01-01 é uma segunda-feira
+ISSUES = pd.DataFrame([
+    # id, repo, created_at, closed_at, sentiment, urgency
+    (1, "a", "2024-01-01T10:00:00Z", "2024-01-02T10:00:00Z", "negative", "high"),
+    (2, "a", "2024-01-03T08:00:00Z", None, "positive", "low"),
+    (3, "a", "2024-01-09T12:00:00Z", "2024-01-11T12:00:00Z", "neutral", "medium"),
+    (4, "b", "2024-01-02T00:30:00Z", None, "negative", "medium"),
+], columns=["id", "source_repo", "created_at", "closed_at", "sentiment", "urgency"])
+
+
+def typed(df):
+    return df.assign(created_at=pd.to_datetime(df["created_at"], utc=True),
+                     closed_at=pd.to_datetime(df["closed_at"], utc=True))
+
+
+def write(store, df):
+    for repo, rows in typed(df).groupby("source_repo"):
+        store.upsert_source(repo, [rows.drop(columns="source_repo")])
+
+
+def test_daily_and_weekly_sums():
+    stats = bucket_stats(typed(ISSUES))
+    daily = stats["D"].loc["a"]
+    assert daily.index.strftime("%Y-%m-%d").tolist() == ["2024-01-01", "2024-01-03", "2024-01-09"]
+    assert daily["pain_sum"].tolist() == [-3, 1, 0]
+    assert daily["close_hours_sum"].tolist() == [24, 0, 48]
+
+    weekly = stats["W"].loc["a"]
+    assert weekly.index.strftime("%Y-%m-%d").tolist() == ["2024-01-01", "2024-01-08"]
+    assert weekly["issues"].tolist() == [2, 1]
+    assert weekly["high_urgency"].tolist() == [1, 0]
+    assert weekly["closed"].tolist() == [1, 1]
+
+
+def test_trends_fill_gaps_and_roll(tmp_path):
+    engine = PainTrendEngine(state_dir=tmp_path / "trends", dataset_root=tmp_path / "dataset")
+    engine.build(typed(ISSUES))
+
+    weekly = engine.trends("W", window=2).set_index(["source_repo", "bucket"])
+    a = weekly.loc["a"]
+    assert a["pain_index"].tolist() == [-1, 0]
+    assert a["time_to_close_hours"].tolist() == [24, 48]
+    assert a["pain_index_rolling"].iloc[-1] == pytest.approx(-2 / 3)
+    assert a["time_to_close_hours_rolling"].iloc[-1] == 36
+
+    daily = engine.trends("D").set_index(["source_repo", "bucket"])
+    gap = daily.loc[("a", pd.Timestamp("2024-01-02"))]
+    assert gap["issues"] == 0 and pd.isna(gap["pain_index"])
+    # Cada repositório começa no seu primeiro bucket com issues
+    assert daily.loc["b"].index.min() == pd.Timestamp("2024-01-02")
+
+
+def test_update_recomputes_touched_buckets_like_a_full_build(tmp_path):
+    store = EnrichedStore(tmp_path / "dataset")
+    write(store, ISSUES)
+    engine = PainTrendEngine(state_dir=tmp_path / "trends", dataset_root=store.root)
+    engine.build()
+
+    changes = pd.DataFrame([
+        (2, "a", "2024-01-03T08:00:00Z", None, "negative", "high"),
+        (5, "b", "2024-02-05T09:00:00Z", None, "neutral", "low"),
+    ], columns=ISSUES.columns)
+    write(store, changes)
+    assert engine.update(typed(changes)[["source_repo", "created_at"]]) == 4
+
+    fresh = PainTrendEngine(state_dir=tmp_path / "fresh", dataset_root=store.root)
+    fresh.build()
+    for freq in ("D", "W"):
+        pd.testing.assert_frame_equal(engine.load_state(freq), fresh.load_state(freq), check_dtype=False)
@@ -0,0 +1,72 @@
+import time
+
+import pytest
+
+from src.work_queue import Heartbeat, LeaseLost, WorkQueue
+
+LEASE_SECONDS = 0.5
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = WorkQueue(tmp_path / "queue.sqlite", lease_seconds=LEASE_SECONDS, max_attempts=2, retry_delay=0)
+    yield queue
+    queue.close()
+
+
+def expire():
+    time.sleep(LEASE_SECONDS * 1.5)
+
+
+def test_expired_lease_is_redelivered(queue):
+    queue.enqueue("ingest", "octo_demo", {"query": "repo:octo/demo"})
+    first = queue.lease("worker-a")
+    assert queue.lease("worker-b") is None
+
+    expire()
+    second = queue.lease("worker-b")
+    assert second.key == "octo_demo" and second.attempts == 2
+    assert second.token != first.token
+
+
+def test_stale_owner_cannot_renew_or_complete(queue):
+    queue.enqueue("ingest", "octo_demo")
+    stale = queue.lease("worker-a")
+    expire()
+    current = queue.lease("worker-b")
+
+    with pytest.raises(LeaseLost):
+        queue.heartbeat(stale)
+    with pytest.raises(LeaseLost):
+        queue.complete(stale, {"items": 1})
+    queue.complete(current, {"items": 2})
+    assert queue.stats()["ingest"]["done"] == 1
+
+
+def test_heartbeat_keeps_lease_alive(queue):
+    queue.enqueue("ingest", "octo_demo")
+    lease = queue.lease("worker-a")
+    with Heartbeat(queue, lease, interval=LEASE_SECONDS / 4) as heartbeat:
+        expire()
+        assert queue.lease("worker-b") is None
+        heartbeat.check()
+    queue.complete(lease)
+
+
+def test_expiry_after_max_attempts_fails_unit(queue):
+    queue.enqueue("ingest", "octo_demo")
+    for _ in range(2):
+        assert queue.lease("worker-a") is not None
+        expire()
+
+    assert queue.lease("worker-b") is None
+    assert queue.stats()["ingest"]["failed"] == 1
+    assert queue.failures()[0][:2] == ("ingest", "octo_demo")
+
+
+def test_expired_lease_counts_as_pending_in_stats(queue):
+    queue.enqueue("ingest", "octo_demo")
+    queue.lease("worker-a")
+    assert queue.stats()["ingest"]["leased"] == 1
+    expire()
+    assert queue.stats()["ingest"]["pending"] == 1